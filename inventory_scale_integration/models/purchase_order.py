@@ -3,21 +3,37 @@ from odoo import models, fields, api
 class PurchaseOrder(models.Model):
     _inherit = 'purchase.order'
 
+    weighing_ids = fields.One2many('truck.weighing', 'purchase_order_id', string='Weighing Records')
     weighing_count = fields.Integer(compute='_compute_weighing_data')
     total_net_weight = fields.Float(compute='_compute_weighing_data', string='Total Net Weight')
     total_net_weight_display = fields.Char(compute='_compute_weighing_data', string='Weight Display')
     has_weighable_products = fields.Boolean(compute='_compute_has_weighable_products')
+    needs_weighing = fields.Boolean(string='Needs Weighing', compute='_compute_needs_weighing', store=True, index=True,
+                                    help="Confirmed order with weighable products and no weighing record yet")
+    weighing_pending_qty = fields.Float(string='Quantity to Weigh', compute='_compute_needs_weighing', store=True,
+                                        help="Ordered weighable quantity in KG not yet received")
 
     @api.depends('order_line.product_id.is_weighable')
     def _compute_has_weighable_products(self):
         for order in self:
             order.has_weighable_products = any(line.product_id.is_weighable for line in order.order_line)
 
+    @api.depends('state', 'order_line.product_id.is_weighable', 'order_line.product_id.weight',
+                 'order_line.product_uom_id', 'order_line.product_qty', 'order_line.qty_received', 'weighing_ids.active')
+    def _compute_needs_weighing(self):
+        for order in self:
+            weighable_lines = order.order_line.filtered(lambda line: line.product_id.is_weighable)
+            order.weighing_pending_qty = sum(
+                line.product_id._get_weight_kg(max(line.product_qty - line.qty_received, 0.0), line.product_uom_id)
+                for line in weighable_lines
+            )
+            order.needs_weighing = bool(weighable_lines and order.state in ('purchase', 'done') and not order.weighing_ids)
+
+    @api.depends('weighing_ids.net_weight')
     def _compute_weighing_data(self):
+        totals = self.env['truck.weighing']._read_weighing_totals('purchase_order_id', self)
         for order in self:
-            weighings = self.env['truck.weighing'].search([('purchase_order_id', '=', order.id)])
-            order.weighing_count = len(weighings)
-            order.total_net_weight = sum(weighings.mapped('net_weight'))
+            order.weighing_count, order.total_net_weight = totals.get(order._origin.id, (0, 0.0))
             if order.total_net_weight > 2000:
                 order.total_net_weight_display = f"{order.total_net_weight / 1000:.1f} T"
             else:
@@ -3,21 +3,47 @@ from odoo import models, fields, api
 class StockPicking(models.Model):
     _inherit = 'stock.picking'
 
+    weighing_ids = fields.One2many('truck.weighing', 'picking_id', string='Weighing Records')
+    delivery_weighing_ids = fields.One2many('truck.weighing', 'delivery_id', string='Delivery Weighing Records')
     weighing_count = fields.Integer(compute='_compute_weighing_data')
     total_net_weight = fields.Float(compute='_compute_weighing_data', string='Total Net Weight')
     total_net_weight_display = fields.Char(compute='_compute_weighing_data', string='Weight Display')
     has_weighable_products = fields.Boolean(compute='_compute_has_weighable_products')
+    needs_weighing = fields.Boolean(string='Needs Weighing', compute='_compute_needs_weighing', store=True, index=True,
+                                    help="Ready receipt or delivery with weighable products and no weighing record yet")
+    weighing_pending_qty = fields.Float(string='Quantity to Weigh', compute='_compute_needs_weighing', store=True,
+                                        help="Demand of the weighable products in KG not covered by completed weighings")
 
     @api.depends('move_ids.product_id.is_weighable')
     def _compute_has_weighable_products(self):
         for picking in self:
             picking.has_weighable_products = any(move.product_id.is_weighable for move in picking.move_ids)
 
+    @api.depends('state', 'picking_type_id.code', 'move_ids.product_id.is_weighable', 'move_ids.product_id.weight',
+                 'move_ids.product_uom', 'move_ids.product_uom_qty',
+                 'weighing_ids.active', 'weighing_ids.state', 'weighing_ids.net_weight',
+                 'delivery_weighing_ids.active', 'delivery_weighing_ids.state', 'delivery_weighing_ids.net_weight')
+    def _compute_needs_weighing(self):
+        for picking in self:
+            code = picking.picking_type_id.code
+            # Deliveries are weighed through delivery_id, receipts through picking_id
+            weighings = picking.delivery_weighing_ids if code == 'outgoing' else picking.weighing_ids
+            weighable_moves = picking.move_ids.filtered(lambda m: m.product_id.is_weighable)
+            weighed = sum(weighings.filtered(lambda w: w.state == 'done').mapped('net_weight'))
+            demand = sum(move.product_id._get_weight_kg(move.product_uom_qty, move.product_uom) for move in weighable_moves)
+            picking.weighing_pending_qty = max(demand - weighed, 0.0)
+            picking.needs_weighing = bool(
+                weighable_moves
+                and picking.state in ('assigned', 'confirmed')
+                and code in ('incoming', 'outgoing')
+                and not weighings
+            )
+
+    @api.depends('weighing_ids.net_weight')
     def _compute_weighing_data(self):
+        totals = self.env['truck.weighing']._read_weighing_totals('picking_id', self)
         for picking in self:
-            weighings = self.env['truck.weighing'].search([('picking_id', '=', picking.id)])
-            picking.weighing_count = len(weighings)
-            picking.total_net_weight = sum(weighings.mapped('net_weight'))
+            picking.weighing_count, picking.total_net_weight = totals.get(picking._origin.id, (0, 0.0))
             if picking.total_net_weight > 2000:
                 picking.total_net_weight_display = f"{picking.total_net_weight / 1000:.1f} T"
             else:
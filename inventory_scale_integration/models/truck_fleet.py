@@ -36,10 +36,11 @@ class TruckFleet(models.Model):
             truck.total_max_weight = truck.trailer_count * truck.max_weight_per_trailer
     
     def _compute_weighing_count(self):
+        groups = self.env['truck.weighing']._read_group(
+            [('truck_id', 'in', self._origin.ids)], ['truck_id'], ['__count', 'weighing_date:max'])
+        stats = {truck.id: (count, last_date) for truck, count, last_date in groups}
         for truck in self:
-            weighings = self.env['truck.weighing'].search([('truck_id', '=', truck.id)])
-            truck.weighing_count = len(weighings)
-            truck.last_weighing_date = weighings[0].weighing_date if weighings else False
+            truck.weighing_count, truck.last_weighing_date = stats.get(truck._origin.id, (0, False))
     
     def action_view_weighing_records(self):
         return {
@@ -20,7 +20,7 @@ class TruckWeighing(models.Model):
     user_scale_ids = fields.Many2many('weighing.scale', compute='_compute_user_scales')
     
     # Truck & Material Info
-    truck_id = fields.Many2one('truck.fleet', string='Truck', required=True, tracking=True)
+    truck_id = fields.Many2one('truck.fleet', string='Truck', required=True, index=True, tracking=True)
     truck_plate = fields.Char(string='Plate Number', related='truck_id.plate_number', store=True, readonly=True)
     driver_name = fields.Char(string='Driver Name', related='truck_id.driver_name', readonly=False)
     
@@ -50,7 +50,7 @@ class TruckWeighing(models.Model):
     net_weight = fields.Float(string='Net Weight (KG)', compute='_compute_net_weight', store=True, tracking=True)
     
     # Dates
-    weighing_date = fields.Datetime(string='Weighing Date', default=fields.Datetime.now, tracking=True)
+    weighing_date = fields.Datetime(string='Weighing Date', default=fields.Datetime.now, index=True, tracking=True)
     gross_date = fields.Datetime(string='Gross Weight Date', readonly=True)
     tare_date = fields.Datetime(string='Tare Weight Date', readonly=True)
 
@@ -78,6 +78,12 @@ class TruckWeighing(models.Model):
             'total_weight_today': sum(self.search([('state', '=', 'done'), ('weighing_date', '>=', today)]).mapped('net_weight')),
         }
 
+    @api.model
+    def _read_weighing_totals(self, link_field, records):
+        """ Count and net weight of the weighings linked through link_field, one grouped query per batch """
+        groups = self._read_group([(link_field, 'in', records._origin.ids)], [link_field], ['__count', 'net_weight:sum'])
+        return {linked.id: (count, net_weight or 0.0) for linked, count, net_weight in groups}
+
     @api.depends('purchase_order_id', 'picking_id', 'sale_order_id', 'delivery_id')
     def _compute_operation_type(self):
         """ Determine operation type based on linked documents """
@@ -127,23 +133,6 @@ class TruckWeighing(models.Model):
             self._auto_populate_from_context(vals)
         return super(TruckWeighing, self).create(vals_list)
     
-    def write(self, vals):
-        """Override write to trigger order recomputation when state changes"""
-        result = super().write(vals)
-        if 'state' in vals or 'net_weight' in vals:
-            self._trigger_order_recomputation()
-        return result
-    
-    def _trigger_order_recomputation(self):
-        """Trigger recomputation of related order fields"""
-        for record in self:
-            if record.purchase_order_id:
-                # Force recomputation by invalidating cache
-                record.purchase_order_id.invalidate_recordset(['weighing_count', 'total_net_weight'])
-            if record.sale_order_id:
-                # Force recomputation by invalidating cache
-                record.sale_order_id.invalidate_recordset(['weighing_count', 'total_net_weight'])
-    
     def _auto_populate_from_context(self, vals):
         """Auto-populate fields based on context"""
         context = self.env.context
@@ -261,9 +250,6 @@ class TruckWeighing(models.Model):
             raise UserError(_("Please select a receipt or delivery first."))
         
         self.state = 'done'
-        
-        # Trigger recomputation of related orders
-        self._trigger_order_recomputation()
     
     def _update_receipt_quantity(self):
         """ Update received quantity only (not demand) in receipt without validation """
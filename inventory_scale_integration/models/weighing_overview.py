@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 from odoo import models, fields, api
-from datetime import datetime, timedelta
+from odoo.tools import SQL
+from datetime import timedelta
 
 class WeighingOverview(models.TransientModel):
     _name = 'weighing.overview'
@@ -12,36 +13,15 @@ class WeighingOverview(models.TransientModel):
         today = fields.Date.today()
         week_ago = today - timedelta(days=7)
         
-        # Get IDs for consistent filtering
-        receipts_to_weigh_ids = self.get_receipts_to_weigh_ids()
-        pos_to_weigh_ids = self.get_pos_to_weigh_ids()
-        sales_to_weigh_ids = self.get_sales_to_weigh_ids()
-        deliveries_to_weigh_ids = self.get_deliveries_to_weigh_ids()
-        
-        receipts_to_weigh = self.env['stock.picking'].browse(receipts_to_weigh_ids)
-        pos_to_weigh = self.env['purchase.order'].browse(pos_to_weigh_ids)
-        sales_to_weigh = self.env['sale.order'].browse(sales_to_weigh_ids)
-        deliveries_to_weigh = self.env['stock.picking'].browse(deliveries_to_weigh_ids)
-        
-        # In Progress Weighings
-        in_progress = self.env['truck.weighing'].search([
-            ('state', 'in', ['draft', 'gross', 'tare'])
-        ])
-        
-        # All Records
-        all_records = self.env['truck.weighing'].search([])
-        completed_today = all_records.filtered(lambda r: r.state == 'done' and r.weighing_date.date() == today)
-        completed_week = all_records.filtered(lambda r: r.state == 'done' and r.weighing_date.date() >= week_ago)
+        stats = self._get_weighing_stats(today, week_ago)
         
         # Truck Management Data
-        all_trucks = self.env['truck.fleet'].search([])
-        active_trucks = all_trucks.filtered(lambda t: t.active)
-        trucks_with_weighing = all_trucks.filtered(lambda t: self.env['truck.weighing'].search([('truck_id', '=', t.id)], limit=1))
-        trucks_today = self.env['truck.weighing'].search([('weighing_date', '>=', today)]).mapped('truck_id')
+        active_trucks = self.env['truck.fleet'].search_count([])
+        trucks_with_weighing = self._count_trucks_with_weighing()
         
         # Truck performance metrics
-        total_weighings = len(all_records)
-        avg_weighings_per_truck = total_weighings / max(len(trucks_with_weighing), 1)
+        total_weighings = stats['total_count']
+        avg_weighings_per_truck = total_weighings / max(trucks_with_weighing, 1)
         
         # Truck-related POs and Receipts
         truck_pos = self.env['purchase.order'].search_count([
@@ -55,133 +35,145 @@ class WeighingOverview(models.TransientModel):
         ])
         
         # Weekly truck activity
-        weekly_truck_activity = self.env['truck.weighing'].search_count([
-            ('weighing_date', '>=', week_ago),
-            ('state', '=', 'done')
-        ])
+        weekly_truck_activity = stats['completed_week']
         
         return {
-            'receipts_to_weigh': {
-                'count': len(receipts_to_weigh),
-                'total_qty': sum(receipts_to_weigh.mapped('move_ids.product_uom_qty')),
-                'urgent_count': len(receipts_to_weigh.filtered(lambda r: r.scheduled_date and r.scheduled_date.date() <= today)),
-                'partners': len(receipts_to_weigh.mapped('partner_id')),
-            },
-            'pos_to_weigh': {
-                'count': len(pos_to_weigh),
-                'total_amount': sum(pos_to_weigh.mapped('amount_total')),
-                'pending_qty': sum(line.product_qty - line.qty_received for po in pos_to_weigh for line in po.order_line),
-                'partners': len(pos_to_weigh.mapped('partner_id')),
-            },
+            'receipts_to_weigh': self._picking_queue_stats(self._receipts_to_weigh_domain(), today),
+            'pos_to_weigh': self._order_queue_stats('purchase.order', self._pos_to_weigh_domain()),
             'in_progress': {
-                'count': len(in_progress),
-                'draft_count': len(in_progress.filtered(lambda r: r.state == 'draft')),
-                'gross_count': len(in_progress.filtered(lambda r: r.state == 'gross')),
-                'tare_count': len(in_progress.filtered(lambda r: r.state == 'tare')),
-                'avg_time': self._calculate_avg_processing_time(in_progress),
+                'count': stats['draft_count'] + stats['gross_count'] + stats['tare_count'],
+                'draft_count': stats['draft_count'],
+                'gross_count': stats['gross_count'],
+                'tare_count': stats['tare_count'],
+                'avg_time': round(stats['avg_open_seconds'] / 3600, 1),
             },
             'all_records': {
-                'total_count': len(all_records),
-                'completed_today': len(completed_today),
-                'completed_week': len(completed_week),
-                'total_weight_today': sum(completed_today.mapped('net_weight')),
-                'total_weight_week': sum(completed_week.mapped('net_weight')),
-                'avg_weight': sum(all_records.filtered(lambda r: r.state == 'done').mapped('net_weight')) / max(len(all_records.filtered(lambda r: r.state == 'done')), 1),
+                'total_count': total_weighings,
+                'completed_today': stats['completed_today'],
+                'completed_week': stats['completed_week'],
+                'total_weight_today': stats['weight_today'],
+                'total_weight_week': stats['weight_week'],
+                'avg_weight': stats['done_weight'] / max(stats['done_count'], 1),
             },
             'truck_management': {
-                'total_trucks': len(all_trucks),
-                'active_trucks': len(active_trucks),
-                'trucks_with_weighing': len(trucks_with_weighing),
-                'trucks_today': len(trucks_today),
-                'utilization_rate': round((len(trucks_with_weighing) / max(len(active_trucks), 1)) * 100, 1),
+                'total_trucks': active_trucks,
+                'active_trucks': active_trucks,
+                'trucks_with_weighing': trucks_with_weighing,
+                'trucks_today': stats['trucks_today'],
+                'utilization_rate': round((trucks_with_weighing / max(active_trucks, 1)) * 100, 1),
                 'total_weighings': total_weighings,
                 'avg_weighings_per_truck': round(avg_weighings_per_truck, 1),
                 'truck_pos': truck_pos,
                 'truck_receipts': truck_receipts,
                 'weekly_activity': weekly_truck_activity,
-                'efficiency_score': round((weekly_truck_activity / max(len(active_trucks), 1)), 1),
-            },
-            'sales_to_weigh': {
-                'count': len(sales_to_weigh),
-                'total_amount': sum(sales_to_weigh.mapped('amount_total')),
-                'pending_qty': sum(line.product_uom_qty - line.qty_delivered for so in sales_to_weigh for line in so.order_line),
-                'partners': len(sales_to_weigh.mapped('partner_id')),
+                'efficiency_score': round((weekly_truck_activity / max(active_trucks, 1)), 1),
             },
-            'deliveries_to_weigh': {
-                'count': len(deliveries_to_weigh),
-                'total_qty': sum(deliveries_to_weigh.mapped('move_ids.product_uom_qty')),
-                'urgent_count': len(deliveries_to_weigh.filtered(lambda d: d.scheduled_date and d.scheduled_date.date() <= today)),
-                'partners': len(deliveries_to_weigh.mapped('partner_id')),
-            }
+            'sales_to_weigh': self._order_queue_stats('sale.order', self._sales_to_weigh_domain()),
+            'deliveries_to_weigh': self._picking_queue_stats(self._deliveries_to_weigh_domain(), today),
         }
     
-    def _calculate_avg_processing_time(self, records):
-        """Calculate average processing time in hours"""
-        if not records:
-            return 0
-        
-        total_hours = 0
-        count = 0
-        now = datetime.now()
-        
-        for record in records:
-            if record.weighing_date:
-                hours = (now - record.weighing_date).total_seconds() / 3600
-                total_hours += hours
-                count += 1
-        
-        return round(total_hours / max(count, 1), 1)
-    
     @api.model
-    def get_receipts_to_weigh_ids(self):
-        """Get receipt IDs that need weighing"""
-        all_receipts = self.env['stock.picking'].search([
-            ('state', 'in', ['assigned', 'confirmed']),
-            ('picking_type_code', '=', 'incoming'),
-            ('move_ids.product_id.is_weighable', '=', True)
-        ])
-        # Filter out those with existing weighing records
-        receipts_to_weigh = all_receipts.filtered(lambda r: 
-            not self.env['truck.weighing'].search([('picking_id', '=', r.id)], limit=1)
-        )
-        return receipts_to_weigh.ids
-    
+    def _get_weighing_stats(self, today, week_ago):
+        """Aggregate weighing counts and weights by state and date bucket in one pass.
+
+        Memory use does not depend on the size of the weighing history: no
+        record is browsed, only one row of aggregates comes back.
+        """
+        Weighing = self.env['truck.weighing']
+        Weighing.flush_model(['state', 'weighing_date', 'net_weight', 'truck_id'])
+        query = Weighing._search([])
+        table = query.table
+        [row] = self.env.execute_query(SQL(
+            """
+            WITH w AS (%s)
+            SELECT COUNT(*),
+                   COUNT(*) FILTER (WHERE w.state = 'draft'),
+                   COUNT(*) FILTER (WHERE w.state = 'gross'),
+                   COUNT(*) FILTER (WHERE w.state = 'tare'),
+                   AVG(EXTRACT(EPOCH FROM %s - w.weighing_date))
+                       FILTER (WHERE w.state IN ('draft', 'gross', 'tare') AND w.weighing_date IS NOT NULL),
+                   COUNT(*) FILTER (WHERE w.state = 'done'),
+                   SUM(w.net_weight) FILTER (WHERE w.state = 'done'),
+                   COUNT(*) FILTER (WHERE w.state = 'done' AND w.weighing_date::date = %s),
+                   SUM(w.net_weight) FILTER (WHERE w.state = 'done' AND w.weighing_date::date = %s),
+                   COUNT(*) FILTER (WHERE w.state = 'done' AND w.weighing_date::date >= %s),
+                   SUM(w.net_weight) FILTER (WHERE w.state = 'done' AND w.weighing_date::date >= %s),
+                   COUNT(DISTINCT w.truck_id) FILTER (WHERE w.weighing_date::date >= %s)
+              FROM w
+            """,
+            query.select(
+                SQL.identifier(table, 'state'),
+                SQL.identifier(table, 'weighing_date'),
+                SQL.identifier(table, 'net_weight'),
+                SQL.identifier(table, 'truck_id'),
+            ),
+            fields.Datetime.now(),
+            today, today, week_ago, week_ago, today,
+        ))
+        keys = [
+            'total_count', 'draft_count', 'gross_count', 'tare_count', 'avg_open_seconds',
+            'done_count', 'done_weight', 'completed_today', 'weight_today',
+            'completed_week', 'weight_week', 'trucks_today',
+        ]
+        stats = dict(zip(keys, row))
+        for key in ('avg_open_seconds', 'done_weight', 'weight_today', 'weight_week'):
+            stats[key] = float(stats[key] or 0.0)
+        return stats
+
     @api.model
-    def get_pos_to_weigh_ids(self):
-        """Get PO IDs that need weighing"""
-        all_pos = self.env['purchase.order'].search([
-            ('state', 'in', ['purchase', 'done']),
-            ('order_line.product_id.is_weighable', '=', True)
-        ])
-        # Filter out those with existing weighing records
-        pos_to_weigh = all_pos.filtered(lambda p: 
-            not self.env['truck.weighing'].search([('purchase_order_id', '=', p.id)], limit=1)
-        )
-        return pos_to_weigh.ids
-    
+    def _count_trucks_with_weighing(self):
+        """Count active trucks referenced by at least one weighing record"""
+        self.env['truck.weighing'].flush_model(['truck_id', 'active'])
+        query = self.env['truck.fleet']._search([])
+        query.add_where(SQL(
+            "EXISTS (SELECT 1 FROM truck_weighing tw WHERE tw.active AND tw.truck_id = %s)",
+            SQL.identifier(query.table, 'id'),
+        ))
+        [(count,)] = self.env.execute_query(query.select(SQL("COUNT(*)")))
+        return count
+
     @api.model
-    def get_sales_to_weigh_ids(self):
-        """Get Sales Order IDs that need weighing"""
-        all_sales = self.env['sale.order'].search([
-            ('state', 'in', ['sale', 'done']),
-            ('order_line.product_id.is_weighable', '=', True)
-        ])
-        # Filter out those with existing weighing records
-        sales_to_weigh = all_sales.filtered(lambda s: 
-            not self.env['truck.weighing'].search([('sale_order_id', '=', s.id)], limit=1)
-        )
-        return sales_to_weigh.ids
-    
+    def _picking_queue_stats(self, domain, today):
+        """Aggregate a picking queue (count, urgent, partners, quantity to weigh) with grouped queries"""
+        Picking = self.env['stock.picking']
+        [(count, total_qty, partners)] = Picking._read_group(
+            domain, [], ['__count', 'weighing_pending_qty:sum', 'partner_id:count_distinct'])
+        urgent_count = Picking.search_count(domain + [('scheduled_date', '<', today + timedelta(days=1))])
+        return {
+            'count': count,
+            'total_qty': total_qty or 0.0,
+            'urgent_count': urgent_count,
+            'partners': partners,
+        }
+
     @api.model
-    def get_deliveries_to_weigh_ids(self):
-        """Get Delivery IDs that need weighing"""
-        all_deliveries = self.env['stock.picking'].search([
-            ('state', 'in', ['assigned', 'confirmed']),
-            ('picking_type_code', '=', 'outgoing'),
-            ('move_ids.product_id.is_weighable', '=', True)
-        ])
-        # Filter out those with existing weighing records
-        deliveries_to_weigh = all_deliveries.filtered(lambda d: 
-            not self.env['truck.weighing'].search([('delivery_id', '=', d.id)], limit=1)
-        )
-        return deliveries_to_weigh.ids
\ No newline at end of file
+    def _order_queue_stats(self, model_name, domain):
+        """Aggregate an order queue (count, amount, partners, quantity to weigh) in one grouped query"""
+        [(count, total_amount, pending_qty, partners)] = self.env[model_name]._read_group(
+            domain, [], ['__count', 'amount_total:sum', 'weighing_pending_qty:sum', 'partner_id:count_distinct'])
+        return {
+            'count': count,
+            'total_amount': total_amount or 0.0,
+            'pending_qty': pending_qty or 0.0,
+            'partners': partners,
+        }
+
+    @api.model
+    def _receipts_to_weigh_domain(self):
+        """Receipts with weighable products and no weighing record yet"""
+        return [('needs_weighing', '=', True), ('picking_type_code', '=', 'incoming')]
+
+    @api.model
+    def _pos_to_weigh_domain(self):
+        """Confirmed POs with weighable products and no weighing record yet"""
+        return [('needs_weighing', '=', True)]
+
+    @api.model
+    def _sales_to_weigh_domain(self):
+        """Confirmed SOs with weighable products and no weighing record yet"""
+        return [('needs_weighing', '=', True)]
+
+    @api.model
+    def _deliveries_to_weigh_domain(self):
+        """Deliveries with weighable products and no weighing record yet"""
+        return [('needs_weighing', '=', True), ('picking_type_code', '=', 'outgoing')]
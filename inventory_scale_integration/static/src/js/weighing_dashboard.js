@@ -39,10 +39,10 @@ export class WeighingOverviewDashboard extends Component {
                 res_model: 'stock.picking',
                 view_mode: 'list,form',
                 views: [[false, 'list'], [false, 'form']],
-                domain: async () => {
-                    const ids = await this.orm.call('weighing.overview', 'get_receipts_to_weigh_ids', []);
-                    return [['id', 'in', ids]];
-                },
+                domain: [
+                    ['needs_weighing', '=', true],
+                    ['picking_type_code', '=', 'incoming']
+                ],
                 context: { 'create': true }
             },
             'pos_to_weigh': {
@@ -50,10 +50,7 @@ export class WeighingOverviewDashboard extends Component {
                 res_model: 'purchase.order',
                 view_mode: 'list,form',
                 views: [[false, 'list'], [false, 'form']],
-                domain: async () => {
-                    const ids = await this.orm.call('weighing.overview', 'get_pos_to_weigh_ids', []);
-                    return [['id', 'in', ids]];
-                },
+                domain: [['needs_weighing', '=', true]],
                 context: { 'create': true }
             },
             'in_progress': {
@@ -121,9 +118,8 @@ export class WeighingOverviewDashboard extends Component {
                 view_mode: 'list,form',
                 views: [[false, 'list'], [false, 'form']],
                 domain: [
-                    ['state', 'in', ['assigned', 'confirmed']],
+                    ['needs_weighing', '=', true],
                     ['picking_type_code', '=', 'incoming'],
-                    ['move_ids.product_id.is_weighable', '=', true],
                     ['scheduled_date', '<=', new Date().toISOString().split('T')[0]]
                 ],
             },
@@ -133,9 +129,8 @@ export class WeighingOverviewDashboard extends Component {
                 view_mode: 'list,form',
                 views: [[false, 'list'], [false, 'form']],
                 domain: [
-                    ['state', 'in', ['assigned', 'confirmed']],
-                    ['picking_type_code', '=', 'incoming'],
-                    ['move_ids.product_id.is_weighable', '=', true]
+                    ['needs_weighing', '=', true],
+                    ['picking_type_code', '=', 'incoming']
                 ],
                 context: { 'group_by': 'partner_id' }
             },
@@ -145,10 +140,7 @@ export class WeighingOverviewDashboard extends Component {
                 res_model: 'purchase.order',
                 view_mode: 'list,form',
                 views: [[false, 'list'], [false, 'form']],
-                domain: [
-                    ['state', 'in', ['purchase', 'done']],
-                    ['order_line.product_id.is_weighable', '=', true]
-                ],
+                domain: [['needs_weighing', '=', true]],
                 context: { 'group_by': 'amount_total' }
             },
             'pos_pending_qty': {
@@ -156,20 +148,14 @@ export class WeighingOverviewDashboard extends Component {
                 res_model: 'purchase.order',
                 view_mode: 'list,form',
                 views: [[false, 'list'], [false, 'form']],
-                domain: [
-                    ['state', 'in', ['purchase', 'done']],
-                    ['order_line.product_id.is_weighable', '=', true]
-                ],
+                domain: [['needs_weighing', '=', true]],
             },
             'pos_by_supplier': {
                 name: 'Purchase Orders by Supplier',
                 res_model: 'purchase.order',
                 view_mode: 'list,form',
                 views: [[false, 'list'], [false, 'form']],
-                domain: [
-                    ['state', 'in', ['purchase', 'done']],
-                    ['order_line.product_id.is_weighable', '=', true]
-                ],
+                domain: [['needs_weighing', '=', true]],
                 context: { 'group_by': 'partner_id' }
             },
             // Weighing state filtered actions
@@ -228,10 +214,7 @@ export class WeighingOverviewDashboard extends Component {
                 res_model: 'sale.order',
                 view_mode: 'list,form',
                 views: [[false, 'list'], [false, 'form']],
-                domain: async () => {
-                    const ids = await this.orm.call('weighing.overview', 'get_sales_to_weigh_ids', []);
-                    return [['id', 'in', ids]];
-                },
+                domain: [['needs_weighing', '=', true]],
                 context: { 'create': true }
             },
             'deliveries_to_weigh': {
@@ -239,10 +222,10 @@ export class WeighingOverviewDashboard extends Component {
                 res_model: 'stock.picking',
                 view_mode: 'list,form',
                 views: [[false, 'list'], [false, 'form']],
-                domain: async () => {
-                    const ids = await this.orm.call('weighing.overview', 'get_deliveries_to_weigh_ids', []);
-                    return [['id', 'in', ids]];
-                },
+                domain: [
+                    ['needs_weighing', '=', true],
+                    ['picking_type_code', '=', 'outgoing']
+                ],
                 context: { 'create': true }
             },
             'new_weighing_sale': {
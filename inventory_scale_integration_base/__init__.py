@@ -1,3 +1,9 @@
 # -*- coding: utf-8 -*-
 from . import controllers
-from . import models
\ No newline at end of file
+from . import models
+from . import tools
+
+
+def post_init_hook(env):
+    # Trucks may exist before the module, e.g. when migrating from the original one
+    env['truck.fleet']._recompute_weighing_stats()
@@ -1,6 +1,6 @@
 {
 'name': 'Scale Integration - Base',
-'version': '19.0.1.0.0',
+'version': '19.0.1.1.0',
 'category': 'Operations/Weighing',
 'summary': 'Core weighing scale integration - basic truck and scale management',
 'author': 'Gemy',
@@ -9,11 +9,15 @@
 'depends': ['base', 'product', 'mail', 'web','stock'],
 'data': [
 'data/sequences.xml',
+'data/ir_config_parameter.xml',
+'data/ir_cron.xml',
 'security/security.xml',
 'security/ir.model.access.csv',
 'views/truck_weighing_views.xml',
 'views/truck_fleet_views.xml',
 'views/weighing_scale_views.xml',
+'views/weighing_scale_reading_views.xml',
+'views/weighing_scale_ingestion_views.xml',
 'views/product_views.xml',
 'views/weighing_overview_views.xml',
 'views/menu_items_views.xml',
@@ -28,6 +32,7 @@
 'inventory_scale_integration_base/static/src/scss/weighing_dashboard.scss',
 ],
 },
+'post_init_hook': 'post_init_hook',
 'installable': True,
 'application': True,
 }
\ No newline at end of file
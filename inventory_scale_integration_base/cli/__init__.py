@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+from . import scale_poller
+from . import scale_simulator
+from . import scale_edge_agent
+from . import scale_replay
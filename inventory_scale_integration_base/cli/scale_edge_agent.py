@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+"""``odoo-bin scale_edge_agent``: store-and-forward agent of a weighbridge site."""
+import sys
+
+from odoo.cli import Command
+from odoo.tools import config
+
+from odoo.addons.inventory_scale_integration_base.tools import scale_edge_agent
+
+
+class ScaleEdgeAgentCommand(Command):
+    """Read local indicators and forward their readings to Odoo"""
+    name = 'scale_edge_agent'
+
+    def run(self, cmdargs):
+        options, odoo_args = scale_edge_agent.parse_options(
+            cmdargs, prog=f'{sys.argv[0].split("/")[-1]} {self.name}', known=True)
+        config.parse_config(odoo_args, setup_logging=True)
+        scale_edge_agent.serve(options)
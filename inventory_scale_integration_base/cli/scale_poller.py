@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""``odoo-bin scale_poller``: run the scale poller outside the HTTP workers."""
+import argparse
+import asyncio
+import logging
+import signal
+import sys
+
+from odoo.cli import Command
+from odoo.modules.registry import Registry
+from odoo.tools import config
+
+from odoo.addons.inventory_scale_integration_base.tools.scale_poller import ScalePoller, DEFAULT_CONCURRENCY
+from odoo.addons.inventory_scale_integration_base.tools.shared_readings import BufferLocked
+
+_logger = logging.getLogger(__name__)
+
+
+class ScalePollerCommand(Command):
+    """Poll the enabled weighing scales and keep their latest readings"""
+    name = 'scale_poller'
+
+    def run(self, cmdargs):
+        parser = argparse.ArgumentParser(
+            prog=f'{sys.argv[0].split("/")[-1]} {self.name}',
+            description=self.__doc__,
+        )
+        parser.add_argument('--interval', type=float,
+                            help="Seconds between two cycles, defaults to the poller_interval parameter")
+        parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                            help="Maximum number of scales read at the same time")
+        options, odoo_args = parser.parse_known_args(cmdargs)
+        config.parse_config(odoo_args, setup_logging=True)
+        dbnames = config['db_name']
+        if isinstance(dbnames, str):
+            dbnames = [name for name in dbnames.split(',') if name]
+        if not dbnames:
+            sys.exit("The scale poller needs a database, pass it with -d")
+        try:
+            pollers = [
+                ScalePoller(Registry(dbname), interval=options.interval, concurrency=options.concurrency)
+                for dbname in dbnames
+            ]
+        except BufferLocked as e:
+            sys.exit(f"Another scale poller is running: {e}")
+        asyncio.run(self._run(pollers))
+
+    async def _run(self, pollers):
+        loop = asyncio.get_running_loop()
+
+        def stop():
+            _logger.info("Stopping the scale poller")
+            for poller in pollers:
+                poller.stopping = True
+
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop)
+        await asyncio.gather(*(poller.run() for poller in pollers))
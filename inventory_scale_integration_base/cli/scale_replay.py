@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""``odoo-bin scale_replay``: record ingestion traffic and replay it against a test database."""
+import logging
+import sys
+import time
+from datetime import datetime
+
+from odoo import api, SUPERUSER_ID
+from odoo.cli import Command
+from odoo.modules.registry import Registry
+from odoo.tools import SQL, config
+
+from odoo.addons.inventory_scale_integration_base.tools import scale_replay
+
+_logger = logging.getLogger(__name__)
+
+WEIGHING_FIELDS = ['name', 'state', 'active', 'gross_weight', 'tare_weight', 'net_weight', 'tare_source']
+
+
+class ScaleReplayCommand(Command):
+    """Record the readings ingested by a database and replay them against another one"""
+    name = 'scale_replay'
+
+    def run(self, cmdargs):
+        options, odoo_args = scale_replay.parse_options(
+            cmdargs, prog=f'{sys.argv[0].split("/")[-1]} {self.name}', known=True, with_database=True)
+        config.parse_config(odoo_args, setup_logging=True)
+        if options.command == 'compare':
+            scale_replay.compare(options, output=sys.stdout)
+            return
+        dbnames = config['db_name']
+        if isinstance(dbnames, str):
+            dbnames = [name for name in dbnames.split(',') if name]
+        if len(dbnames or []) > 1:
+            sys.exit("The scale replay works on a single database")
+        if options.command == 'capture':
+            if not dbnames:
+                sys.exit("Capturing needs the database, pass it with -d")
+            self._capture(Registry(dbnames[0]), options)
+        elif dbnames:
+            registry = Registry(dbnames[0])
+            scale_replay.replay(
+                options,
+                before=lambda replayer: self._snapshot(registry, replayer),
+                after=lambda replayer, report: self._finish(registry, replayer, report, options),
+            )
+        else:
+            _logger.warning("No database given, the state of the weighings will not be compared")
+            scale_replay.replay(options)
+
+    def _capture(self, registry, options):
+        conditions = [
+            SQL("scale_id IS NOT NULL"),
+            # Readings sent by earlier replays are not production traffic
+            SQL("key NOT LIKE 'replay-%%'"),
+        ]
+        if options.since:
+            conditions.append(SQL("received_date >= %s", datetime.fromisoformat(options.since)))
+        if options.until:
+            conditions.append(SQL("received_date <= %s", datetime.fromisoformat(options.until)))
+        scale_ids = [int(scale_id) for scale_id in options.scale_ids.split(',') if scale_id.strip()]
+        if scale_ids:
+            conditions.append(SQL("scale_id IN %s", tuple(scale_ids)))
+        with registry.cursor() as cr:
+            cr.execute(SQL(
+                """
+                SELECT received_date, scale_id, weight, device_date
+                  FROM weighing_scale_ingestion
+                 WHERE %s
+              ORDER BY received_date, id
+                """,
+                SQL(" AND ").join(conditions),
+            ))
+            count = scale_replay.write_trace(options.output, cr.fetchall(), database=registry.db_name)
+        _logger.info("Captured %s reading(s) to %s", count, options.output)
+
+    def _snapshot(self, registry, replayer):
+        """ Weighings of the replayed scales and their pickings """
+        scale_ids = sorted({reading[1] for reading in replayer.readings})
+        with registry.cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {'active_test': False})
+            weighings = env['truck.weighing'].search([('scale_id', 'in', scale_ids)])
+            pickings = weighings.picking_id
+            quantities = {}
+            for move in pickings.move_ids:
+                picking_quantities = quantities.setdefault(move.picking_id.id, {})
+                product = move.product_id.display_name
+                picking_quantities[product] = round(picking_quantities.get(product, 0.0) + move.quantity, 3)
+            return {
+                'weighings': {
+                    str(weighing.id): dict(
+                        {name: weighing[name] for name in WEIGHING_FIELDS},
+                        scale_id=weighing.scale_id.id, picking_id=weighing.picking_id.id or None,
+                    )
+                    for weighing in weighings
+                },
+                'pickings': {
+                    str(picking.id): {
+                        'name': picking.name,
+                        'state': picking.state,
+                        'quantities': quantities.get(picking.id, {}),
+                    }
+                    for picking in pickings
+                },
+            }
+
+    def _finish(self, registry, replayer, report, options):
+        """ Wait until the queued readings of the replay are applied, then snapshot """
+        prefix = replayer.key_prefix() + '%'
+        deadline = time.monotonic() + options.drain_timeout
+        while True:
+            with registry.cursor() as cr:
+                cr.execute(SQL(
+                    "SELECT COUNT(*) FROM weighing_scale_ingestion WHERE key LIKE %s AND state = 'pending'", prefix))
+                pending = cr.fetchone()[0]
+            if not pending or time.monotonic() >= deadline:
+                break
+            time.sleep(1)
+        if pending:
+            _logger.warning("%s replayed reading(s) still pending after %s s", pending, options.drain_timeout)
+        with registry.cursor() as cr:
+            cr.execute(SQL(
+                "SELECT state, COUNT(*) FROM weighing_scale_ingestion WHERE key LIKE %s GROUP BY state", prefix))
+            states = dict(cr.fetchall())
+            # Percentiles do not combine, compute them over all applied readings at once
+            cr.execute(SQL(
+                """
+                SELECT AVG(apply_latency), percentile_cont(0.95) WITHIN GROUP (ORDER BY apply_latency)
+                  FROM weighing_scale_ingestion
+                 WHERE key LIKE %s
+                   AND state != 'pending'
+                   AND apply_latency IS NOT NULL
+                """,
+                prefix,
+            ))
+            latency_avg, latency_p95 = cr.fetchone()
+        report['apply'] = {
+            'states': states,
+            'pending': pending,
+            'latency_avg': round(latency_avg, 3) if latency_avg is not None else None,
+            'latency_p95': round(latency_p95, 3) if latency_p95 is not None else None,
+        }
+        _logger.info("Applied readings: %s", report['apply'])
+        return self._snapshot(registry, replayer)
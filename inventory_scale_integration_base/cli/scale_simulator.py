@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+"""``odoo-bin scale_simulator``: simulated weighbridges for development and load tests."""
+import sys
+
+from odoo.cli import Command
+from odoo.tools import config
+
+from odoo.addons.inventory_scale_integration_base.tools import scale_simulator
+
+
+class ScaleSimulatorCommand(Command):
+    """Serve simulated weighing scales and push their readings"""
+    name = 'scale_simulator'
+
+    def run(self, cmdargs):
+        options, odoo_args = scale_simulator.parse_options(
+            cmdargs, prog=f'{sys.argv[0].split("/")[-1]} {self.name}', known=True)
+        config.parse_config(odoo_args, setup_logging=True)
+        scale_simulator.serve(options)
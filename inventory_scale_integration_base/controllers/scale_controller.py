@@ -3,62 +3,88 @@ from odoo import http
 from odoo.http import request
 import json
 import logging
+import zlib
 
 _logger = logging.getLogger(__name__)
 
+# Largest decompressed body of a gzip encoded push
+MAX_INFLATED_SIZE = 64 * 1024 * 1024
+
 class ScaleController(http.Controller):
 
+    def _get_json_payload(self):
+        """ JSON body of the request, gzip encoded bodies are inflated first """
+        data = request.httprequest.get_data()
+        if request.httprequest.headers.get('Content-Encoding', '').lower() == 'gzip':
+            inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            data = inflater.decompress(data, MAX_INFLATED_SIZE)
+            if inflater.unconsumed_tail:
+                raise ValueError("Request body too large once decompressed.")
+        return json.loads(data.decode('utf-8'))
+
+    @http.route('/scale/live_weight', type='http', auth='user', methods=['GET'])
+    def live_weight(self, scale_id=None, **kwargs):
+        """
+        Latest readings published by the scale poller in shared memory,
+        for all enabled scales or the one given by 'scale_id'.
+        """
+        readings = request.env['weighing.scale'].get_live_readings()
+        if scale_id:
+            readings = [reading for reading in readings if reading['id'] == int(scale_id)]
+        return json.dumps({'readings': readings, 'success': True})
+
     @http.route('/scale/receive_weight', type='http', auth='none', methods=['POST'], csrf=False)
     def receive_weight_from_scale(self, **kwargs):
         """
         API Endpoint to receive raw weight data from the external Python middleware.
-        The middleware must send 'weight' only.
+        The middleware must send 'weight' and the id of its scale in 'scale_id',
+        which may be omitted when a single scale is enabled. In the default
+        'queue' mode the reading is stored and applied in the background, in
+        'sync' mode it is applied within the request. An optional 'key' makes
+        it idempotent as in the batch endpoint.
         """
         try:
-            data = json.loads(request.httprequest.data.decode('utf-8'))
+            data = self._get_json_payload()
             weight = data.get('weight')
             if not weight:
                 return json.dumps({'error': "Missing 'weight' in the request payload.", 'success': False})
 
-            weight = float(weight)
-
-            _logger.info("Received weight: %s KG", weight)
-
-            # البحث عن أحدث عملية موازنة مفتوحة
-            weighing_record = request.env['truck.weighing'].sudo().search([
-                ('state', 'in', ['draft', 'gross'])
-            ], limit=1, order='create_date desc')
-
-            if not weighing_record:
-                return json.dumps({'error': "No active weighing record found. Please create a weighing record first.", 'success': False})
+            Ingestion = request.env['weighing.scale.ingestion'].sudo()
+            reading = dict(data, key=data.get('key') or Ingestion._new_key())
+            if Ingestion._get_mode() == 'queue':
+                result = Ingestion._enqueue([reading])[0]
+            else:
+                # Recorded as ingested readings too, so that captures cover sync mode
+                result = Ingestion._ingest([reading])[0]
+            return json.dumps(result)
 
-            # 1. تسجيل الوزن القائم (Gross)
-            if weighing_record.state == 'draft':
-                weighing_record.sudo().write({
-                    'gross_weight': weight,
-                    'state': 'gross',
-                })
-                message = f"Gross Weight ({weight} KG) recorded for {weighing_record.name} - Truck: {weighing_record.truck_plate}."
-            
-            # 2. تسجيل الوزن الفارغ (Tare)
-            elif weighing_record.state == 'gross':
-                if weight >= weighing_record.gross_weight:
-                    # تفريغ غير مكتمل أو خطأ في الميزان
-                    return json.dumps({'error': f"Tare Weight ({weight} KG) must be less than Gross Weight ({weighing_record.gross_weight} KG). Please re-weigh the empty truck.", 'success': False})
-                    
-                weighing_record.sudo().write({
-                    'tare_weight': weight,
-                    'state': 'tare',
-                })
-                # بعد تسجيل الوزن الفارغ، يتم حساب الوزن الصافي وتحديث المخزون
-                weighing_record.sudo().action_update_inventory()
-                message = f"Tare Weight ({weight} KG) recorded. Net Weight: {weighing_record.net_weight} KG. Inventory updated for {weighing_record.name} - Truck: {weighing_record.truck_plate}."
+        except Exception as e:
+            _logger.error("Error receiving weight data: %s", str(e))
+            return json.dumps({'error': str(e), 'success': False})
 
+    @http.route('/scale/receive_weight/batch', type='http', auth='none', methods=['POST'], csrf=False)
+    def receive_weight_batch(self, **kwargs):
+        """
+        Batch variant of /scale/receive_weight for middlewares draining a backlog.
+        The payload is {"readings": [{"key": ..., "scale_id": ..., "weight": ...,
+        "timestamp": ...}, ...]}, optionally gzip encoded; 'key' makes each
+        reading idempotent, a replayed key returns the result of its first
+        delivery. The response holds one
+        result per reading: in 'queue' mode the readings are stored and applied
+        in the background, in 'sync' mode the batch is applied in one transaction.
+        """
+        try:
+            data = self._get_json_payload()
+            readings = data.get('readings') if isinstance(data, dict) else data
+            if not isinstance(readings, list):
+                return json.dumps({'error': "Missing 'readings' list in the request payload.", 'success': False})
+            Ingestion = request.env['weighing.scale.ingestion'].sudo()
+            if Ingestion._get_mode() == 'queue':
+                results = Ingestion._enqueue(readings)
             else:
-                 return json.dumps({'error': f"Weighing record {weighing_record.name} is in an unexpected state: {weighing_record.state}.", 'success': False})
-
-            return json.dumps({'message': message, 'success': True})
+                results = Ingestion._ingest(readings)
+            return json.dumps({'results': results, 'success': True})
 
         except Exception as e:
-            _logger.error("Error receiving weight data: %s", str(e))
-            return json.dumps({'error': str(e), 'success': False})
\ No newline at end of file
+            _logger.error("Error receiving weight batch: %s", str(e))
+            return json.dumps({'error': str(e), 'success': False})
@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+from odoo import api, SUPERUSER_ID
+
+
+def migrate(cr, version):
+    """ Fill the truck statistics, maintained incrementally from this version on """
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    env['truck.fleet']._recompute_weighing_stats()
@@ -1,6 +1,12 @@
 # -*- coding: utf-8 -*-
 from . import weighing_scale
+from . import weighing_scale_reading
+from . import weighing_scale_ingestion
 from . import truck_weighing
+from . import truck_weighing_platform_reading
 from . import truck_fleet
 from . import weighing_overview
-from . import product_product
\ No newline at end of file
+from . import product_product
+from . import stock_picking
+from . import weighing_dashboard_counter
+from . import weighing_overview_cache
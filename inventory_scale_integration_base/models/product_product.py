@@ -8,4 +8,22 @@ class ProductTemplate(models.Model):
         string='Weighable Product',
         default=False,
         help='Enable this product for weighbridge operations. Only weighable products will appear in stock operations for weighing.'
-    )
\ No newline at end of file
+    )
+    single_pass_weighing = fields.Boolean(
+        string='Allow Single-Pass Weighing',
+        default=False,
+        help='Trucks in single-pass weighing carry this product with the net weight computed from their registered tare, without a second pass on the scale.'
+    )
+
+
+class ProductProduct(models.Model):
+    _inherit = 'product.product'
+
+    def _get_weight_kg(self, qty, uom):
+        """ Convert a quantity of this product in ``uom`` to KG, through the
+        unit itself for weight units and through the product weight otherwise """
+        self.ensure_one()
+        kg = self.env.ref('uom.product_uom_kgm')
+        if uom._has_common_reference(kg):
+            return uom._compute_quantity(qty, kg, round=False)
+        return uom._compute_quantity(qty, self.uom_id, round=False) * self.weight
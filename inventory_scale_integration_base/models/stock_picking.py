@@ -7,22 +7,68 @@ class StockPicking(models.Model):
     total_net_weight = fields.Float(compute='_compute_weighing_data', string='Total Net Weight')
     total_net_weight_display = fields.Char(compute='_compute_weighing_data', string='Weight Display')
     has_weighable_products = fields.Boolean(compute='_compute_has_weighable_products')
+    weighing_ids = fields.One2many('truck.weighing', 'picking_id', string='Weighing Records')
+    needs_weighing = fields.Boolean(string='Needs Weighing', compute='_compute_needs_weighing', store=True, index=True,
+                                    help="Ready receipt or delivery with weighable products and no weighing record yet")
+    weighing_pending_qty = fields.Float(string='Quantity to Weigh', compute='_compute_needs_weighing', store=True,
+                                        help="Demand of the weighable products in KG not covered by completed weighings")
 
     @api.depends('move_ids.product_id.is_weighable')
     def _compute_has_weighable_products(self):
         for picking in self:
             picking.has_weighable_products = any(move.product_id.is_weighable for move in picking.move_ids)
 
+    @api.depends('state', 'picking_type_id.code', 'move_ids.product_id.is_weighable', 'move_ids.product_id.weight',
+                 'move_ids.product_uom', 'move_ids.product_uom_qty',
+                 'weighing_ids.active', 'weighing_ids.state', 'weighing_ids.net_weight')
+    def _compute_needs_weighing(self):
+        for picking in self:
+            weighable_moves = picking.move_ids.filtered(lambda m: m.product_id.is_weighable)
+            weighed = sum(picking.weighing_ids.filtered(lambda w: w.state == 'done').mapped('net_weight'))
+            demand = sum(move.product_id._get_weight_kg(move.product_uom_qty, move.product_uom) for move in weighable_moves)
+            picking.weighing_pending_qty = max(demand - weighed, 0.0)
+            picking.needs_weighing = bool(
+                weighable_moves
+                and picking.state in ('assigned', 'confirmed')
+                and picking.picking_type_id.code in ('incoming', 'outgoing')
+                and not picking.weighing_ids
+            )
+
+    @api.depends('weighing_ids.net_weight')
     def _compute_weighing_data(self):
+        totals = self.env['truck.weighing']._read_weighing_totals('picking_id', self)
         for picking in self:
-            weighings = self.env['truck.weighing'].search([('picking_id', '=', picking.id)])
-            picking.weighing_count = len(weighings)
-            picking.total_net_weight = sum(weighings.mapped('net_weight'))
+            picking.weighing_count, picking.total_net_weight = totals.get(picking._origin.id, (0, 0.0))
             if picking.total_net_weight > 2000:
                 picking.total_net_weight_display = f"{picking.total_net_weight / 1000:.1f} T"
             else:
                 picking.total_net_weight_display = f"{picking.total_net_weight:.0f} KG"
 
+    def _invalidate_weighing_overview(self):
+        """ Invalidate the overview cache when weighable pickings change """
+        if any(self.move_ids.product_id.mapped('is_weighable')):
+            self.env['weighing.overview.cache']._invalidate()
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        pickings = super(StockPicking, self).create(vals_list)
+        pickings._invalidate_weighing_overview()
+        return pickings
+
+    def write(self, vals):
+        res = super(StockPicking, self).write(vals)
+        self._invalidate_weighing_overview()
+        return res
+
+    def unlink(self):
+        self._invalidate_weighing_overview()
+        return super(StockPicking, self).unlink()
+
+    def _compute_state(self):
+        # State follows the moves and is not written through write()
+        super(StockPicking, self)._compute_state()
+        self._invalidate_weighing_overview()
+
     def action_view_weighing_records(self):
         weighings = self.env['truck.weighing'].search([('picking_id', '=', self.id)])
         return {
@@ -1,6 +1,13 @@
 # -*- coding: utf-8 -*-
 from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError
+from odoo.tools import SQL
+from collections import defaultdict
+from datetime import timedelta
+import statistics
+
+STORED_TARE_SAMPLES_PARAM = 'inventory_scale_integration_base.stored_tare_samples'
+DEFAULT_STORED_TARE_SAMPLES = 3
 
 class TruckFleet(models.Model):
     _name = 'truck.fleet'
@@ -18,14 +25,36 @@ class TruckFleet(models.Model):
     max_weight_per_trailer = fields.Float(string='Max Weight per Trailer (KG)', tracking=True)
     total_max_weight = fields.Float(string='Total Max Weight (KG)', compute='_compute_total_max_weight', store=True, tracking=True)
     tare_weight = fields.Float(string='Empty Truck Weight (KG)', help="Weight of empty truck", tracking=True)
+
+    # Single-pass weighing: the net weight comes from the registered tare, the truck is weighed loaded only
+    single_pass = fields.Boolean(string='Single-Pass Weighing', tracking=True,
+                                 help="Complete the weighings of this truck with its registered tare, for the products "
+                                      "allowing it. The tare is refreshed from the tares measured on the scale.")
+    tare_date = fields.Datetime(string='Tare Registered On', readonly=True, copy=False, tracking=True)
+    tare_validity_days = fields.Integer(string='Tare Validity (Days)', default=30,
+                                        help="Days the registered tare stays usable, 0 keeps it forever")
+    tare_tolerance = fields.Float(string='Tare Tolerance (KG)', default=100.0,
+                                  help="Largest deviation of a measured tare from the registered one. Beyond it the "
+                                       "registered tare is suspended until the truck is weighed empty again.")
+    tare_weighing_id = fields.Many2one('truck.weighing', string='Tare Measured In', readonly=True, copy=False)
+    tare_valid = fields.Boolean(string='Registered Tare Usable', compute='_compute_tare_valid')
     
     # Company & Status
     company_id = fields.Many2one('res.company', string='Company', default=lambda self: self.env.company)
     active = fields.Boolean(default=True)
     
-    # Statistics
-    weighing_count = fields.Integer(string='Weighing Records', compute='_compute_weighing_count')
-    last_weighing_date = fields.Datetime(string='Last Weighing', compute='_compute_weighing_count')
+    # Statistics, maintained incrementally by truck.weighing (see _apply_weighing_snapshots)
+    weighing_count = fields.Integer(string='Weighing Records', readonly=True, copy=False)
+    last_weighing_date = fields.Datetime(string='Last Weighing', readonly=True, copy=False)
+    stats_month = fields.Date(string='Statistics Month', readonly=True, copy=False)
+    month_net_weight = fields.Float(string='Net Weight This Month (KG)', readonly=True, copy=False)
+    done_weighing_count = fields.Integer(string='Completed Weighings', readonly=True, copy=False)
+    done_net_weight = fields.Float(string='Total Net Weight (KG)', readonly=True, copy=False)
+    avg_net_weight = fields.Float(string='Average Net Weight (KG)', readonly=True, copy=False)
+    turnaround_count = fields.Integer(string='Timed Weighings', readonly=True, copy=False)
+    turnaround_seconds = fields.Float(string='Total Turnaround (s)', readonly=True, copy=False)
+    avg_turnaround = fields.Float(string='Average Turnaround (Hours)', readonly=True, copy=False,
+                                  help="Average time between gross and tare capture of completed weighings")
     
     # Additional Info
     notes = fields.Text(string='Notes')
@@ -35,12 +64,223 @@ class TruckFleet(models.Model):
         for truck in self:
             truck.total_max_weight = truck.trailer_count * truck.max_weight_per_trailer
     
-    def _compute_weighing_count(self):
+    @api.depends('single_pass', 'tare_weight', 'tare_date', 'tare_validity_days')
+    def _compute_tare_valid(self):
+        now = fields.Datetime.now()
         for truck in self:
-            weighings = self.env['truck.weighing'].search([('truck_id', '=', truck.id)])
-            truck.weighing_count = len(weighings)
-            truck.last_weighing_date = weighings[0].weighing_date if weighings else False
-    
+            truck.tare_valid = bool(truck._get_stored_tare(now))
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        for vals in vals_list:
+            if vals.get('tare_weight') and 'tare_date' not in vals:
+                vals['tare_date'] = fields.Datetime.now()
+        self.env['weighing.overview.cache']._invalidate()
+        return super().create(vals_list)
+
+    def write(self, vals):
+        if 'tare_weight' in vals and 'tare_date' not in vals:
+            # A tare entered by hand is registered now
+            vals = dict(vals, tare_date=fields.Datetime.now() if vals['tare_weight'] else False, tare_weighing_id=False)
+        self.env['weighing.overview.cache']._invalidate()
+        return super().write(vals)
+
+    def unlink(self):
+        self.env['weighing.overview.cache']._invalidate()
+        return super().unlink()
+
+    def _get_stored_tare(self, now=None):
+        """ Registered tare usable for single-pass weighing, 0.0 when there is none """
+        self.ensure_one()
+        if not self.single_pass or self.tare_weight <= 0 or not self.tare_date:
+            return 0.0
+        if self.tare_validity_days and self.tare_date + timedelta(days=self.tare_validity_days) < (now or fields.Datetime.now()):
+            return 0.0
+        return self.tare_weight
+
+    def _register_measured_tare(self, weighing):
+        """ Refresh the registered tare from a tare measured on the scale.
+
+        The registered tare becomes the median of the recent measured tares.
+        A measured tare deviating from the registered one by more than the
+        tolerance suspends it instead: the truck may have changed, or the
+        measure be wrong, and the next empty weighing registers it again.
+        """
+        self.ensure_one()
+        if not self.single_pass or weighing.tare_weight <= 0:
+            return
+        stored = self._get_stored_tare()
+        if stored and self.tare_tolerance and abs(weighing.tare_weight - stored) > self.tare_tolerance:
+            super(TruckFleet, self).write({'tare_date': False})
+            self.message_post(body=_(
+                "Registered tare of %(stored)s KG suspended: %(weighing)s measured %(measured)s KG, "
+                "beyond the tolerance of %(tolerance)s KG."
+            ) % {'stored': stored, 'weighing': weighing.name, 'measured': weighing.tare_weight,
+                 'tolerance': self.tare_tolerance})
+            return
+        weights = [weighing.tare_weight]
+        if self.tare_date:
+            # Measured tares still within the validity window, the newest first
+            domain = [('truck_id', '=', self.id), ('tare_source', '=', 'measured'), ('tare_weight', '>', 0),
+                      ('tare_date', '!=', False), ('id', '!=', weighing.id)]
+            if self.tare_validity_days:
+                domain.append(('tare_date', '>=', fields.Datetime.now() - timedelta(days=self.tare_validity_days)))
+            samples = int(self.env['ir.config_parameter'].sudo().get_param(
+                STORED_TARE_SAMPLES_PARAM, DEFAULT_STORED_TARE_SAMPLES))
+            recent = self.env['truck.weighing'].search(domain, order='tare_date desc, id desc', limit=max(samples - 1, 0))
+            weights += recent.mapped('tare_weight')
+        super(TruckFleet, self).write({
+            'tare_weight': round(statistics.median(weights), 2),
+            'tare_date': weighing.tare_date or fields.Datetime.now(),
+            'tare_weighing_id': weighing.id,
+        })
+
+    _WEIGHING_STATS_FIELDS = [
+        'weighing_count', 'last_weighing_date', 'stats_month', 'month_net_weight', 'done_weighing_count',
+        'done_net_weight', 'avg_net_weight', 'turnaround_count', 'turnaround_seconds', 'avg_turnaround',
+    ]
+
+    @api.model
+    def _apply_weighing_snapshots(self, before, after):
+        """Move weighing snapshots out of (before) and into (after) the truck statistics.
+
+        Snapshots are the dicts of ``truck.weighing._get_stats_snapshot()``.
+        Sums are adjusted with one UPDATE; the last weighing date is only
+        recomputed, on the truck_id index, for trucks whose latest weighing
+        date was moved out and not replaced by a date at least as recent.
+        """
+        month = fields.Date.today().replace(day=1)
+        deltas = defaultdict(lambda: {'count': 0, 'done_count': 0, 'done_net': 0.0, 'month_net': 0.0,
+                                      'turnaround_count': 0, 'turnaround_seconds': 0.0, 'last_date': None})
+        # Latest weighing date moved out of each truck
+        lost = {}
+        for snapshots, sign in ((before, -1), (after, 1)):
+            for snap in snapshots:
+                if not snap['active'] or not snap['truck_id']:
+                    continue
+                delta = deltas[snap['truck_id']]
+                delta['count'] += sign
+                date = snap['weighing_date']
+                if sign < 0:
+                    if date and (snap['truck_id'] not in lost or date > lost[snap['truck_id']]):
+                        lost[snap['truck_id']] = date
+                elif date and (delta['last_date'] is None or date > delta['last_date']):
+                    delta['last_date'] = date
+                if snap['state'] != 'done':
+                    continue
+                net_weight = snap['net_weight'] or 0.0
+                delta['done_count'] += sign
+                delta['done_net'] += sign * net_weight
+                if date and date.date().replace(day=1) == month:
+                    delta['month_net'] += sign * net_weight
+                if snap['gross_date'] and snap['tare_date']:
+                    delta['turnaround_count'] += sign
+                    delta['turnaround_seconds'] += sign * abs((snap['tare_date'] - snap['gross_date']).total_seconds())
+        lost = {
+            truck_id: date for truck_id, date in lost.items()
+            if deltas[truck_id]['last_date'] is None or deltas[truck_id]['last_date'] < date
+        }
+        rows = [
+            SQL("(%s, %s, %s, %s, %s, %s, %s, %s::timestamp)", truck_id, d['count'], d['done_count'], d['done_net'],
+                d['month_net'], d['turnaround_count'], d['turnaround_seconds'], d['last_date'])
+            for truck_id, d in deltas.items()
+        ]
+        if not rows:
+            return
+        self.env.cr.execute(SQL(
+            """
+            UPDATE truck_fleet t
+               SET weighing_count = COALESCE(t.weighing_count, 0) + d.count,
+                   done_weighing_count = COALESCE(t.done_weighing_count, 0) + d.done_count,
+                   done_net_weight = COALESCE(t.done_net_weight, 0) + d.done_net,
+                   avg_net_weight = (COALESCE(t.done_net_weight, 0) + d.done_net)
+                                    / NULLIF(COALESCE(t.done_weighing_count, 0) + d.done_count, 0),
+                   month_net_weight = CASE WHEN t.stats_month = %s THEN COALESCE(t.month_net_weight, 0) ELSE 0 END
+                                      + d.month_net,
+                   stats_month = %s,
+                   turnaround_count = COALESCE(t.turnaround_count, 0) + d.turnaround_count,
+                   turnaround_seconds = COALESCE(t.turnaround_seconds, 0) + d.turnaround_seconds,
+                   avg_turnaround = (COALESCE(t.turnaround_seconds, 0) + d.turnaround_seconds) / 3600.0
+                                    / NULLIF(COALESCE(t.turnaround_count, 0) + d.turnaround_count, 0),
+                   last_weighing_date = GREATEST(t.last_weighing_date, d.last_date)
+              FROM (VALUES %s) AS d(id, count, done_count, done_net, month_net,
+                                    turnaround_count, turnaround_seconds, last_date)
+             WHERE t.id = d.id
+            """,
+            month, month, SQL(", ").join(rows),
+        ))
+        if lost:
+            self.env['truck.weighing'].flush_model(['truck_id', 'weighing_date', 'active'])
+            self.env.cr.execute(SQL(
+                """
+                UPDATE truck_fleet t
+                   SET last_weighing_date = (SELECT MAX(w.weighing_date)
+                                               FROM truck_weighing w
+                                              WHERE w.truck_id = t.id AND w.active)
+                  FROM (VALUES %s) AS l(id, lost_date)
+                 WHERE t.id = l.id AND t.last_weighing_date <= l.lost_date
+                """,
+                SQL(", ").join(SQL("(%s, %s::timestamp)", truck_id, date) for truck_id, date in lost.items()),
+            ))
+        self.invalidate_model(self._WEIGHING_STATS_FIELDS)
+
+    @api.model
+    def _recompute_weighing_stats(self):
+        """ Recompute the statistics of all trucks from the weighing table """
+        self.env['truck.weighing'].flush_model()
+        month = fields.Date.today().replace(day=1)
+        next_month = (month + timedelta(days=32)).replace(day=1)
+        self.env.cr.execute(SQL(
+            """
+            UPDATE truck_fleet t
+               SET weighing_count = COALESCE(s.count, 0),
+                   last_weighing_date = s.last_date,
+                   done_weighing_count = COALESCE(s.done_count, 0),
+                   done_net_weight = COALESCE(s.done_net, 0),
+                   avg_net_weight = s.done_net / NULLIF(s.done_count, 0),
+                   stats_month = %s,
+                   month_net_weight = COALESCE(s.month_net, 0),
+                   turnaround_count = COALESCE(s.turnaround_count, 0),
+                   turnaround_seconds = COALESCE(s.turnaround_seconds, 0),
+                   avg_turnaround = s.turnaround_seconds / 3600.0 / NULLIF(s.turnaround_count, 0)
+              FROM truck_fleet f
+         LEFT JOIN (
+                SELECT truck_id,
+                       COUNT(*) AS count,
+                       MAX(weighing_date) AS last_date,
+                       COUNT(*) FILTER (WHERE state = 'done') AS done_count,
+                       SUM(COALESCE(net_weight, 0)) FILTER (WHERE state = 'done') AS done_net,
+                       SUM(COALESCE(net_weight, 0)) FILTER (WHERE state = 'done' AND weighing_date >= %s AND weighing_date < %s)
+                           AS month_net,
+                       COUNT(*) FILTER (WHERE state = 'done' AND gross_date IS NOT NULL AND tare_date IS NOT NULL)
+                           AS turnaround_count,
+                       SUM(ABS(EXTRACT(EPOCH FROM tare_date - gross_date)))
+                           FILTER (WHERE state = 'done' AND gross_date IS NOT NULL AND tare_date IS NOT NULL)
+                           AS turnaround_seconds
+                  FROM truck_weighing
+                 WHERE active
+              GROUP BY truck_id
+                ) s ON s.truck_id = f.id
+             WHERE t.id = f.id
+            """,
+            month, month, next_month,
+        ))
+        self.invalidate_model(self._WEIGHING_STATS_FIELDS)
+
+    @api.model
+    def _cron_reset_month_stats(self):
+        """ Start the monthly net weight over for trucks not weighed yet this month """
+        month = fields.Date.today().replace(day=1)
+        self.env.cr.execute(SQL(
+            """
+            UPDATE truck_fleet
+               SET month_net_weight = 0, stats_month = %s
+             WHERE stats_month IS NULL OR stats_month < %s
+            """,
+            month, month,
+        ))
+        self.invalidate_model(['month_net_weight', 'stats_month'])
+
     def action_view_weighing_records(self):
         return {
             'name': 'Weighing Records',
@@ -1,7 +1,10 @@
 # -*- coding: utf-8 -*-
-from odoo import models, fields, api, _
+from odoo import models, fields, api, Command, _
 from odoo.exceptions import UserError
+from odoo.tools import SQL
+from odoo.tools.sql import create_index
 import logging
+from datetime import datetime, timedelta, timezone
 
 _logger = logging.getLogger(__name__)
 
@@ -20,7 +23,7 @@ class TruckWeighing(models.Model):
     user_scale_ids = fields.Many2many('weighing.scale', compute='_compute_user_scales')
     
     # Truck & Material Info
-    truck_id = fields.Many2one('truck.fleet', string='Truck', required=True, tracking=True)
+    truck_id = fields.Many2one('truck.fleet', string='Truck', required=True, index=True, tracking=True)
     truck_plate = fields.Char(string='Plate Number', related='truck_id.plate_number', store=True, readonly=True)
     driver_name = fields.Char(string='Driver Name', related='truck_id.driver_name', readonly=False)
     
@@ -29,15 +32,48 @@ class TruckWeighing(models.Model):
 
     # Weight Fields
     live_weight = fields.Float(string='Live Weight (KG)', readonly=True)
+    live_weight_date = fields.Datetime(string='Live Weight Date', readonly=True, copy=False)
     gross_weight = fields.Float(string='Gross Weight (KG)', tracking=True)
     tare_weight = fields.Float(string='Tare Weight (KG)', tracking=True)
     net_weight = fields.Float(string='Net Weight (KG)', compute='_compute_net_weight', store=True, tracking=True)
     
     # Dates
-    weighing_date = fields.Datetime(string='Weighing Date', default=fields.Datetime.now, tracking=True)
+    weighing_date = fields.Datetime(string='Weighing Date', default=fields.Datetime.now, index=True, tracking=True)
     gross_date = fields.Datetime(string='Gross Weight Date', readonly=True)
     tare_date = fields.Datetime(string='Tare Weight Date', readonly=True)
 
+    # Window of weighing.scale.reading rows behind each capture
+    gross_reading_start = fields.Datetime(string='Gross Readings From', readonly=True, copy=False)
+    gross_reading_end = fields.Datetime(string='Gross Readings To', readonly=True, copy=False)
+    gross_reading_count = fields.Integer(string='Gross Readings', compute='_compute_reading_counts')
+    tare_reading_start = fields.Datetime(string='Tare Readings From', readonly=True, copy=False)
+    tare_reading_end = fields.Datetime(string='Tare Readings To', readonly=True, copy=False)
+    tare_reading_count = fields.Integer(string='Tare Readings', compute='_compute_reading_counts')
+
+    # Statistics of the stable window each capture was taken from
+    gross_stable_samples = fields.Integer(string='Gross Samples', readonly=True, copy=False)
+    gross_stable_spread = fields.Float(string='Gross Spread (KG)', readonly=True, copy=False)
+    gross_stable_stddev = fields.Float(string='Gross Std Dev (KG)', readonly=True, copy=False)
+    gross_stable_duration = fields.Float(string='Gross Stable For (s)', readonly=True, copy=False)
+    tare_stable_samples = fields.Integer(string='Tare Samples', readonly=True, copy=False)
+    tare_stable_spread = fields.Float(string='Tare Spread (KG)', readonly=True, copy=False)
+    tare_stable_stddev = fields.Float(string='Tare Std Dev (KG)', readonly=True, copy=False)
+    tare_stable_duration = fields.Float(string='Tare Stable For (s)', readonly=True, copy=False)
+
+    # Where the tare comes from: weighed empty, or the registered tare of the truck in single-pass weighing
+    tare_source = fields.Selection([
+        ('measured', 'Measured'),
+        ('stored', 'Registered Truck Tare'),
+    ], string='Tare Source', readonly=True, copy=False, tracking=True)
+    stored_tare_date = fields.Datetime(string='Registered Tare Date', readonly=True, copy=False,
+                                       help="When the registered tare used for this weighing was measured or entered")
+    single_pass = fields.Boolean(string='Single-Pass', compute='_compute_single_pass',
+                                 help="The truck's registered tare can complete this weighing without a tare pass")
+
+    # Readings of each platform when the scale is a platform group
+    platform_reading_ids = fields.One2many('truck.weighing.platform.reading', 'weighing_id',
+                                           string='Platform Readings', readonly=True, copy=False)
+
     # Stock Links
     partner_id = fields.Many2one('res.partner', string='Partner', tracking=True)
     picking_id = fields.Many2one('stock.picking', string='Stock Operation', ondelete='restrict', tracking=True)
@@ -60,19 +96,57 @@ class TruckWeighing(models.Model):
     
     # Notes
     notes = fields.Text(string='Notes')
-                    
+
+    # Fields feeding the weighing.dashboard.counter table and the truck.fleet statistics
+    _STATS_FIELDS = {'active', 'company_id', 'scale_id', 'truck_id', 'state', 'weighing_date',
+                     'gross_weight', 'tare_weight', 'net_weight', 'gross_date', 'tare_date'}
+
+    def init(self):
+        # Open weighings of a scale, newest first: the weighing a pushed weight is claimed for
+        create_index(self.env.cr, 'truck_weighing_scale_open_index', self._table,
+                     ['scale_id', 'create_date DESC', 'id DESC'], where="state IN ('draft', 'gross') AND active")
+
     @api.model
     def get_dashboard_data(self):
         """ Get statistics for dashboard """
         today = fields.Date.today()
+        Counter = self.env['weighing.dashboard.counter']
+        company_domain = [('company_id', 'in', self.env.companies.ids + [False])]
+        counts = dict(Counter._read_group(company_domain, ['state'], ['count:sum']))
+        done_today, weight_today, _seconds = Counter._aggregate(
+            company_domain + [('state', '=', 'done'), ('day', '>=', today)])
         return {
-            'draft_count': self.search_count([('state', '=', 'draft')]),
-            'gross_count': self.search_count([('state', '=', 'gross')]),
-            'tare_count': self.search_count([('state', '=', 'tare')]),
-            'done_today': self.search_count([('state', '=', 'done'), ('weighing_date', '>=', today)]),
-            'total_weight_today': sum(self.search([('state', '=', 'done'), ('weighing_date', '>=', today)]).mapped('net_weight')),
+            'draft_count': counts.get('draft') or 0,
+            'gross_count': counts.get('gross') or 0,
+            'tare_count': counts.get('tare') or 0,
+            'done_today': done_today,
+            'total_weight_today': weight_today,
         }
 
+    @api.model
+    def _read_weighing_totals(self, link_field, records):
+        """ Count and net weight of the weighings linked through link_field, one grouped query per batch """
+        groups = self._read_group([(link_field, 'in', records._origin.ids)], [link_field], ['__count', 'net_weight:sum'])
+        return {linked.id: (count, net_weight or 0.0) for linked, count, net_weight in groups}
+
+    def _get_stats_snapshot(self):
+        """ Values of the counted fields, one dict per record """
+        return [{
+            'active': record.active,
+            'company_id': record.company_id.id,
+            'scale_id': record.scale_id.id,
+            'truck_id': record.truck_id.id,
+            'state': record.state,
+            'weighing_date': record.weighing_date,
+            'net_weight': record.net_weight,
+            'gross_date': record.gross_date,
+            'tare_date': record.tare_date,
+        } for record in self]
+
+    def _update_stats(self, before, after):
+        self.env['weighing.dashboard.counter'].sudo()._apply_snapshots(before, after)
+        self.env['truck.fleet'].sudo()._apply_weighing_snapshots(before, after)
+
 
     
     @api.depends('gross_weight', 'tare_weight')
@@ -84,6 +158,73 @@ class TruckWeighing(models.Model):
             else:
                 record.net_weight = 0.0
     
+    @api.depends('scale_id', 'gross_reading_start', 'gross_reading_end', 'tare_reading_start', 'tare_reading_end')
+    def _compute_reading_counts(self):
+        Reading = self.env['weighing.scale.reading']
+        for record in self:
+            record.gross_reading_count = record.tare_reading_count = 0
+            if not record.scale_id:
+                continue
+            if record.gross_reading_start:
+                record.gross_reading_count = Reading.search_count(
+                    Reading._get_window_domain(record.scale_id, record.gross_reading_start, record.gross_reading_end))
+            if record.tare_reading_start:
+                record.tare_reading_count = Reading.search_count(
+                    Reading._get_window_domain(record.scale_id, record.tare_reading_start, record.tare_reading_end))
+
+    @api.depends('truck_id', 'product_id')
+    def _compute_single_pass(self):
+        for record in self:
+            record.single_pass = bool(record._get_single_pass_tare())
+
+    def _get_single_pass_tare(self):
+        """ Registered tare of the truck when single-pass weighing applies, 0.0 otherwise """
+        self.ensure_one()
+        if not self.truck_id or not self.product_id.single_pass_weighing:
+            return 0.0
+        return self.truck_id._get_stored_tare()
+
+    def _apply_stored_tare(self):
+        """ Complete a gross weighing with the registered tare of its truck.
+        Returns False, leaving the weighing to a tare pass, when single-pass
+        weighing does not apply. """
+        self.ensure_one()
+        tare = self._get_single_pass_tare()
+        if not tare or self.state != 'gross':
+            return False
+        if tare >= self.gross_weight:
+            self.message_post(body=_("Registered tare of %s KG not used: it is not less than the gross weight, please weigh the empty truck.") % tare)
+            return False
+        self.write({
+            'tare_weight': tare,
+            'tare_date': fields.Datetime.now(),
+            'tare_source': 'stored',
+            'stored_tare_date': self.truck_id.tare_date,
+            'state': 'tare',
+        })
+        self.message_post(body=_("Registered tare of truck %s used: %s KG, registered on %s.") % (
+            self.truck_plate, tare, self.stored_tare_date))
+        return True
+
+    def _register_measured_tare(self):
+        """ Mark the tare as measured and refresh the truck's registered tare with it """
+        self.ensure_one()
+        self.tare_source = 'measured'
+        self.truck_id._register_measured_tare(self)
+
+    def action_use_stored_tare(self):
+        """ Complete the gross weighing with the registered tare instead of a tare pass """
+        self.ensure_one()
+        if not self._apply_stored_tare():
+            raise UserError(_("Single-pass weighing does not apply: the product must allow it and the truck needs a valid registered tare below the gross weight."))
+
+    def _get_capture_window(self, end=None):
+        """ Start and end of the readings behind the current live weight, or a weight read at end """
+        window = int(self.env['ir.config_parameter'].sudo().get_param(
+            'inventory_scale_integration_base.reading_capture_window', 10))
+        end = end or self.live_weight_date or fields.Datetime.now()
+        return end - timedelta(seconds=window), end
+
     @api.depends('create_uid')
     def _compute_user_scales(self):
         """ Get scales assigned to current user """
@@ -114,7 +255,10 @@ class TruckWeighing(models.Model):
                     weighable_moves = picking.move_ids.filtered(lambda m: m.product_id.is_weighable)
                     if weighable_moves:
                         vals['product_id'] = weighable_moves[0].product_id.id
-        return super(TruckWeighing, self).create(vals_list)
+        records = super(TruckWeighing, self).create(vals_list)
+        records._update_stats([], records._get_stats_snapshot())
+        self.env['weighing.overview.cache']._invalidate()
+        return records
 
     def action_fetch_live_weight(self):
         """ Fetch current weight from scale without changing state """
@@ -125,6 +269,7 @@ class TruckWeighing(models.Model):
         try:
             weight = self.scale_id.get_weight()
             self.live_weight = weight
+            self.live_weight_date = fields.Datetime.now()
             self.message_post(body=_("Live weight fetched from %s: %s KG") % (self.scale_id.name, self.live_weight))
         except Exception as e:
             raise UserError(_("Error: %s") % str(e))
@@ -132,26 +277,160 @@ class TruckWeighing(models.Model):
     def action_set_gross_from_live(self):
         """ Set gross weight from live weight and change state """
         self.ensure_one()
-        if self.live_weight > 0:
+        if self.scale_id:
+            self.write(self._capture_stable_weight('gross'))
+        elif self.live_weight > 0:
             self.gross_weight = self.live_weight
             self.gross_date = fields.Datetime.now()
-            self.state = 'gross'
-            self.message_post(body=_("Gross weight set: %s KG") % self.gross_weight)
+            self.gross_reading_start, self.gross_reading_end = self._get_capture_window()
         else:
             raise UserError(_("Please fetch live weight first."))
+        self.state = 'gross'
+        self.message_post(body=_("Gross weight set: %s KG") % self.gross_weight)
+        self._apply_stored_tare()
 
     def action_set_tare_from_live(self):
         """ Set tare weight from live weight and change state """
         self.ensure_one()
-        if self.live_weight > 0:
+        if self.scale_id:
+            vals = self._capture_stable_weight('tare')
+            if vals['tare_weight'] >= self.gross_weight:
+                raise UserError(_("Tare weight must be less than gross weight."))
+            self.write(vals)
+        elif self.live_weight > 0:
             if self.live_weight >= self.gross_weight:
                 raise UserError(_("Tare weight must be less than gross weight."))
             self.tare_weight = self.live_weight
             self.tare_date = fields.Datetime.now()
-            self.state = 'tare'
-            self.message_post(body=_("Tare weight set: %s KG") % self.tare_weight)
+            self.tare_reading_start, self.tare_reading_end = self._get_capture_window()
         else:
             raise UserError(_("Please fetch live weight first."))
+        self.state = 'tare'
+        self.message_post(body=_("Tare weight set: %s KG") % self.tare_weight)
+        self._register_measured_tare()
+
+    def _capture_stable_weight(self, kind):
+        """ Wait for a stable weight on the scale and return the values of the
+        gross or tare capture, with the statistics of the stable window """
+        platform_readings = {}
+        result = self.scale_id._wait_stable_weight(platform_readings=platform_readings)
+        weight = round(result.weight, 2)
+        now = fields.Datetime.now()
+        vals = {
+            'live_weight': weight,
+            'live_weight_date': now,
+            f'{kind}_weight': weight,
+            f'{kind}_date': now,
+            f'{kind}_reading_start': datetime.fromtimestamp(result.start, timezone.utc).replace(tzinfo=None),
+            f'{kind}_reading_end': datetime.fromtimestamp(result.end, timezone.utc).replace(tzinfo=None),
+            f'{kind}_stable_samples': result.samples,
+            f'{kind}_stable_spread': result.spread,
+            f'{kind}_stable_stddev': result.stddev,
+            f'{kind}_stable_duration': result.duration,
+        }
+        if platform_readings:
+            vals['platform_reading_ids'] = [
+                Command.unlink(reading.id) for reading in self.platform_reading_ids if reading.capture == kind
+            ] + [
+                Command.create({
+                    'capture': kind,
+                    'scale_id': scale_id,
+                    'weight': platform_weight,
+                    'stable': stable,
+                    'read_date': datetime.fromtimestamp(timestamp, timezone.utc).replace(tzinfo=None),
+                    'source': source,
+                })
+                for scale_id, (platform_weight, stable, timestamp, source, _error) in platform_readings.items()
+            ]
+        return vals
+
+    @api.model
+    def _claim_open_weighing(self, scale):
+        """ Lock the newest open weighing of scale until the end of the transaction.
+
+        Returns (weighing, busy). The row is locked with SKIP LOCKED: a push
+        never waits behind another one, it gets an empty weighing and busy
+        set when the open weighing is held by a concurrent request.
+        """
+        self.flush_model(['scale_id', 'state', 'active'])
+        newest = SQL(
+            """
+            SELECT id
+              FROM truck_weighing
+             WHERE scale_id = %s AND state IN ('draft', 'gross') AND active
+          ORDER BY create_date DESC, id DESC
+             LIMIT 1
+            """,
+            scale.id,
+        )
+        self.env.cr.execute(SQL("SELECT id FROM truck_weighing WHERE id = (%s) FOR UPDATE SKIP LOCKED", newest))
+        row = self.env.cr.fetchone()
+        if row:
+            return self.browse(row[0]), False
+        self.env.cr.execute(newest)
+        return self.browse(), bool(self.env.cr.fetchone())
+
+    def _apply_scale_weight(self, weight, read_date=None):
+        """ Record a weight pushed by the scale middleware: gross weight on a
+        draft weighing, tare weight and inventory update on a gross one.
+        read_date is when the middleware read the weight, now by default.
+        Returns the message for the middleware, raises UserError when refused.
+        """
+        self.ensure_one()
+        read_date = read_date or fields.Datetime.now()
+        reading_start, reading_end = self._get_capture_window(read_date)
+        # 1. تسجيل الوزن القائم (Gross)
+        if self.state == 'draft':
+            self.write({
+                'gross_weight': weight,
+                'gross_date': read_date,
+                'gross_reading_start': reading_start,
+                'gross_reading_end': reading_end,
+                'state': 'gross',
+            })
+            # Single-pass weighing: the registered tare completes the weighing at once
+            if self._apply_stored_tare():
+                self.action_update_inventory()
+                return f"Gross Weight ({weight} KG) recorded with the registered tare ({self.tare_weight} KG). Net Weight: {self.net_weight} KG. Inventory updated for {self.name} - Truck: {self.truck_plate}."
+            return f"Gross Weight ({weight} KG) recorded for {self.name} - Truck: {self.truck_plate}."
+
+        # 2. تسجيل الوزن الفارغ (Tare)
+        if self.state == 'gross':
+            if weight >= self.gross_weight:
+                # تفريغ غير مكتمل أو خطأ في الميزان
+                raise UserError(f"Tare Weight ({weight} KG) must be less than Gross Weight ({self.gross_weight} KG). Please re-weigh the empty truck.")
+            self.write({
+                'tare_weight': weight,
+                'tare_date': read_date,
+                'tare_reading_start': reading_start,
+                'tare_reading_end': reading_end,
+                'state': 'tare',
+            })
+            self._register_measured_tare()
+            # بعد تسجيل الوزن الفارغ، يتم حساب الوزن الصافي وتحديث المخزون
+            self.action_update_inventory()
+            return f"Tare Weight ({weight} KG) recorded. Net Weight: {self.net_weight} KG. Inventory updated for {self.name} - Truck: {self.truck_plate}."
+
+        raise UserError(f"Weighing record {self.name} is in an unexpected state: {self.state}.")
+
+    def action_view_gross_readings(self):
+        """ Scale readings around the gross weight capture """
+        self.ensure_one()
+        return self._action_view_readings(_('Gross Weight Readings'), self.gross_reading_start, self.gross_reading_end)
+
+    def action_view_tare_readings(self):
+        """ Scale readings around the tare weight capture """
+        self.ensure_one()
+        return self._action_view_readings(_('Tare Weight Readings'), self.tare_reading_start, self.tare_reading_end)
+
+    def _action_view_readings(self, name, date_from, date_to):
+        return {
+            'name': name,
+            'type': 'ir.actions.act_window',
+            'res_model': 'weighing.scale.reading',
+            'view_mode': 'list,graph',
+            'domain': self.env['weighing.scale.reading']._get_window_domain(self.scale_id, date_from, date_to),
+        }
 
     def action_complete_weighing(self):
         """ Complete weighing process """
@@ -253,7 +532,20 @@ class TruckWeighing(models.Model):
                         if weighable_moves:
                             vals['product_id'] = weighable_moves[0].product_id.id
                         break
-        return super(TruckWeighing, self).write(vals)
+        self.env['weighing.overview.cache']._invalidate()
+        if not self._STATS_FIELDS.intersection(vals):
+            return super(TruckWeighing, self).write(vals)
+        before = self._get_stats_snapshot()
+        res = super(TruckWeighing, self).write(vals)
+        self._update_stats(before, self._get_stats_snapshot())
+        return res
+
+    def unlink(self):
+        before = self._get_stats_snapshot()
+        self.env['weighing.overview.cache']._invalidate()
+        res = super(TruckWeighing, self).unlink()
+        self._update_stats(before, [])
+        return res
 
     @api.onchange('truck_id')
     def _onchange_truck_id(self):
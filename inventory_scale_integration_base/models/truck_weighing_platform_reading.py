@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields
+
+
+class TruckWeighingPlatformReading(models.Model):
+    _name = 'truck.weighing.platform.reading'
+    _description = 'Platform Reading of a Scale Group Capture'
+    _order = 'weighing_id, capture, scale_id'
+
+    weighing_id = fields.Many2one('truck.weighing', string='Weighing', required=True, readonly=True,
+                                  index=True, ondelete='cascade')
+    capture = fields.Selection([
+        ('gross', 'Gross'),
+        ('tare', 'Tare'),
+    ], string='Capture', required=True, readonly=True)
+    scale_id = fields.Many2one('weighing.scale', string='Platform', required=True, readonly=True, ondelete='restrict')
+    weight = fields.Float(string='Weight (KG)', readonly=True)
+    stable = fields.Boolean(string='Stable', readonly=True)
+    read_date = fields.Datetime(string='Read At', readonly=True)
+    source = fields.Selection([
+        ('poll', 'Poller'),
+        ('live', 'Live Read'),
+    ], string='Source', readonly=True)
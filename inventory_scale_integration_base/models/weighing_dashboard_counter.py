@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api, _
+from odoo.tools import SQL
+from odoo.tools.sql import create_unique_index
+from collections import defaultdict
+from datetime import timezone
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# SQL expression building the counter key of a truck_weighing row, must
+# match WeighingDashboardCounter._make_key()
+_WEIGHING_KEY_SQL = SQL("""CONCAT_WS('|',
+    COALESCE(company_id, 0),
+    COALESCE(TO_CHAR(weighing_date::date, 'YYYY-MM-DD'), ''),
+    COALESCE(state, ''),
+    COALESCE(scale_id, 0))""")
+
+
+class WeighingDashboardCounter(models.Model):
+    _name = 'weighing.dashboard.counter'
+    _description = 'Weighing Dashboard Counter'
+    _log_access = False
+    _order = 'day desc, id desc'
+
+    key = fields.Char(string='Key', required=True, readonly=True)
+    company_id = fields.Many2one('res.company', string='Company', readonly=True, ondelete='cascade')
+    day = fields.Date(string='Day', readonly=True, index=True)
+    state = fields.Selection([
+        ('draft', 'Draft'),
+        ('gross', 'Gross Captured'),
+        ('tare', 'Tare Captured'),
+        ('done', 'Done'),
+        ('cancel', 'Cancelled')
+    ], string='Status', readonly=True)
+    scale_id = fields.Many2one('weighing.scale', string='Weighing Scale', readonly=True, ondelete='cascade')
+    count = fields.Integer(string='Weighings', readonly=True)
+    net_weight = fields.Float(string='Net Weight (KG)', readonly=True)
+    date_seconds = fields.Float(string='Sum of Weighing Dates (s)', readonly=True,
+                                help="Sum of the weighing dates as epoch seconds, used to average ages without scanning records")
+
+    def init(self):
+        create_unique_index(self.env.cr, 'weighing_dashboard_counter_key_uniq', self._table, ['key'])
+        # Seed the counters of databases upgraded with existing weighings
+        self.env.cr.execute(SQL("SELECT 1 FROM weighing_dashboard_counter LIMIT 1"))
+        if not self.env.cr.fetchone():
+            self._fill_counters()
+
+    @staticmethod
+    def _make_key(company_id, day, state, scale_id):
+        return '|'.join([
+            str(company_id or 0),
+            day.isoformat() if day else '',
+            state or '',
+            str(scale_id or 0),
+        ])
+
+    @api.model
+    def _apply_snapshots(self, before, after):
+        """Move weighing statistics snapshots out of (before) and into (after) the counters.
+
+        Both arguments are lists of dicts as returned by
+        ``truck.weighing._get_stats_snapshot()``. The resulting deltas are
+        upserted in a single statement, in the caller's transaction.
+        """
+        deltas = defaultdict(lambda: [0, 0.0, 0.0])
+        for snapshots, sign in ((before, -1), (after, 1)):
+            for snap in snapshots:
+                if not snap['active']:
+                    continue
+                date = snap['weighing_date']
+                day = date.date() if date else False
+                delta = deltas[(snap['company_id'], day, snap['state'], snap['scale_id'])]
+                delta[0] += sign
+                delta[1] += sign * (snap['net_weight'] or 0.0)
+                if date:
+                    delta[2] += sign * date.replace(tzinfo=timezone.utc).timestamp()
+        rows = [
+            SQL("(%s, %s, %s, %s, %s, %s, %s, %s)",
+                self._make_key(*group), group[0] or None, group[1] or None, group[2] or None,
+                group[3] or None, count, net_weight, date_seconds)
+            for group, (count, net_weight, date_seconds) in deltas.items()
+            if count or net_weight or date_seconds
+        ]
+        if not rows:
+            return
+        self.env.cr.execute(SQL(
+            """
+            INSERT INTO weighing_dashboard_counter AS c
+                        (key, company_id, day, state, scale_id, count, net_weight, date_seconds)
+                 VALUES %s
+            ON CONFLICT (key) DO UPDATE
+                    SET count = c.count + EXCLUDED.count,
+                        net_weight = c.net_weight + EXCLUDED.net_weight,
+                        date_seconds = c.date_seconds + EXCLUDED.date_seconds
+            """,
+            SQL(", ").join(rows),
+        ))
+        self.invalidate_model()
+
+    @api.model
+    def _aggregate(self, domain):
+        """Sum count, net weight and date seconds of the counters matching domain"""
+        [(count, net_weight, date_seconds)] = self._read_group(
+            domain, [], ['count:sum', 'net_weight:sum', 'date_seconds:sum'],
+        )
+        return count or 0, net_weight or 0.0, date_seconds or 0.0
+
+    @api.model
+    def check_counters(self):
+        """Compare the counters with the live weighing table.
+
+        Returns the list of mismatching groups as dicts (key, live and
+        stored count and net weight); an empty list means no drift.
+        """
+        self.env['truck.weighing'].flush_model(['active', 'company_id', 'scale_id', 'state', 'weighing_date', 'net_weight'])
+        self.flush_model()
+        rows = self.env.execute_query(SQL(
+            """
+            WITH live AS (
+                SELECT %s AS key, COUNT(*) AS count, COALESCE(SUM(net_weight), 0) AS net_weight
+                  FROM truck_weighing
+                 WHERE active
+              GROUP BY 1
+            )
+            SELECT COALESCE(l.key, c.key), COALESCE(l.count, 0), COALESCE(c.count, 0),
+                   COALESCE(l.net_weight, 0), COALESCE(c.net_weight, 0)
+              FROM live l
+         FULL JOIN weighing_dashboard_counter c ON c.key = l.key
+             WHERE COALESCE(l.count, 0) != COALESCE(c.count, 0)
+                OR ABS(COALESCE(l.net_weight, 0) - COALESCE(c.net_weight, 0)) > 0.001
+            """,
+            _WEIGHING_KEY_SQL,
+        ))
+        return [
+            {'key': key, 'live_count': live_count, 'count': count,
+             'live_net_weight': live_net, 'net_weight': net}
+            for key, live_count, count, live_net, net in rows
+        ]
+
+    @api.model
+    def rebuild_counters(self):
+        """Recompute all counters from the weighing table, then verify them.
+
+        Returns the number of drifted groups found before the rebuild.
+        """
+        drift = self.check_counters()
+        for mismatch in drift:
+            _logger.warning("Dashboard counter drift on %(key)s: live %(live_count)s/%(live_net_weight)s, "
+                            "stored %(count)s/%(net_weight)s", mismatch)
+        self.env.cr.execute(SQL("LOCK TABLE weighing_dashboard_counter IN EXCLUSIVE MODE"))
+        self.env.cr.execute(SQL("DELETE FROM weighing_dashboard_counter"))
+        self._fill_counters()
+        self.invalidate_model()
+        remaining = self.check_counters()
+        if remaining:
+            _logger.error("Dashboard counters still differ from weighings after rebuild: %s", remaining)
+        return len(drift)
+
+    def _fill_counters(self):
+        """ Insert the counters of all active weighings, the table must be empty """
+        self.env.cr.execute(SQL(
+            """
+            INSERT INTO weighing_dashboard_counter
+                        (key, company_id, day, state, scale_id, count, net_weight, date_seconds)
+                 SELECT %s, company_id, weighing_date::date, state, scale_id, COUNT(*),
+                        COALESCE(SUM(net_weight), 0), COALESCE(SUM(EXTRACT(EPOCH FROM weighing_date)), 0)
+                   FROM truck_weighing
+                  WHERE active
+               GROUP BY company_id, weighing_date::date, state, scale_id
+            """,
+            _WEIGHING_KEY_SQL,
+        ))
+
+    @api.model
+    def action_rebuild_counters(self):
+        """ Rebuild the dashboard counters and report the drift that was fixed """
+        drift = self.rebuild_counters()
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Dashboard Counters Rebuilt'),
+                'message': _('%s drifted group(s) corrected.') % drift if drift else _('Counters matched the weighing records.'),
+                'type': 'success' if not drift else 'warning',
+                'sticky': False,
+            }
+        }
@@ -1,90 +1,198 @@
 # -*- coding: utf-8 -*-
 from odoo import models, fields, api
-from datetime import datetime, timedelta
+from odoo.tools import SQL
+from datetime import timedelta, timezone
 
 class WeighingOverview(models.TransientModel):
     _name = 'weighing.overview'
     _description = 'Weighing Operations Overview Dashboard'
 
+    @api.model
+    def _get_overview_cards(self):
+        """Dashboard cards, as {card name: public method returning its data}.
+
+        Extensions register their cards by extending this dict; the
+        dashboard loads every card through its own call.
+        """
+        return {
+            'in_progress': 'get_in_progress_card',
+            'all_records': 'get_all_records_card',
+            'truck_management': 'get_truck_management_card',
+        }
+
+    @api.model
+    def get_overview_cards(self):
+        """Cards the dashboard should load, in display order"""
+        return self._get_overview_cards()
+
     @api.model
     def get_overview_data(self):
         """Get comprehensive overview data for dashboard cards"""
-        today = fields.Date.today()
-        week_ago = today - timedelta(days=7)
-        
-        # In Progress Weighings
-        in_progress = self.env['truck.weighing'].search([
-            ('state', 'in', ['draft', 'gross', 'tare'])
-        ])
-        
-        # All Records
-        all_records = self.env['truck.weighing'].search([])
-        completed_today = all_records.filtered(lambda r: r.state == 'done' and r.weighing_date.date() == today)
-        completed_week = all_records.filtered(lambda r: r.state == 'done' and r.weighing_date.date() >= week_ago)
+        return {card: getattr(self, method)() for card, method in self._get_overview_cards().items()}
+
+    @api.model
+    def get_cache_stats(self):
+        """Hit/miss counters of the overview cache"""
+        return self.env['weighing.overview.cache'].get_cache_stats()
+
+    @api.model
+    def _get_card_data(self, card, compute_method):
+        """Serve a card from weighing.overview.cache, per user, company set and day.
+
+        Cards are computed with the access rights and record rules of the
+        requesting user, so a payload is only served back to that user.
+        """
+        today = self.env.context.get('today', fields.Date.today())
+        key = '%s|%s|%s|%s' % (card, self.env.uid, ','.join(str(cid) for cid in sorted(self.env.companies.ids)), today)
+        return self.env['weighing.overview.cache']._fetch(
+            key, lambda env: getattr(env['weighing.overview'], compute_method)())
+
+    @api.model
+    def get_in_progress_card(self):
+        return self._get_card_data('in_progress', '_compute_in_progress_card')
+
+    @api.model
+    def get_all_records_card(self):
+        return self._get_card_data('all_records', '_compute_all_records_card')
+
+    @api.model
+    def get_truck_management_card(self):
+        return self._get_card_data('truck_management', '_compute_truck_management_card')
+
+    @api.model
+    def _compute_in_progress_card(self):
+        today = self.env.context.get('today', fields.Date.today())
+        stats = self._get_weighing_stats(today, today - timedelta(days=7))
+        return {
+            'count': stats['draft_count'] + stats['gross_count'] + stats['tare_count'],
+            'draft_count': stats['draft_count'],
+            'gross_count': stats['gross_count'],
+            'tare_count': stats['tare_count'],
+            'avg_time': round(stats['avg_open_seconds'] / 3600, 1),
+        }
+
+    @api.model
+    def _compute_all_records_card(self):
+        today = self.env.context.get('today', fields.Date.today())
+        stats = self._get_weighing_stats(today, today - timedelta(days=7))
+        return {
+            'total_count': stats['total_count'],
+            'completed_today': stats['completed_today'],
+            'completed_week': stats['completed_week'],
+            'total_weight_today': stats['weight_today'],
+            'total_weight_week': stats['weight_week'],
+            'avg_weight': stats['done_weight'] / max(stats['done_count'], 1),
+        }
+
+    @api.model
+    def _compute_truck_management_card(self):
+        today = self.env.context.get('today', fields.Date.today())
+        stats = self._get_weighing_stats(today, today - timedelta(days=7))
         
         # Truck Management Data
-        all_trucks = self.env['truck.fleet'].search([])
-        active_trucks = all_trucks.filtered(lambda t: t.active)
-        trucks_with_weighing = all_trucks.filtered(lambda t: self.env['truck.weighing'].search([('truck_id', '=', t.id)], limit=1))
-        trucks_today = self.env['truck.weighing'].search([('weighing_date', '>=', today)]).mapped('truck_id')
+        active_trucks = self.env['truck.fleet'].search_count([])
+        trucks_with_weighing = self._count_trucks_with_weighing()
         
         # Truck performance metrics
-        total_weighings = len(all_records)
-        avg_weighings_per_truck = total_weighings / max(len(trucks_with_weighing), 1)
+        total_weighings = stats['total_count']
+        avg_weighings_per_truck = total_weighings / max(trucks_with_weighing, 1)
         
         # Basic truck operations
         truck_receipts = 0
         
         # Weekly truck activity
-        weekly_truck_activity = self.env['truck.weighing'].search_count([
-            ('weighing_date', '>=', week_ago),
-            ('state', '=', 'done')
-        ])
+        weekly_truck_activity = stats['completed_week']
         
         return {
-            'in_progress': {
-                'count': len(in_progress),
-                'draft_count': len(in_progress.filtered(lambda r: r.state == 'draft')),
-                'gross_count': len(in_progress.filtered(lambda r: r.state == 'gross')),
-                'tare_count': len(in_progress.filtered(lambda r: r.state == 'tare')),
-                'avg_time': self._calculate_avg_processing_time(in_progress),
-            },
-            'all_records': {
-                'total_count': len(all_records),
-                'completed_today': len(completed_today),
-                'completed_week': len(completed_week),
-                'total_weight_today': sum(completed_today.mapped('net_weight')),
-                'total_weight_week': sum(completed_week.mapped('net_weight')),
-                'avg_weight': sum(all_records.filtered(lambda r: r.state == 'done').mapped('net_weight')) / max(len(all_records.filtered(lambda r: r.state == 'done')), 1),
-            },
-            'truck_management': {
-                'total_trucks': len(all_trucks),
-                'active_trucks': len(active_trucks),
-                'trucks_with_weighing': len(trucks_with_weighing),
-                'trucks_today': len(trucks_today),
-                'utilization_rate': round((len(trucks_with_weighing) / max(len(active_trucks), 1)) * 100, 1),
-                'total_weighings': total_weighings,
-                'avg_weighings_per_truck': round(avg_weighings_per_truck, 1),
-                'truck_receipts': truck_receipts,
-                'weekly_activity': weekly_truck_activity,
-                'efficiency_score': round((weekly_truck_activity / max(len(active_trucks), 1)), 1),
-            }
+            'total_trucks': active_trucks,
+            'active_trucks': active_trucks,
+            'trucks_with_weighing': trucks_with_weighing,
+            'trucks_today': self._count_trucks_today(today),
+            'utilization_rate': round((trucks_with_weighing / max(active_trucks, 1)) * 100, 1),
+            'total_weighings': total_weighings,
+            'avg_weighings_per_truck': round(avg_weighings_per_truck, 1),
+            'truck_receipts': truck_receipts,
+            'weekly_activity': weekly_truck_activity,
+            'efficiency_score': round((weekly_truck_activity / max(active_trucks, 1)), 1),
         }
     
-    def _calculate_avg_processing_time(self, records):
-        """Calculate average processing time in hours"""
-        if not records:
-            return 0
-        
-        total_hours = 0
-        count = 0
-        now = datetime.now()
-        
-        for record in records:
-            if record.weighing_date:
-                hours = (now - record.weighing_date).total_seconds() / 3600
-                total_hours += hours
-                count += 1
-        
-        return round(total_hours / max(count, 1), 1)
-    
+    @api.model
+    def _get_weighing_stats(self, today, week_ago):
+        """Aggregate weighing counts and weights by state and date bucket.
+
+        Figures come from weighing.dashboard.counter, which holds one row per
+        company, day, state and scale, so the cost grows with the number of
+        days rather than with the weighing history.
+        """
+        Counter = self.env['weighing.dashboard.counter']
+        domain = [('company_id', 'in', self.env.companies.ids + [False])]
+        by_state = {
+            state: (count or 0, net_weight or 0.0, date_seconds or 0.0)
+            for state, count, net_weight, date_seconds in Counter._read_group(
+                domain, ['state'], ['count:sum', 'net_weight:sum', 'date_seconds:sum'])
+        }
+        open_count, _open_weight, open_seconds = Counter._aggregate(
+            domain + [('state', 'in', ['draft', 'gross', 'tare']), ('day', '!=', False)])
+        completed_today, weight_today, _seconds = Counter._aggregate(
+            domain + [('state', '=', 'done'), ('day', '=', today)])
+        completed_week, weight_week, _seconds = Counter._aggregate(
+            domain + [('state', '=', 'done'), ('day', '>=', week_ago)])
+        # Average age of open weighings: now - mean(weighing_date)
+        avg_open_seconds = 0.0
+        if open_count:
+            avg_open_seconds = fields.Datetime.now().replace(tzinfo=timezone.utc).timestamp() - open_seconds / open_count
+        empty = (0, 0.0, 0.0)
+        return {
+            'total_count': sum(count for count, _weight, _seconds in by_state.values()),
+            'draft_count': by_state.get('draft', empty)[0],
+            'gross_count': by_state.get('gross', empty)[0],
+            'tare_count': by_state.get('tare', empty)[0],
+            'avg_open_seconds': avg_open_seconds,
+            'done_count': by_state.get('done', empty)[0],
+            'done_weight': by_state.get('done', empty)[1],
+            'completed_today': completed_today,
+            'weight_today': weight_today,
+            'completed_week': completed_week,
+            'weight_week': weight_week,
+        }
+
+    @api.model
+    def _count_trucks_today(self, today):
+        """Count distinct trucks weighed since today, on the weighing_date index"""
+        Weighing = self.env['truck.weighing']
+        Weighing.flush_model(['truck_id', 'weighing_date'])
+        query = Weighing._search([('weighing_date', '>=', today)])
+        [(count,)] = self.env.execute_query(query.select(
+            SQL("COUNT(DISTINCT %s)", SQL.identifier(query.table, 'truck_id'))))
+        return count
+
+    @api.model
+    def _count_trucks_with_weighing(self):
+        """Count active trucks referenced by at least one weighing record"""
+        return self.env['truck.fleet'].search_count([('weighing_count', '>', 0)])
+
+    @api.model
+    def _picking_queue_stats(self, domain, today):
+        """Aggregate a picking queue (count, urgent, partners, quantity to weigh) with grouped queries"""
+        Picking = self.env['stock.picking']
+        [(count, total_qty, partners)] = Picking._read_group(
+            domain, [], ['__count', 'weighing_pending_qty:sum', 'partner_id:count_distinct'])
+        urgent_count = Picking.search_count(domain + [('scheduled_date', '<', today + timedelta(days=1))])
+        return {
+            'count': count,
+            'total_qty': total_qty or 0.0,
+            'urgent_count': urgent_count,
+            'partners': partners,
+        }
+
+    @api.model
+    def _order_queue_stats(self, model_name, domain):
+        """Aggregate an order queue (count, amount, partners, quantity to weigh) in one grouped query"""
+        [(count, total_amount, pending_qty, partners)] = self.env[model_name]._read_group(
+            domain, [], ['__count', 'amount_total:sum', 'weighing_pending_qty:sum', 'partner_id:count_distinct'])
+        return {
+            'count': count,
+            'total_amount': total_amount or 0.0,
+            'pending_qty': pending_qty or 0.0,
+            'partners': partners,
+        }
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api
+from odoo.tools import SQL
+from odoo.tools.sql import create_unique_index
+import json
+import logging
+import psycopg2
+
+_logger = logging.getLogger(__name__)
+
+# Non transactional counters shared by all workers
+GENERATION_SEQUENCE = 'weighing_overview_cache_generation'
+HITS_SEQUENCE = 'weighing_overview_cache_hits'
+MISSES_SEQUENCE = 'weighing_overview_cache_misses'
+
+TTL_PARAM = 'inventory_scale_integration_base.overview_cache_ttl'
+DEFAULT_TTL = 30
+
+
+class WeighingOverviewCache(models.Model):
+    _name = 'weighing.overview.cache'
+    _description = 'Weighing Overview Cache'
+    _log_access = False
+
+    key = fields.Char(string='Key', required=True, readonly=True)
+    company_id = fields.Many2one('res.company', string='Company', readonly=True, ondelete='cascade')
+    payload = fields.Json(string='Payload', readonly=True)
+    generation = fields.Integer(string='Generation', readonly=True)
+    computed_at = fields.Datetime(string='Computed At', readonly=True)
+
+    def init(self):
+        create_unique_index(self.env.cr, 'weighing_overview_cache_key_uniq', self._table, ['key'])
+        for sequence in (GENERATION_SEQUENCE, HITS_SEQUENCE, MISSES_SEQUENCE):
+            self.env.cr.execute(SQL("CREATE SEQUENCE IF NOT EXISTS %s", SQL.identifier(sequence)))
+
+    @api.model
+    def _read_sequence(self, cr, sequence):
+        """Current value of a counter sequence, 0 before its first nextval"""
+        cr.execute(SQL(
+            "SELECT CASE WHEN is_called THEN last_value ELSE 0 END FROM %s",
+            SQL.identifier(sequence),
+        ))
+        return cr.fetchone()[0]
+
+    @api.model
+    def _bump(self, cr, sequence):
+        cr.execute(SQL("SELECT nextval(%s)", sequence))
+
+    @api.model
+    def _get_ttl(self):
+        return int(self.env['ir.config_parameter'].sudo().get_param(TTL_PARAM, DEFAULT_TTL))
+
+    @api.model
+    def _fetch(self, key, compute):
+        """Return the cached payload of key, or compute and store it.
+
+        ``compute`` is called with an environment on a fresh cursor whose
+        snapshot starts after the current generation was read, so a payload
+        can never be stored under a generation newer than its data.
+        """
+        ttl = self._get_ttl()
+        cr = self.env.cr
+        if ttl <= 0 or cr.postcommit.data.get('weighing_overview_cache_dirty'):
+            # Disabled, or this transaction changed data the cache cannot see yet
+            return compute(self.env)
+        cr.execute(SQL(
+            """
+            SELECT payload
+              FROM weighing_overview_cache
+             WHERE key = %s
+               AND generation = (SELECT CASE WHEN is_called THEN last_value ELSE 0 END FROM %s)
+               AND computed_at >= (clock_timestamp() AT TIME ZONE 'UTC') - make_interval(secs => %s)
+            """,
+            key, SQL.identifier(GENERATION_SEQUENCE), ttl,
+        ))
+        row = cr.fetchone()
+        if row:
+            self._bump(cr, HITS_SEQUENCE)
+            return row[0]
+        self._bump(cr, MISSES_SEQUENCE)
+        with self.env.registry.cursor() as fresh_cr:
+            generation = self._read_sequence(fresh_cr, GENERATION_SEQUENCE)
+            payload = compute(self.env(cr=fresh_cr))
+            try:
+                with fresh_cr.savepoint():
+                    fresh_cr.execute(SQL(
+                        """
+                        INSERT INTO weighing_overview_cache (key, company_id, payload, generation, computed_at)
+                             VALUES (%s, %s, %s, %s, clock_timestamp() AT TIME ZONE 'UTC')
+                        ON CONFLICT (key) DO UPDATE
+                                SET payload = EXCLUDED.payload,
+                                    generation = EXCLUDED.generation,
+                                    computed_at = EXCLUDED.computed_at
+                        """,
+                        key, self.env.company.id, json.dumps(payload), generation,
+                    ))
+            except psycopg2.OperationalError:
+                # Another worker refreshed the same key concurrently, keep its result
+                _logger.debug("Overview cache store skipped for %s", key)
+        return payload
+
+    @api.model
+    def _invalidate(self):
+        """Bump the cache generation once the current transaction commits"""
+        cr = self.env.cr
+        if cr.postcommit.data.get('weighing_overview_cache_dirty'):
+            return
+        cr.postcommit.data['weighing_overview_cache_dirty'] = True
+        registry = self.env.registry
+
+        @cr.postcommit.add
+        def bump_generation():
+            with registry.cursor() as bump_cr:
+                self._bump(bump_cr, GENERATION_SEQUENCE)
+
+    @api.model
+    def get_cache_stats(self):
+        """Hit/miss counters of the overview cache, shared by all workers"""
+        cr = self.env.cr
+        hits = self._read_sequence(cr, HITS_SEQUENCE)
+        misses = self._read_sequence(cr, MISSES_SEQUENCE)
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits * 100.0 / max(hits + misses, 1), 1),
+            'ttl': self._get_ttl(),
+            'generation': self._read_sequence(cr, GENERATION_SEQUENCE),
+        }
@@ -2,11 +2,29 @@
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
 import logging
-import requests
-from datetime import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from odoo.tools import SQL, config
+from ..tools.http_pool import scale_session_pool, DEFAULT_POOL_SIZE
+from ..tools.scale_drivers import scale_driver_pool, driver_selection
+from ..tools import scale_poller, scale_telemetry, shared_readings
+from ..tools.stability import StabilityDetector
 
 _logger = logging.getLogger(__name__)
 
+# Seconds added to the scale timeout before another caller may take over a probe
+PROBE_LEASE_MARGIN = 5
+# Seconds between two samples while waiting for a stable weight
+STABILITY_SAMPLE_INTERVAL = 0.5
+HEALTH_CHECK_CONCURRENCY_PARAM = 'inventory_scale_integration_base.health_check_concurrency'
+DEFAULT_HEALTH_CHECK_CONCURRENCY = 16
+
+
+class CircuitOpenError(Exception):
+    """ Raised without contacting the scale while its circuit is open """
+
 class WeighingScale(models.Model):
     _name = 'weighing.scale'
     _description = 'Weighing Scale Configuration'
@@ -16,10 +34,26 @@ class WeighingScale(models.Model):
     active = fields.Boolean(default=True, tracking=True)
     company_id = fields.Many2one('res.company', string='Company', default=lambda self: self.env.company)
     
+    # A group adds up the weights of the platforms of a long weighbridge
+    scale_type = fields.Selection([
+        ('single', 'Single Platform'),
+        ('group', 'Platform Group'),
+    ], string='Type', required=True, default='single', tracking=True)
+    member_ids = fields.Many2many('weighing.scale', 'weighing_scale_group_member_rel', 'group_id', 'member_id',
+                                  string='Platforms', domain="[('scale_type', '=', 'single'), ('id', '!=', id)]",
+                                  help="Scales read together, the group weight is the sum of their weights")
+    group_skew_tolerance = fields.Float(string='Maximum Reading Skew (s)', default=1.0,
+                                        help="The readings of the platforms must be at most this far apart")
+
     # Connection Settings
-    ip_address = fields.Char(string='IP Address', required=True, tracking=True)
+    driver = fields.Selection(selection='_get_driver_selection', string='Driver', required=True,
+                              default='http_json', tracking=True,
+                              help="Protocol spoken at IP Address:Port, the HTTP middleware or the indicator itself")
+    ip_address = fields.Char(string='IP Address', tracking=True)
     port = fields.Integer(string='Port', required=True, default=5000, tracking=True)
     timeout = fields.Integer(string='Timeout (seconds)', default=2)
+    pool_size = fields.Integer(string='Kept-alive Connections', default=DEFAULT_POOL_SIZE,
+                               help="Maximum number of idle connections kept open to the scale by each server process")
     
     # Status & Monitoring
     is_enabled = fields.Boolean(string='Enabled', default=True, tracking=True)
@@ -32,6 +66,33 @@ class WeighingScale(models.Model):
     last_read_weight = fields.Float(string='Last Read Weight (KG)', readonly=True)
     last_read_date = fields.Datetime(string='Last Read Date', readonly=True)
     error_message = fields.Text(string='Last Error', readonly=True)
+    latency_ms = fields.Float(string='Latency (ms)', readonly=True, digits=(16, 1),
+                              help="Duration of the read made by the last health check")
+
+    # Circuit Breaker
+    circuit_state = fields.Selection([
+        ('closed', 'Closed'),
+        ('open', 'Open'),
+        ('half_open', 'Half-Open')
+    ], string='Circuit', default='closed', readonly=True, copy=False,
+        help="Open: reads fail immediately until the next probe. Half-Open: one probe read is in progress.")
+    circuit_failures = fields.Integer(string='Consecutive Failures', readonly=True, copy=False)
+    circuit_backoff = fields.Integer(string='Current Backoff (s)', readonly=True, copy=False)
+    circuit_retry_at = fields.Datetime(string='Next Probe', readonly=True, copy=False)
+    circuit_probe_until = fields.Datetime(string='Probe Lease', readonly=True, copy=False)
+    circuit_failure_threshold = fields.Integer(string='Failures Before Opening', default=3)
+    circuit_backoff_initial = fields.Integer(string='Initial Backoff (s)', default=5)
+    circuit_backoff_max = fields.Integer(string='Maximum Backoff (s)', default=300)
+
+    # Stable weight detection
+    stability_window = fields.Integer(string='Stability Window (samples)', default=10,
+                                      help="Number of recent samples kept to judge stability")
+    stability_tolerance = fields.Float(string='Stability Tolerance (KG)', default=10.0,
+                                       help="Maximum spread of the samples of a stable weight")
+    stability_min_duration = fields.Float(string='Minimum Stable Duration (s)', default=2.0,
+                                          help="The samples must stay within the tolerance for at least this long")
+    stability_timeout = fields.Integer(string='Stability Timeout (s)', default=20,
+                                       help="Capture fails if the weight does not settle within this delay")
     
     # User Assignment
     user_ids = fields.Many2many('res.users', 'scale_user_rel', 'scale_id', 'user_id', string='Assigned Users')
@@ -39,86 +100,612 @@ class WeighingScale(models.Model):
     # Notes
     notes = fields.Text(string='Notes')
     
+    # Connection pool statistics of the current server process
+    pool_requests = fields.Integer(string='Requests', compute='_compute_pool_stats')
+    pool_reuses = fields.Integer(string='Reused Connections', compute='_compute_pool_stats')
+    pool_reconnects = fields.Integer(string='Reconnects', compute='_compute_pool_stats')
+    pool_rebuilds = fields.Integer(string='Pool Rebuilds', compute='_compute_pool_stats',
+                                   help="Sessions rebuilt after a change of the connection settings")
+
+    # Latest reading published by the scale poller in shared memory
+    live_weight = fields.Float(string='Live Weight (KG)', compute='_compute_live_reading')
+    live_stable = fields.Boolean(string='Stable', compute='_compute_live_reading')
+    live_status = fields.Selection([
+        ('none', 'No Reading'),
+        ('ok', 'OK'),
+        ('error', 'Error')
+    ], string='Live Status', compute='_compute_live_reading')
+    live_age = fields.Float(string='Reading Age (s)', compute='_compute_live_reading', digits=(16, 1))
+
     # Related Records
     weighing_count = fields.Integer(string='Weighing Records', compute='_compute_weighing_count')
+
+    # Pushed readings waiting for the apply workers
+    queue_depth = fields.Integer(string='Queued Readings', compute='_compute_queue_stats')
+    queue_latency = fields.Float(string='Apply Latency (s)', compute='_compute_queue_stats', digits=(16, 3),
+                                 help="Average seconds between reception and application of the readings pushed over the last hour")
     
+    _CIRCUIT_FIELDS = [
+        'connection_status', 'last_check_date', 'last_read_weight', 'last_read_date', 'error_message',
+        'circuit_state', 'circuit_failures', 'circuit_backoff', 'circuit_retry_at', 'circuit_probe_until',
+    ]
+
+    def _compute_pool_stats(self):
+        for record in self:
+            stats = scale_session_pool.get_stats(record._pool_key())
+            record.pool_requests = stats['requests']
+            record.pool_reuses = stats['reuses']
+            record.pool_reconnects = stats['reconnects']
+            record.pool_rebuilds = stats['rebuilds']
+
+    def _compute_live_reading(self):
+        buffer = shared_readings.get_reader(self.env.cr.dbname)
+        now = time.time()
+        for record in self:
+            reading = buffer and record._origin.id and buffer.latest(record._origin.id)
+            if not reading:
+                record.live_weight = 0.0
+                record.live_stable = False
+                record.live_status = 'none'
+                record.live_age = 0.0
+                continue
+            record.live_weight = reading.weight if reading.status == shared_readings.STATUS_OK else 0.0
+            record.live_stable = reading.stable
+            record.live_status = 'ok' if reading.status == shared_readings.STATUS_OK else 'error'
+            record.live_age = max(now - reading.timestamp, 0.0)
+
+    @api.model
+    def get_live_readings(self):
+        """ Latest shared reading of every enabled scale, for the dashboard and the controller """
+        scales = self.search([('is_enabled', '=', True)])
+        return [{
+            'id': scale.id,
+            'name': scale.name,
+            'weight': scale.live_weight,
+            'stable': scale.live_stable,
+            'status': scale.live_status,
+            'age': round(scale.live_age, 1),
+        } for scale in scales]
+
     def _compute_weighing_count(self):
         for record in self:
             record.weighing_count = self.env['truck.weighing'].search_count([('scale_id', '=', record.id)])
 
-    @api.constrains('ip_address', 'port')
+    def _compute_queue_stats(self):
+        Ingestion = self.env['weighing.scale.ingestion'].sudo()
+        scale_ids = self._origin.ids
+        depths = dict(Ingestion._read_group(
+            [('scale_id', 'in', scale_ids), ('state', '=', 'pending')], ['scale_id'], ['__count']))
+        latencies = dict(Ingestion._read_group(
+            [('scale_id', 'in', scale_ids), ('applied_date', '>=', fields.Datetime.now() - timedelta(hours=1))],
+            ['scale_id'], ['apply_latency:avg']))
+        for record in self:
+            record.queue_depth = depths.get(record._origin, 0)
+            record.queue_latency = latencies.get(record._origin) or 0.0
+
+    @api.constrains('ip_address', 'port', 'scale_type')
     def _check_ip_port(self):
         for record in self:
-            if not record.ip_address or not record.port:
+            if record.scale_type == 'single' and (not record.ip_address or not record.port):
                 raise UserError(_("IP Address and Port are required."))
 
+    @api.constrains('scale_type', 'member_ids')
+    def _check_members(self):
+        for record in self:
+            if record.scale_type == 'group':
+                if not record.member_ids:
+                    raise UserError(_("Scale group '%s' needs at least one platform.") % record.name)
+                if record in record.member_ids or 'group' in record.member_ids.mapped('scale_type'):
+                    raise UserError(_("The platforms of scale group '%s' must be single scales.") % record.name)
+                if self.search_count([('member_ids', 'in', record.ids)]):
+                    raise UserError(_("Scale '%s' is a platform of a group and must stay a single scale.") % record.name)
+
+    @api.model
+    def _get_push_scale(self, scale_id=None):
+        """ Enabled scale a middleware push is routed to: the given one, or the
+        only enabled scale when the push names none """
+        if scale_id:
+            scale = self.browse(int(scale_id)).exists()
+            return scale if scale.is_enabled else self.browse()
+        scales = self.search([('is_enabled', '=', True)], limit=2)
+        return scales if len(scales) == 1 else self.browse()
+
+    def _pool_key(self):
+        return (self.env.cr.dbname, self._origin.id)
+
+    @api.model
+    def _get_driver_selection(self):
+        return driver_selection()
+
+    def _driver_config(self):
+        self.ensure_one()
+        return (self.driver or 'http_json', self.ip_address, self.port, self.timeout,
+                self.pool_size or DEFAULT_POOL_SIZE)
+
+    def _discard_connections(self):
+        """ Close the connections of this process to the scales """
+        for record in self:
+            scale_session_pool.discard(record._pool_key())
+            scale_driver_pool.discard(record._pool_key())
+
+    def write(self, vals):
+        res = super(WeighingScale, self).write(vals)
+        if {'driver', 'ip_address', 'port', 'timeout', 'pool_size', 'active', 'is_enabled'}.intersection(vals):
+            # Close the connections of this process now, others rebuild on their next read
+            self._discard_connections()
+        return res
+
     def action_test_connection(self):
         """ Test connection to the scale """
         self.ensure_one()
         try:
-            url = f"http://{self.ip_address}:{self.port}/get_weight"
-            response = requests.get(url, timeout=self.timeout)
-            if response.status_code == 200:
-                data = response.json()
-                weight = data.get('weight', 0.0)
-                self.write({
-                    'connection_status': 'connected',
-                    'last_check_date': fields.Datetime.now(),
-                    'last_read_weight': weight,
-                    'last_read_date': fields.Datetime.now(),
-                    'error_message': False
-                })
-                self.message_post(body=_("Connection successful. Weight: %s KG") % weight)
-                return {
-                    'type': 'ir.actions.client',
-                    'tag': 'display_notification',
-                    'params': {
-                        'title': _('Success'),
-                        'message': _('Connected successfully. Weight: %s KG') % weight,
-                        'type': 'success',
-                        'sticky': False,
-                    }
-                }
-            else:
-                raise Exception(_("Invalid response from scale"))
+            weight = self._read_weight(force_probe=True)
+        except CircuitOpenError as e:
+            raise UserError(str(e))
         except Exception as e:
-            self.write({
-                'connection_status': 'error',
-                'last_check_date': fields.Datetime.now(),
-                'error_message': str(e)
-            })
             raise UserError(_("Connection failed: %s") % str(e))
+        self.message_post(body=_("Connection successful. Weight: %s KG") % weight)
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Success'),
+                'message': _('Connected successfully. Weight: %s KG') % weight,
+                'type': 'success',
+                'sticky': False,
+            }
+        }
+
+    def action_check_health(self):
+        """ Check the selected scales, all enabled ones when none is selected """
+        scales = self or self.search([('is_enabled', '=', True), ('scale_type', '=', 'single')])
+        started = time.monotonic()
+        results = scales._check_health()
+        failed = [scale_id for scale_id, (_latency, _weight, error) in results.items() if error]
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Health Check'),
+                'message': _('%(ok)s of %(total)s scales connected, checked in %(seconds).1f s.',
+                             ok=len(results) - len(failed), total=len(results),
+                             seconds=time.monotonic() - started),
+                'type': 'warning' if failed else 'success',
+                'sticky': bool(failed),
+                'next': {'type': 'ir.actions.client', 'tag': 'soft_reload'},
+            }
+        }
+
+    @api.model
+    def _cron_check_health(self):
+        self.search([('is_enabled', '=', True), ('scale_type', '=', 'single')])._check_health()
+
+    def _check_health(self):
+        """ Read the enabled scales of self concurrently and record the outcome.
+
+        Reads run in a bounded thread pool so the check lasts about as long as
+        the slowest scale. Status, weight and latency are written with a single
+        UPDATE; a successful read also closes an open circuit. Returns
+        {scale id: (latency in ms, weight, error)}.
+        """
+        scales = self.filtered(lambda scale: scale.is_enabled and scale.scale_type == 'single')
+        if not scales:
+            return {}
+        concurrency = int(self.env['ir.config_parameter'].sudo().get_param(
+            HEALTH_CHECK_CONCURRENCY_PARAM, DEFAULT_HEALTH_CHECK_CONCURRENCY))
+        # The ORM stays in this thread, workers only get plain values
+        targets = [(scale.id, scale._pool_key(), scale._driver_config()) for scale in scales]
+
+        def probe(target):
+            scale_id, key, driver_config = target
+            started = time.monotonic()
+            try:
+                weight, _stable = scale_driver_pool.read(key, driver_config)
+                error = None
+            except Exception as e:
+                weight, error = None, str(e) or e.__class__.__name__
+            return scale_id, ((time.monotonic() - started) * 1000, weight, error)
+
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=max(min(concurrency, len(targets)), 1),
+                                thread_name_prefix='scale_health') as executor:
+            results = dict(executor.map(probe, targets))
+        now = fields.Datetime.now()
+        self.env.cr.execute(SQL(
+            """
+            UPDATE weighing_scale s
+               SET connection_status = CASE WHEN r.error IS NULL THEN 'connected' ELSE 'error' END,
+                   last_check_date = r.check_date,
+                   last_read_weight = COALESCE(r.weight, s.last_read_weight),
+                   last_read_date = CASE WHEN r.error IS NULL THEN r.check_date ELSE s.last_read_date END,
+                   error_message = r.error,
+                   latency_ms = r.latency,
+                   circuit_state = CASE WHEN r.error IS NULL THEN 'closed' ELSE s.circuit_state END,
+                   circuit_failures = CASE WHEN r.error IS NULL THEN 0 ELSE s.circuit_failures END,
+                   circuit_backoff = CASE WHEN r.error IS NULL THEN 0 ELSE s.circuit_backoff END,
+                   circuit_retry_at = CASE WHEN r.error IS NULL THEN NULL ELSE s.circuit_retry_at END,
+                   circuit_probe_until = CASE WHEN r.error IS NULL THEN NULL ELSE s.circuit_probe_until END
+              FROM (VALUES %s) AS r(id, check_date, weight, error, latency)
+             WHERE s.id = r.id
+               AND (s.last_check_date IS NULL OR s.last_check_date <= r.check_date)
+            """,
+            SQL(", ").join(
+                SQL("(%s, %s::timestamp, %s::float8, %s::text, %s::float8)", scale_id, now, weight, error, latency)
+                for scale_id, (latency, weight, error) in results.items()
+            ),
+        ))
+        scales.invalidate_recordset(self._CIRCUIT_FIELDS + ['latency_ms'])
+        _logger.info("Health check of %s scale(s) in %.2f s, %s unreachable", len(results),
+                     time.monotonic() - started, sum(1 for result in results.values() if result[2]))
+        return results
 
     def get_weight(self):
         """ Get current weight from scale """
         self.ensure_one()
         if not self.is_enabled:
             raise UserError(_("Scale '%s' is disabled.") % self.name)
-        
+        if self.scale_type == 'group':
+            return self._read_group_sample(require_stable=True)[0]
+
+        weight = self._get_polled_weight()
+        if weight is not None:
+            return weight
         try:
-            url = f"http://{self.ip_address}:{self.port}/get_weight"
-            response = requests.get(url, timeout=self.timeout)
-            if response.status_code == 200:
-                data = response.json()
-                weight = data.get('weight', 0.0)
-                self.write({
-                    'connection_status': 'connected',
-                    'last_check_date': fields.Datetime.now(),
-                    'last_read_weight': weight,
-                    'last_read_date': fields.Datetime.now(),
-                    'error_message': False
-                })
-                return weight
-            else:
-                raise Exception(_("Invalid response from scale"))
+            return self._read_weight()
+        except CircuitOpenError as e:
+            raise UserError(str(e))
         except Exception as e:
-            self.write({
-                'connection_status': 'error',
-                'last_check_date': fields.Datetime.now(),
-                'error_message': str(e)
-            })
             raise UserError(_("Error reading from scale '%s': %s") % (self.name, str(e)))
 
+    def _get_polled_weight(self):
+        """ Latest reading of the scale poller if it is fresh enough, else None """
+        self.ensure_one()
+        max_age = float(self.env['ir.config_parameter'].sudo().get_param(
+            scale_poller.MAX_AGE_PARAM, scale_poller.DEFAULT_MAX_AGE))
+        if max_age <= 0:
+            return None
+        weight = scale_poller.get_cached_weight(self.env.cr.dbname, self.id, max_age)
+        if weight is not None:
+            return weight
+        # Poller running on another host: use the reading it recorded. Unchanged
+        # readings are not rewritten, the poller heartbeat tells they are current;
+        # the check date only ensures the scale is still polled at all.
+        self.env.cr.execute(SQL(
+            """
+            SELECT s.last_read_weight
+              FROM weighing_scale s
+              JOIN ir_config_parameter p ON p.key = %s
+             WHERE s.id = %s
+               AND s.connection_status = 'connected'
+               AND p.value::timestamp >= (clock_timestamp() AT TIME ZONE 'UTC') - make_interval(secs => %s)
+               AND s.last_check_date >= (clock_timestamp() AT TIME ZONE 'UTC') - make_interval(secs => %s)
+            """,
+            scale_telemetry.POLLER_HEARTBEAT_PARAM, self.id, max_age, 2 * scale_telemetry.HEARTBEAT,
+        ))
+        row = self.env.cr.fetchone()
+        return row[0] if row else None
+
+    def _register_hook(self):
+        super()._register_hook()
+        # Prefork servers run the poller with the scale_poller command instead
+        if config['workers'] or config['stop_after_init'] or config['test_enable']:
+            return
+        mode = self.env['ir.config_parameter'].sudo().get_param(scale_poller.MODE_PARAM, 'off')
+        if mode == 'thread':
+            scale_poller.start_poller_thread(self.env.registry)
+
+    def _read_weight(self, force_probe=False):
+        """ Read the weight with the scale's driver behind its circuit breaker """
+        return self._read_sample(force_probe=force_probe)[0]
+
+    def _read_sample(self, force_probe=False):
+        """ Read (weight, stable flag) with the scale's driver behind its circuit breaker """
+        if self.scale_type == 'group':
+            return self._read_group_sample()[:2]
+        probe = self._circuit_before_read(force_probe=force_probe)
+        try:
+            weight, stable = scale_driver_pool.read(self._pool_key(), self._driver_config())
+        except Exception as e:
+            self._circuit_after_read(probe, error=str(e))
+            raise
+        self._circuit_after_read(probe, weight=weight)
+        scale_telemetry.telemetry_buffer.record_reading(
+            self.env.cr.dbname, self.id, fields.Datetime.now(), weight, stable, 'live')
+        return weight, stable
+
+    def _read_members(self):
+        """ Read the platforms of a group concurrently.
+
+        Platforms with a fresh poller reading in shared memory are not
+        contacted, the others are read live in a thread pool so the group
+        waits for its slowest platform only. Returns {scale id: (weight,
+        stable, timestamp, source, error)}.
+        """
+        self.ensure_one()
+        max_age = float(self.env['ir.config_parameter'].sudo().get_param(
+            scale_poller.MAX_AGE_PARAM, scale_poller.DEFAULT_MAX_AGE))
+        # A polled reading must be fresh enough to fall within the skew
+        # tolerance of the live reads, half of it is left to those reads
+        max_age = min(max_age, self.group_skew_tolerance / 2)
+        buffer = shared_readings.get_reader(self.env.cr.dbname)
+        now = time.time()
+        results = {}
+        live = []
+        for member in self.member_ids:
+            if not member.is_enabled:
+                results[member.id] = (0.0, False, now, 'live', _("Scale '%s' is disabled.") % member.name)
+                continue
+            reading = buffer and max_age > 0 and buffer.latest(member.id)
+            if reading and reading.status == shared_readings.STATUS_OK and now - reading.timestamp <= max_age:
+                results[member.id] = (reading.weight, reading.stable, reading.timestamp, 'poll', None)
+                continue
+            try:
+                live.append((member, member._circuit_before_read()))
+            except CircuitOpenError as e:
+                results[member.id] = (0.0, False, now, 'live', str(e))
+        if not live:
+            return results
+
+        def read(target):
+            key, driver_config = target
+            try:
+                weight, stable = scale_driver_pool.read(key, driver_config)
+                return weight, stable, time.time(), None
+            except Exception as e:
+                return 0.0, False, time.time(), str(e) or e.__class__.__name__
+
+        with ThreadPoolExecutor(max_workers=len(live), thread_name_prefix='scale_group') as executor:
+            outcomes = list(executor.map(read, [(member._pool_key(), member._driver_config()) for member, _probe in live]))
+        # Circuits and telemetry use the ORM, back in this thread
+        for (member, probe), (weight, stable, timestamp, error) in zip(live, outcomes):
+            if error:
+                member._circuit_after_read(probe, error=error)
+            else:
+                member._circuit_after_read(probe, weight=weight)
+                scale_telemetry.telemetry_buffer.record_reading(
+                    self.env.cr.dbname, member.id, fields.Datetime.now(), weight, stable, 'live')
+            results[member.id] = (weight, stable, timestamp, 'live', error)
+        return results
+
+    def _read_group_sample(self, require_stable=False):
+        """ Sum the weights of the platforms of a group.
+
+        Returns (weight, stable, platform readings) and raises UserError
+        unless every platform answered, within the skew tolerance and, with
+        require_stable, with a stable weight.
+        """
+        self.ensure_one()
+        readings = self._read_members()
+        problems = []
+        for member in self.member_ids:
+            _weight, stable, _timestamp, _source, error = readings[member.id]
+            if error:
+                problems.append(f"{member.name}: {error}")
+            elif require_stable and not stable:
+                problems.append(_("%s: weight not stable") % member.name)
+        if not problems:
+            timestamps = [reading[2] for reading in readings.values()]
+            skew = max(timestamps) - min(timestamps)
+            if skew > self.group_skew_tolerance:
+                problems.append(_("readings %(skew).2f s apart, tolerance %(tolerance)s s",
+                                  skew=skew, tolerance=self.group_skew_tolerance))
+        if problems:
+            raise UserError(_("Cannot read scale group '%(group)s': %(problems)s",
+                              group=self.name, problems='; '.join(problems)))
+        weight = sum(reading[0] for reading in readings.values())
+        return weight, all(reading[1] for reading in readings.values()), readings
+
+    def _get_stability_detector(self):
+        self.ensure_one()
+        return StabilityDetector(self.stability_window, self.stability_tolerance, self.stability_min_duration)
+
+    def _wait_stable_weight(self, platform_readings=None):
+        """ Sample the scale until its weight is stable and return the StabilityResult.
+
+        Samples come from the poller's shared buffer while it is fresh and
+        from live reads otherwise, groups sample the sum of their platforms
+        and fill platform_readings with the readings of the last sample.
+        Failed group samples are retried. Raises UserError when the weight
+        does not settle within the scale's stability timeout.
+        """
+        self.ensure_one()
+        if not self.is_enabled:
+            raise UserError(_("Scale '%s' is disabled.") % self.name)
+        detector = self._get_stability_detector()
+        max_age = float(self.env['ir.config_parameter'].sudo().get_param(
+            scale_poller.MAX_AGE_PARAM, scale_poller.DEFAULT_MAX_AGE))
+        deadline = time.monotonic() + (self.stability_timeout or 0)
+        last_timestamp = 0.0
+        while True:
+            buffer = shared_readings.get_reader(self.env.cr.dbname)
+            history = buffer.history(self.id) if buffer else []
+            if self.scale_type == 'group':
+                try:
+                    weight, stable, readings = self._read_group_sample()
+                except UserError as e:
+                    # A platform missing a sample or a skewed sample is retried until the timeout
+                    if time.monotonic() >= deadline:
+                        raise
+                    _logger.debug("Sample of scale group %s discarded: %s", self.name, e)
+                    time.sleep(STABILITY_SAMPLE_INTERVAL)
+                    continue
+                if platform_readings is not None:
+                    platform_readings.clear()
+                    platform_readings.update(readings)
+                last_timestamp = time.time()
+                detector.add(last_timestamp, weight, stable)
+            elif (history and max_age > 0 and history[0].status == shared_readings.STATUS_OK
+                    and time.time() - history[0].timestamp <= max_age):
+                # Polled: take the readings published since the last pass
+                for reading in reversed(history):
+                    if reading.status == shared_readings.STATUS_OK and reading.timestamp > last_timestamp:
+                        detector.add(reading.timestamp, reading.weight, reading.stable)
+                last_timestamp = history[0].timestamp
+            else:
+                try:
+                    weight, stable = self._read_sample()
+                except CircuitOpenError as e:
+                    raise UserError(str(e))
+                except Exception as e:
+                    raise UserError(_("Error reading from scale '%s': %s") % (self.name, str(e)))
+                last_timestamp = time.time()
+                detector.add(last_timestamp, weight, stable)
+            result = detector.result()
+            if result.stable:
+                return result
+            if time.monotonic() >= deadline:
+                raise UserError(_(
+                    "The weight on scale '%(scale)s' did not settle within %(timeout)s seconds "
+                    "(last %(samples)s samples spread over %(spread).1f KG, tolerance %(tolerance)s KG). "
+                    "Make sure the truck is standing still and try again.",
+                    scale=self.name, timeout=self.stability_timeout, samples=result.samples,
+                    spread=result.spread, tolerance=self.stability_tolerance,
+                ))
+            time.sleep(STABILITY_SAMPLE_INTERVAL)
+
+    # Circuit breaker
+    #
+    # The state is committed on its own cursor so that it survives the
+    # rollback of the failing request and is seen at once by other workers.
+    # While the loaded record shows a closed circuit without failures no such
+    # cursor is opened, a circuit opened meanwhile by another worker is then
+    # only honoured from the next request on.
+
+    def _circuit_is_closed(self):
+        """ Whether the loaded record shows a closed circuit without failures """
+        return self.circuit_state in (False, 'closed') and not self.circuit_failures
+
+    def _circuit_before_read(self, force_probe=False):
+        """ Fail fast while the circuit is open.
+
+        Returns True when this call is the single half-open probe allowed to
+        reach the scale once the backoff has elapsed.
+        """
+        self.ensure_one()
+        if self._circuit_is_closed():
+            return False
+        now = fields.Datetime.now()
+        with self.env.registry.cursor() as cr:
+            cr.execute(SQL(
+                "SELECT circuit_state, circuit_retry_at, circuit_probe_until, error_message FROM weighing_scale WHERE id = %s",
+                self.id,
+            ))
+            state, retry_at, probe_until, error = cr.fetchone()
+            if not state or state == 'closed':
+                return False
+            probe_free = state == 'open' or not probe_until or probe_until <= now
+            if probe_free and (force_probe or state == 'half_open' or not retry_at or retry_at <= now):
+                lease = now + timedelta(seconds=(self.timeout or 0) + PROBE_LEASE_MARGIN)
+                # Claim the probe, only one concurrent caller gets the row back
+                cr.execute(SQL(
+                    """
+                    UPDATE weighing_scale
+                       SET circuit_state = 'half_open', circuit_probe_until = %s
+                     WHERE id = %s
+                       AND circuit_state = %s
+                       AND circuit_probe_until IS NOT DISTINCT FROM %s
+                    RETURNING id
+                    """,
+                    lease, self.id, state, probe_until,
+                ))
+                if cr.fetchone():
+                    return True
+        if retry_at and retry_at > now:
+            raise CircuitOpenError(_("Scale '%(scale)s' is unreachable, next attempt after %(retry)s. Last error: %(error)s",
+                                     scale=self.name, retry=retry_at, error=error or ''))
+        raise CircuitOpenError(_("Scale '%(scale)s' is being probed. Last error: %(error)s",
+                                 scale=self.name, error=error or ''))
+
+    def _circuit_after_read(self, probe, weight=None, error=None):
+        """ Record the read outcome and move the circuit accordingly.
+
+        Telemetry goes through the coalescing buffer, the row is only written
+        here when the circuit itself changes.
+        """
+        self.ensure_one()
+        now = fields.Datetime.now()
+        self._record_telemetry(now, weight=weight, error=error)
+        if error is None and not probe and self._circuit_is_closed():
+            return
+        with self.env.registry.cursor() as cr:
+            if error is None:
+                # No row lock nor write while the circuit is already closed
+                cr.execute(SQL(
+                    """
+                    UPDATE weighing_scale
+                       SET circuit_state = 'closed', circuit_failures = 0, circuit_backoff = 0,
+                           circuit_retry_at = NULL, circuit_probe_until = NULL
+                     WHERE id = %s
+                       AND (circuit_state != 'closed' OR circuit_failures != 0)
+                    RETURNING id
+                    """,
+                    self.id,
+                ))
+                if cr.fetchone():
+                    _logger.info("Scale %s is reachable again, circuit closed", self.name)
+            else:
+                cr.execute(SQL(
+                    "SELECT circuit_state, circuit_failures, circuit_backoff FROM weighing_scale WHERE id = %s FOR UPDATE",
+                    self.id,
+                ))
+                state, failures, backoff = cr.fetchone()
+                failures = (failures or 0) + 1
+                if probe or state in ('open', 'half_open'):
+                    # Failed probe: back off exponentially
+                    backoff = min(max(backoff or 0, self.circuit_backoff_initial) * 2, self.circuit_backoff_max)
+                    state = 'open'
+                elif failures >= self.circuit_failure_threshold:
+                    backoff = self.circuit_backoff_initial
+                    state = 'open'
+                    _logger.warning("Scale %s failed %s times in a row, circuit opened", self.name, failures)
+                else:
+                    state = 'closed'
+                cr.execute(SQL(
+                    """
+                    UPDATE weighing_scale
+                       SET circuit_state = %s, circuit_failures = %s, circuit_backoff = %s,
+                           circuit_retry_at = %s, circuit_probe_until = NULL
+                     WHERE id = %s
+                    """,
+                    state, failures, backoff,
+                    now + timedelta(seconds=backoff) if state == 'open' else None, self.id,
+                ))
+        self.invalidate_recordset(self._CIRCUIT_FIELDS)
+
+    def _record_telemetry(self, check_date, weight=None, error=None):
+        """ Buffer the status of the last read, flushed in batches """
+        interval = int(self.env['ir.config_parameter'].sudo().get_param(
+            scale_telemetry.FLUSH_INTERVAL_PARAM, scale_telemetry.DEFAULT_FLUSH_INTERVAL))
+        scale_telemetry.telemetry_buffer.record(
+            self.env.cr.dbname, self.id, 'error' if error is not None else 'connected', check_date,
+            weight=weight if error is None else None, error=error, interval=interval,
+        )
+
+    def web_read(self, specification):
+        # Show the telemetry this process has not flushed yet
+        result = super().web_read(specification)
+        pending = scale_telemetry.telemetry_buffer.pending(self.env.cr.dbname, self.ids)
+        for values in result:
+            telemetry = pending.get(values['id'])
+            if not telemetry:
+                continue
+            if telemetry['last_read_weight'] is None:
+                del telemetry['last_read_weight'], telemetry['last_read_date']
+            for field_name, value in telemetry.items():
+                if field_name in specification:
+                    values[field_name] = value if value is not None else False
+        return result
+
+    def action_reset_circuit(self):
+        """ Close the circuit by hand, e.g. after repairing the indicator """
+        self.write({
+            'circuit_state': 'closed',
+            'circuit_failures': 0,
+            'circuit_backoff': 0,
+            'circuit_retry_at': False,
+            'circuit_probe_until': False,
+        })
+
     def action_enable(self):
         """ Enable scale """
         self.write({'is_enabled': True})
@@ -137,4 +724,16 @@ class WeighingScale(models.Model):
             'view_mode': 'list,form',
             'domain': [('scale_id', '=', self.id)],
             'context': {'default_scale_id': self.id}
-        }
\ No newline at end of file
+        }
+
+    def unlink(self):
+        # The database detaches the weighings of deleted scales, move their
+        # dashboard counters to the "no scale" bucket beforehand
+        weighings = self.env['truck.weighing'].with_context(active_test=False).search([('scale_id', 'in', self.ids)])
+        if weighings:
+            before = weighings._get_stats_snapshot()
+            weighings._update_stats(before, [dict(snap, scale_id=False) for snap in before])
+        if self:
+            self.env['weighing.scale.ingestion'].sudo()._reject_scale_readings(self.ids)
+        self._discard_connections()
+        return super(WeighingScale, self).unlink()
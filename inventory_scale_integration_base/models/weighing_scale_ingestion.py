@@ -0,0 +1,389 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api, SUPERUSER_ID, _
+from odoo.exceptions import UserError, ValidationError
+from odoo.tools import SQL
+from odoo.tools.sql import create_index, create_unique_index
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+import logging
+import psycopg2.errors
+import time
+import uuid
+
+from ..tools import scale_telemetry
+
+_logger = logging.getLogger(__name__)
+
+RETENTION_PARAM = 'inventory_scale_integration_base.ingestion_retention_days'
+DEFAULT_RETENTION = 30
+MODE_PARAM = 'inventory_scale_integration_base.ingestion_mode'
+WORKERS_PARAM = 'inventory_scale_integration_base.ingestion_workers'
+DEFAULT_WORKERS = 4
+MAX_BATCH_SIZE = 5000
+MAX_KEY_LENGTH = 128
+# Seconds a run of the apply cron works before handing over to the next run
+APPLY_TIME_LIMIT = 50
+# Pending readings of a scale fetched at once by an apply worker
+APPLY_CHUNK = 100
+# First key of the advisory locks serialising the apply workers of a scale
+APPLY_LOCK_NAMESPACE = 0x5CA1E
+
+
+class RetryLater(Exception):
+    """ The reading cannot be applied now, its key is released for a replay """
+
+
+class WeighingScaleIngestion(models.Model):
+    _name = 'weighing.scale.ingestion'
+    _description = 'Ingested Scale Reading'
+    _log_access = False
+    _order = 'received_date desc, id desc'
+    _rec_name = 'key'
+
+    key = fields.Char(string='Idempotency Key', required=True, readonly=True)
+    scale_id = fields.Many2one('weighing.scale', string='Weighing Scale', readonly=True, ondelete='set null')
+    device_date = fields.Datetime(string='Device Timestamp', readonly=True)
+    received_date = fields.Datetime(string='Received', readonly=True, index=True)
+    applied_date = fields.Datetime(string='Applied', readonly=True)
+    apply_latency = fields.Float(string='Apply Latency (s)', readonly=True, aggregator='avg', digits=(16, 3),
+                                 help="Seconds between the reception of the reading and its application")
+    weight = fields.Float(string='Weight (KG)', readonly=True)
+    state = fields.Selection([
+        ('pending', 'Pending'),
+        ('applied', 'Applied'),
+        ('rejected', 'Rejected'),
+    ], string='Status', required=True, readonly=True, default='pending')
+    message = fields.Text(string='Result', readonly=True)
+    weighing_id = fields.Many2one('truck.weighing', string='Weighing', readonly=True, ondelete='set null')
+
+    def init(self):
+        create_unique_index(self.env.cr, 'weighing_scale_ingestion_key_uniq', self._table, ['key'])
+        # Queue of each scale in apply order, only pending rows are indexed
+        create_index(self.env.cr, 'weighing_scale_ingestion_pending_index', self._table,
+                     ['scale_id', 'COALESCE(device_date, received_date)', 'id'], where="state = 'pending'")
+
+    @api.model
+    def _get_mode(self):
+        """ 'queue' applies pushed readings in the background, 'sync' within the push request """
+        return self.env['ir.config_parameter'].sudo().get_param(MODE_PARAM, 'queue')
+
+    @api.model
+    def _parse_reading(self, item, scales):
+        """ Check one reading of a batch, returns (key, scale, weight, device date)
+        or raises ValueError. scales caches the push scale of each scale id. """
+        if not isinstance(item, dict):
+            raise ValueError("Each reading must be an object.")
+        key = item.get('key')
+        if not key or not isinstance(key, str) or len(key) > MAX_KEY_LENGTH:
+            raise ValueError(f"Missing or invalid 'key', at most {MAX_KEY_LENGTH} characters.")
+        weight = float(item.get('weight') or 0.0)
+        if weight <= 0:
+            raise ValueError("Missing 'weight' in the reading.")
+        scale_ref = item.get('scale_id') or None
+        if scale_ref not in scales:
+            scales[scale_ref] = self.env['weighing.scale']._get_push_scale(scale_ref)
+        device_date = None
+        if item.get('timestamp'):
+            device_date = datetime.fromisoformat(str(item['timestamp']))
+            if device_date.tzinfo:
+                device_date = device_date.astimezone(timezone.utc).replace(tzinfo=None)
+        return key, scales[scale_ref], weight, device_date
+
+    @api.model
+    def _new_key(self):
+        """ Key of a reading pushed without one, it cannot be deduplicated """
+        return f'auto-{uuid.uuid4().hex}'
+
+    @api.model
+    def _claim_keys(self, items):
+        """ Parse items and claim their keys.
+
+        Keys are claimed with INSERT ... ON CONFLICT DO NOTHING on the unique
+        key index: replayed keys, including those of a batch committed
+        concurrently, get the stored result of their first delivery back.
+        Readings without a valid scale are stored rejected at once.
+        Returns (results, parsed, claimed): results holds one dict per item,
+        None for the claimed ones, parsed maps keys to (index, scale, weight,
+        device date) and claimed is the set of new keys.
+        """
+        if len(items) > MAX_BATCH_SIZE:
+            raise ValueError(f"At most {MAX_BATCH_SIZE} readings per batch.")
+        now = fields.Datetime.now()
+        results = [None] * len(items)
+        parsed = {}
+        scales = {}
+        for index, item in enumerate(items):
+            try:
+                key, scale, weight, device_date = self._parse_reading(item, scales)
+            except (ValueError, TypeError) as e:
+                results[index] = {'key': item.get('key') if isinstance(item, dict) else None,
+                                  'success': False, 'error': str(e)}
+                continue
+            if key in parsed:
+                results[index] = {'key': key, 'success': False, 'duplicate': True,
+                                  'error': "Key repeated in the batch."}
+                continue
+            parsed[key] = (index, scale, weight, device_date)
+        if not parsed:
+            return results, parsed, set()
+
+        no_scale = _("Unknown, disabled or missing scale.")
+        self.env.cr.execute(SQL(
+            """
+            INSERT INTO weighing_scale_ingestion (key, scale_id, device_date, received_date, weight, state, message)
+                 VALUES %s
+            ON CONFLICT (key) DO NOTHING
+              RETURNING key
+            """,
+            SQL(", ").join(
+                SQL("(%s, %s, %s, %s, %s, %s, %s)", key, scale.id or None, device_date, now, weight,
+                    'pending' if scale else 'rejected', None if scale else no_scale)
+                for key, (_index, scale, weight, device_date) in parsed.items()
+            ),
+        ))
+        claimed = {row[0] for row in self.env.cr.fetchall()}
+        replayed = [key for key in parsed if key not in claimed]
+        if replayed:
+            self.env.cr.execute(SQL(
+                "SELECT key, state, message, weighing_id FROM weighing_scale_ingestion WHERE key IN %s",
+                tuple(replayed),
+            ))
+            for key, state, message, weighing_id in self.env.cr.fetchall():
+                results[parsed[key][0]] = self._make_result(key, state, message, weighing_id, duplicate=True)
+            for key in replayed:
+                # Claimed by a batch committed after this transaction started
+                if results[parsed[key][0]] is None:
+                    results[parsed[key][0]] = {'key': key, 'success': False, 'retry': True,
+                                               'error': "Reading being ingested by another request."}
+        for key in claimed:
+            if not parsed[key][1]:
+                results[parsed[key][0]] = {'key': key, 'success': False, 'error': no_scale}
+        return results, parsed, {key for key in claimed if parsed[key][1]}
+
+    @api.model
+    def _make_result(self, key, state, message, weighing_id, duplicate=False):
+        result = {'key': key, 'success': state != 'rejected', 'weighing_id': weighing_id}
+        if state == 'pending':
+            result['queued'] = True
+        result['error' if state == 'rejected' else 'message'] = message
+        if duplicate:
+            result['duplicate'] = True
+        return result
+
+    @api.model
+    def _record_readings(self, readings):
+        """ Add [(scale, weight, read date)] to the reading history once the transaction commits """
+        dbname = self.env.cr.dbname
+        rows = [(scale.id, read_date, weight) for scale, weight, read_date in readings]
+
+        @self.env.cr.postcommit.add
+        def record():
+            for scale_id, read_date, weight in rows:
+                # Middlewares do not report motion, pushed weights are taken as stable
+                scale_telemetry.telemetry_buffer.record_reading(dbname, scale_id, read_date, weight, True, 'push')
+
+    @api.model
+    def _apply_reading(self, scale, weight, read_date=None):
+        """ Apply weight, read at read_date, on the open weighing of scale in a savepoint.
+
+        Returns (state, message, weighing id), state 'retry' when the open
+        weighing is locked or was changed by another request, 'rejected'
+        when the reading is refused. Other errors propagate.
+        """
+        Weighing = self.env['truck.weighing'].sudo()
+        weighing = Weighing.browse()
+        try:
+            with self.env.cr.savepoint():
+                weighing, busy = Weighing._claim_open_weighing(scale)
+                if busy:
+                    raise RetryLater(_("The open weighing of scale %s is being updated by another request.") % scale.name)
+                if not weighing:
+                    raise ValueError(_("No active weighing record found for scale %s.") % scale.name)
+                message = weighing._apply_scale_weight(weight, read_date=read_date)
+            return 'applied', message, weighing.id
+        except RetryLater as e:
+            return 'retry', str(e), None
+        except (psycopg2.errors.SerializationFailure, psycopg2.errors.LockNotAvailable):
+            # The weighing changed after this transaction's snapshot, a later try applies the reading
+            return 'retry', _("The open weighing of scale %s was updated by another request.") % scale.name, None
+        except (UserError, ValidationError, ValueError) as e:
+            return 'rejected', str(e), weighing.id or None
+
+    @api.model
+    def _save_outcomes(self, outcomes):
+        """ Store {key: (state, message, weighing id)} with one UPDATE """
+        now = fields.Datetime.now()
+        self.env.cr.execute(SQL(
+            """
+            UPDATE weighing_scale_ingestion i
+               SET state = r.state, message = r.message, weighing_id = r.weighing_id,
+                   applied_date = r.applied_date,
+                   apply_latency = EXTRACT(EPOCH FROM r.applied_date - i.received_date)
+              FROM (VALUES %s) AS r(key, state, message, weighing_id, applied_date)
+             WHERE i.key = r.key
+            """,
+            SQL(", ").join(
+                SQL("(%s, %s, %s::text, %s::integer, %s::timestamp)", key, state, message, weighing_id, now)
+                for key, (state, message, weighing_id) in outcomes.items()
+            ),
+        ))
+
+    @api.model
+    def _ingest(self, items):
+        """ Apply a batch of pushed readings in the current transaction, each at most once per key.
+
+        New readings are applied per scale in device time order, each in a
+        savepoint so that a refused reading does not undo the others.
+        Readings whose weighing is locked by another request release their
+        key and answer 'retry'. Returns one result dict per item, in order.
+        """
+        results, parsed, claimed = self._claim_keys(items)
+        now = fields.Datetime.now()
+        outcomes = {}
+        released = []
+        order = sorted(claimed, key=lambda key: (parsed[key][1].id, parsed[key][3] or now, parsed[key][0]))
+        for key in order:
+            index, scale, weight, device_date = parsed[key]
+            state, message, weighing_id = self._apply_reading(scale, weight, read_date=device_date or now)
+            if state == 'retry':
+                released.append(key)
+                results[index] = {'key': key, 'success': False, 'retry': True, 'error': message}
+                continue
+            outcomes[key] = (state, message, weighing_id)
+            results[index] = self._make_result(key, state, message, weighing_id)
+        if outcomes:
+            self._save_outcomes(outcomes)
+        if released:
+            self.env.cr.execute(SQL("DELETE FROM weighing_scale_ingestion WHERE key IN %s", tuple(released)))
+        if outcomes:
+            self._record_readings([(parsed[key][1], parsed[key][2], parsed[key][3] or now) for key in outcomes])
+        self.invalidate_model()
+        _logger.info("Ingested %s reading(s): %s applied, %s rejected, %s to retry, %s replayed",
+                     len(items), sum(1 for outcome in outcomes.values() if outcome[0] == 'applied'),
+                     sum(1 for outcome in outcomes.values() if outcome[0] == 'rejected'), len(released),
+                     sum(1 for result in results if result and result.get('duplicate')))
+        return results
+
+    @api.model
+    def _enqueue(self, items):
+        """ Store a batch of pushed readings for the apply workers and return at once.
+
+        The readings are durable once the request commits; the apply cron is
+        triggered to pick them up. Returns one result dict per item, in order.
+        """
+        results, parsed, claimed = self._claim_keys(items)
+        for key in claimed:
+            results[parsed[key][0]] = {'key': key, 'success': True, 'queued': True}
+        if claimed:
+            now = fields.Datetime.now()
+            self._record_readings([(parsed[key][1], parsed[key][2], parsed[key][3] or now) for key in claimed])
+            self.env.ref('inventory_scale_integration_base.ir_cron_weighing_scale_ingestion_apply')._trigger()
+        return results
+
+    # Apply workers
+
+    @api.model
+    def _apply_scale_queue(self, scale_id, deadline):
+        """ Apply the pending readings of one scale in device time order.
+
+        Each reading is committed on its own. The worker stops at a reading
+        whose weighing is busy, so a later reading never overtakes it, and
+        an advisory lock keeps two workers off the same scale. Returns the
+        number of readings processed.
+        """
+        cr = self.env.cr
+        cr.execute(SQL("SELECT pg_try_advisory_lock(%s, %s)", APPLY_LOCK_NAMESPACE, scale_id))
+        if not cr.fetchone()[0]:
+            return 0
+        processed = 0
+        try:
+            scale = self.env['weighing.scale'].browse(scale_id)
+            while time.monotonic() < deadline:
+                cr.execute(SQL(
+                    """
+                    SELECT key, weight, COALESCE(device_date, received_date)
+                      FROM weighing_scale_ingestion
+                     WHERE scale_id = %s AND state = 'pending'
+                  ORDER BY COALESCE(device_date, received_date), id
+                     LIMIT %s
+                    """,
+                    scale_id, APPLY_CHUNK,
+                ))
+                rows = cr.fetchall()
+                if not rows:
+                    break
+                for key, weight, read_date in rows:
+                    state, message, weighing_id = self._apply_reading(scale, weight, read_date=read_date)
+                    if state == 'retry':
+                        cr.rollback()
+                        return processed
+                    self._save_outcomes({key: (state, message, weighing_id)})
+                    cr.commit()
+                    processed += 1
+                    if time.monotonic() >= deadline:
+                        break
+        finally:
+            cr.rollback()
+            cr.execute(SQL("SELECT pg_advisory_unlock(%s, %s)", APPLY_LOCK_NAMESPACE, scale_id))
+            cr.commit()
+        return processed
+
+    @api.model
+    def _cron_apply_queue(self):
+        """ Apply the queued readings, scales in parallel on a thread pool
+        with one cursor per worker, the readings of a scale in order """
+        self.env.cr.execute(SQL(
+            "SELECT DISTINCT scale_id FROM weighing_scale_ingestion WHERE state = 'pending' AND scale_id IS NOT NULL"
+        ))
+        scale_ids = [row[0] for row in self.env.cr.fetchall()]
+        if not scale_ids:
+            return
+        workers = int(self.env['ir.config_parameter'].sudo().get_param(WORKERS_PARAM, DEFAULT_WORKERS))
+        deadline = time.monotonic() + APPLY_TIME_LIMIT
+        registry = self.env.registry
+
+        def work(scale_id):
+            try:
+                with registry.cursor() as cr:
+                    env = api.Environment(cr, SUPERUSER_ID, {})
+                    return env['weighing.scale.ingestion']._apply_scale_queue(scale_id, deadline)
+            except Exception:
+                _logger.exception("Applying the queued readings of scale %s failed", scale_id)
+                return 0
+
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=max(min(workers, len(scale_ids)), 1),
+                                thread_name_prefix='scale_ingestion') as executor:
+            processed = sum(executor.map(work, scale_ids))
+        _logger.info("Applied %s queued reading(s) of %s scale(s) in %.2f s",
+                     processed, len(scale_ids), time.monotonic() - started)
+        self.env.cr.execute(SQL("SELECT 1 FROM weighing_scale_ingestion WHERE state = 'pending' AND scale_id IS NOT NULL LIMIT 1"))
+        if self.env.cr.fetchone():
+            # Busy weighings or the time limit left readings behind
+            self.env.ref('inventory_scale_integration_base.ir_cron_weighing_scale_ingestion_apply')._trigger(
+                fields.Datetime.now() + timedelta(seconds=5))
+
+    @api.model
+    def _reject_scale_readings(self, scale_ids):
+        """ Reject the pending readings of scales about to be deleted, no worker would apply them """
+        self.env.cr.execute(SQL(
+            "UPDATE weighing_scale_ingestion SET state = 'rejected', message = %s "
+            "WHERE scale_id IN %s AND state = 'pending'",
+            _("Scale deleted before the reading was applied."), tuple(scale_ids),
+        ))
+        if self.env.cr.rowcount:
+            _logger.info("Rejected %s pending reading(s) of deleted scale(s)", self.env.cr.rowcount)
+            self.invalidate_model(['state', 'message'])
+
+    @api.model
+    def _cron_purge(self):
+        """ Forget the keys older than the retention, a replay after it applies again """
+        days = int(self.env['ir.config_parameter'].sudo().get_param(RETENTION_PARAM, DEFAULT_RETENTION))
+        if days <= 0:
+            return
+        self.env.cr.execute(SQL(
+            # Pending readings left without a scale are never applied
+            "DELETE FROM weighing_scale_ingestion WHERE received_date < %s AND (state != 'pending' OR scale_id IS NULL)",
+            fields.Datetime.now() - timedelta(days=days),
+        ))
+        _logger.info("Purged %s ingested scale reading key(s)", self.env.cr.rowcount)
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api
+from odoo.tools import SQL
+from odoo.tools.sql import create_index
+from datetime import timedelta
+import logging
+
+_logger = logging.getLogger(__name__)
+
+RAW_RETENTION_PARAM = 'inventory_scale_integration_base.reading_raw_retention_days'
+RETENTION_PARAM = 'inventory_scale_integration_base.reading_retention_days'
+DEFAULT_RAW_RETENTION = 7
+DEFAULT_RETENTION = 365
+
+
+class WeighingScaleReading(models.Model):
+    _name = 'weighing.scale.reading'
+    _description = 'Weighing Scale Reading'
+    _log_access = False
+    _order = 'timestamp desc, id desc'
+    _rec_name = 'timestamp'
+
+    scale_id = fields.Many2one('weighing.scale', string='Weighing Scale', required=True, readonly=True, ondelete='cascade')
+    timestamp = fields.Datetime(string='Timestamp', required=True, readonly=True)
+    weight = fields.Float(string='Weight (KG)', readonly=True, aggregator='avg',
+                          help="Reading of raw samples, average of downsampled ones")
+    weight_min = fields.Float(string='Min (KG)', readonly=True, aggregator='min')
+    weight_max = fields.Float(string='Max (KG)', readonly=True, aggregator='max')
+    sample_count = fields.Integer(string='Samples', readonly=True, default=1)
+    stable = fields.Boolean(string='Stable', readonly=True,
+                            help="Downsampled rows are stable only if all their samples were")
+    source = fields.Selection([
+        ('poll', 'Poller'),
+        ('live', 'Live Read'),
+        ('push', 'Pushed'),
+    ], string='Source', required=True, readonly=True, default='live')
+    resolution = fields.Selection([
+        ('raw', 'Raw'),
+        ('minute', 'Per Minute'),
+    ], string='Resolution', required=True, readonly=True, default='raw')
+
+    def init(self):
+        # Readings are appended in time order: a BRIN index stays tiny and
+        # cheap to maintain while narrowing time windows to a few pages
+        create_index(self.env.cr, 'weighing_scale_reading_timestamp_brin', self._table,
+                     ['"timestamp"'], method='brin')
+
+    @api.model
+    def _get_window_domain(self, scale, date_from, date_to):
+        # The readings of a platform group are those of its platforms
+        return [('scale_id', 'in', (scale.member_ids or scale).ids), ('timestamp', '>=', date_from), ('timestamp', '<=', date_to)]
+
+    @api.model
+    def _cron_downsample(self):
+        """Fold raw readings past their retention into per-minute rows and
+        delete rows past the global retention.
+
+        Raw readings inside the gross/tare window of a weighing are kept so
+        that captures can always be checked against what the scale showed.
+        """
+        params = self.env['ir.config_parameter'].sudo()
+        raw_days = int(params.get_param(RAW_RETENTION_PARAM, DEFAULT_RAW_RETENTION))
+        days = int(params.get_param(RETENTION_PARAM, DEFAULT_RETENTION))
+        now = fields.Datetime.now()
+        self.env['truck.weighing'].flush_model(['scale_id', 'gross_reading_start', 'gross_reading_end',
+                                                'tare_reading_start', 'tare_reading_end'])
+        self.env['weighing.scale'].flush_model(['member_ids'])
+        self.flush_model()
+        if raw_days > 0:
+            # Whole minutes only, so a minute is never split over two runs
+            cutoff = (now - timedelta(days=raw_days)).replace(second=0, microsecond=0)
+            self.env.cr.execute(SQL(
+                """
+                WITH moved AS (
+                    DELETE FROM weighing_scale_reading r
+                     WHERE r.resolution = 'raw'
+                       AND r."timestamp" < %(cutoff)s
+                       AND NOT EXISTS (
+                           SELECT 1
+                             FROM truck_weighing w
+                            WHERE (w.scale_id = r.scale_id OR w.scale_id IN (
+                                       SELECT group_id FROM weighing_scale_group_member_rel WHERE member_id = r.scale_id))
+                              AND (r."timestamp" BETWEEN w.gross_reading_start AND w.gross_reading_end
+                                   OR r."timestamp" BETWEEN w.tare_reading_start AND w.tare_reading_end))
+                 RETURNING r.scale_id, r."timestamp", r.weight, r.weight_min, r.weight_max,
+                           r.sample_count, r.stable, r.source
+                )
+                INSERT INTO weighing_scale_reading
+                            (scale_id, "timestamp", weight, weight_min, weight_max, sample_count, stable, source, resolution)
+                     SELECT scale_id, date_trunc('minute', "timestamp"),
+                            SUM(weight * sample_count) / SUM(sample_count), MIN(weight_min), MAX(weight_max),
+                            SUM(sample_count), bool_and(stable), source, 'minute'
+                       FROM moved
+                   GROUP BY scale_id, source, date_trunc('minute', "timestamp")
+                """,
+                cutoff=cutoff,
+            ))
+            _logger.info("Downsampled %s raw scale reading minute(s)", self.env.cr.rowcount)
+        if days > 0:
+            self.env.cr.execute(SQL(
+                """
+                DELETE FROM weighing_scale_reading r
+                 WHERE r."timestamp" < %s
+                   AND NOT EXISTS (
+                       SELECT 1
+                         FROM truck_weighing w
+                        WHERE (w.scale_id = r.scale_id OR w.scale_id IN (
+                                   SELECT group_id FROM weighing_scale_group_member_rel WHERE member_id = r.scale_id))
+                          AND (r."timestamp" BETWEEN w.gross_reading_start AND w.gross_reading_end
+                               OR r."timestamp" BETWEEN w.tare_reading_start AND w.tare_reading_end))
+                """,
+                now - timedelta(days=days),
+            ))
+        self.invalidate_model()
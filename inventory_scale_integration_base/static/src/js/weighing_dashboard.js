@@ -1,6 +1,6 @@
 /** @odoo-module **/
 
-import { Component, onWillStart, useState } from "@odoo/owl";
+import { Component, onMounted, onWillStart, onWillUnmount, useState } from "@odoo/owl";
 import { registry } from "@web/core/registry";
 import { useService } from "@web/core/utils/hooks";
 import { rpc } from "@web/core/network/rpc";
@@ -11,27 +11,69 @@ export class WeighingOverviewDashboard extends Component {
         this.action = useService("action");
         this.state = useState({
             data: {},
+            cardLoading: {},
+            cacheStats: {},
+            liveScales: [],
             loading: true
         });
+        this.cards = {};
 
         onWillStart(async () => {
-            await this.loadData();
+            try {
+                this.cards = await this.orm.call("weighing.overview", "get_overview_cards", []);
+            } catch (error) {
+                console.error("Error loading dashboard cards:", error);
+            } finally {
+                this.state.loading = false;
+            }
+        });
+
+        onMounted(() => {
+            this.loadData();
+            this.loadLiveScales();
+            // Live readings come from shared memory, polling them is cheap
+            this.liveInterval = setInterval(() => this.loadLiveScales(), 2000);
+        });
+
+        onWillUnmount(() => {
+            clearInterval(this.liveInterval);
         });
     }
 
+    async loadLiveScales() {
+        try {
+            this.state.liveScales = await this.orm.silent.call("weighing.scale", "get_live_readings", []);
+        } catch (error) {
+            console.error("Error loading live scale readings:", error);
+        }
+    }
+
     async loadData() {
-        this.state.loading = true;
+        // Every card has its own call, render each one as soon as it arrives
+        await Promise.all(Object.entries(this.cards).map(([card, method]) => this.loadCard(card, method)));
+        try {
+            this.state.cacheStats = await this.orm.call("weighing.overview", "get_cache_stats", []);
+        } catch (error) {
+            console.error("Error loading cache statistics:", error);
+        }
+    }
+
+    async loadCard(card, method) {
+        this.state.cardLoading[card] = true;
         try {
-            const data = await this.orm.call("weighing.overview", "get_overview_data", []);
-            this.state.data = data;
+            this.state.data[card] = await this.orm.call("weighing.overview", method, []);
         } catch (error) {
-            console.error("Error loading dashboard data:", error);
-            this.state.data = {}; // Fallback to empty data
+            console.error(`Error loading dashboard card ${card}:`, error);
+            this.state.data[card] = {}; // Fallback to empty data
         } finally {
-            this.state.loading = false;
+            this.state.cardLoading[card] = false;
         }
     }
 
+    isCardLoading(card) {
+        return Boolean(this.state.cardLoading[card]);
+    }
+
     async onCardAction(actionName) {
         const actions = {
 
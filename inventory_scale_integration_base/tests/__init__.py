@@ -0,0 +1,3 @@
+# -*- coding: utf-8 -*-
+from . import test_scale_drivers
+from . import test_scale_edge_agent
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import random
+import threading
+
+from odoo.tests import BaseCase
+
+from odoo.addons.inventory_scale_integration_base.tools import scale_drivers, scale_simulator
+from odoo.addons.inventory_scale_integration_base.tools.scale_drivers import (
+    FrameParser, MtSicsDriver, ScaleReadError, SerialOverTcpDriver, TcpStreamDriver,
+)
+
+
+def toledo_frame(digits, swa=0x22, swb=0x30):
+    """ Toledo continuous frame without STX and CR, as returned by the parser """
+    return bytes((swa, swb, 0x20)) + digits + b'000000'
+
+
+class TestFrameParser(BaseCase):
+
+    def test_frames_split_over_feeds(self):
+        parser = FrameParser(b'\n')
+        self.assertEqual(parser.feed(b'ST,GS,+0012'), [])
+        self.assertEqual(parser.feed(b'34.5kg\r\nST,GS'), [b'ST,GS,+001234.5kg'])
+        self.assertEqual(parser.feed(b',+001235.0kg\r\n\r\n'), [b'ST,GS,+001235.0kg'])
+
+    def test_resync_on_start_byte(self):
+        parser = FrameParser(b'\r', start=b'\x02')
+        # Noise before the start byte and frames without one are dropped
+        self.assertEqual(parser.feed(b'\x00\xffgarbage\x02abc\r'), [b'abc'])
+        self.assertEqual(parser.feed(b'no start\r\x02def\r'), [b'def'])
+        # A frame cut by a reconnection restarts at the next start byte
+        self.assertEqual(parser.feed(b'\x02trunc\x02ghi\r'), [b'ghi'])
+
+    def test_garbage_tail_dropped(self):
+        parser = FrameParser(b'\n', max_frame=8)
+        self.assertEqual(parser.feed(b'x' * 20), [])
+        self.assertEqual(len(parser.buffer), 8)
+        parser.reset()
+        self.assertEqual(parser.feed(b'S S 1 kg\n'), [b'S S 1 kg'])
+
+
+class TestParseFrame(BaseCase):
+
+    def test_tcp_stream(self):
+        driver = TcpStreamDriver('127.0.0.1', 0, 1)
+        self.assertEqual(driver._parse_frame(b'ST,GS,+001234.5kg'), (1234.5, True))
+        self.assertEqual(driver._parse_frame(b'US,GS,-000010.0kg'), (-10.0, False))
+        self.assertEqual(driver._parse_frame(b'ST,GS,+1.5t'), (1500.0, True))
+        self.assertEqual(driver._parse_frame(b'ST,NT,+250'), (250.0, True))
+        with self.assertRaises(ScaleReadError):
+            driver._parse_frame(b'OL,GS,+999999.9kg')
+        with self.assertRaises(ScaleReadError):
+            driver._parse_frame(b'ST,GS,----')
+
+    def test_mt_sics(self):
+        driver = MtSicsDriver('127.0.0.1', 0, 1)
+        self.assertEqual(driver._parse_frame(b'S S     100.00 kg'), (100.0, True))
+        self.assertEqual(driver._parse_frame(b'S D     100.00 kg'), (100.0, False))
+        self.assertEqual(driver._parse_frame(b'S S       1.50 t'), (1500.0, True))
+        self.assertAlmostEqual(driver._parse_frame(b'S S     100.00 lb')[0], 45.359237)
+        for frame, error in ((b'S I', "busy"), (b'S +', "overload"), (b'S -', "underload"),
+                             (b'ES', "Indicator error"), (b'EL', "Indicator error"),
+                             (b'S S     100.00 oz', "Unsupported unit"), (b'I4 A "SIM"', "Unexpected")):
+            with self.assertRaisesRegex(ScaleReadError, error):
+                driver._parse_frame(frame)
+
+    def test_toledo_status_bits(self):
+        driver = SerialOverTcpDriver('127.0.0.1', 0, 1)
+        self.assertEqual(driver._parse_frame(toledo_frame(b'012345')), (12345.0, True))
+        # Status word A bits 0-2 place the decimal point
+        self.assertEqual(driver._parse_frame(toledo_frame(b'012345', swa=0x24)), (123.45, True))
+        self.assertEqual(driver._parse_frame(toledo_frame(b'000123', swa=0x21)), (1230.0, True))
+        # Status word B: negative, motion, pounds, over capacity
+        self.assertEqual(driver._parse_frame(toledo_frame(b'000100', swb=0x32)), (-100.0, True))
+        self.assertEqual(driver._parse_frame(toledo_frame(b'000100', swb=0x38)), (100.0, False))
+        self.assertAlmostEqual(driver._parse_frame(toledo_frame(b'000100', swb=0x20))[0], 45.359237)
+        with self.assertRaisesRegex(ScaleReadError, "over capacity"):
+            driver._parse_frame(toledo_frame(b'000100', swb=0x34))
+        with self.assertRaisesRegex(ScaleReadError, "Short frame"):
+            driver._parse_frame(b'\x22\x30 0123')
+        with self.assertRaisesRegex(ScaleReadError, "Unparsable"):
+            driver._parse_frame(toledo_frame(b'01 345'))
+
+
+class FixedScale:
+    """ Simulated scale showing a set weight """
+
+    def __init__(self, weight, stable=True):
+        self.scale_id = 1
+        self.rng = random.Random(0)
+        self.weight = weight
+        self.stable = stable
+
+    def available(self, now=None):
+        return True
+
+    def sample(self, now=None):
+        return self.weight, self.stable
+
+
+class TestDriversOnSimulator(BaseCase):
+    """ Each socket driver against the matching protocol of the simulator """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.options = scale_simulator.parse_options(['--stream-rate', '50'])
+        cls.loop = asyncio.new_event_loop()
+        cls.thread = threading.Thread(target=cls.loop.run_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.loop.call_soon_threadsafe(cls.loop.stop)
+        cls.thread.join(5)
+        cls.loop.close()
+        super().tearDownClass()
+
+    def _run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(5)
+
+    def _driver(self, protocol, scale):
+        """ Driver of protocol connected to a simulator serving scale """
+        server = scale_simulator.ScaleServer(
+            scale, protocol, '127.0.0.1', 0, self.options, scale_simulator.SimulatorStats())
+        self._run(server.start())
+        self.addCleanup(self._run, server.close())
+        port = server.server.sockets[0].getsockname()[1]
+        driver = scale_drivers.DRIVERS[protocol]('127.0.0.1', port, 2)
+        self.addCleanup(driver.close)
+        return driver
+
+    def test_tcp_stream(self):
+        scale = FixedScale(24680.0)
+        driver = self._driver('tcp_stream', scale)
+        self.assertEqual(driver.read(), (24680.0, True))
+        scale.weight, scale.stable = 24710.0, False
+        # Frames queued since the last read are skipped for the newest one
+        self.assertEqual(self._read_until(driver, 24710.0), (24710.0, False))
+
+    def test_mt_sics(self):
+        scale = FixedScale(15320.0, stable=False)
+        driver = self._driver('mt_sics', scale)
+        self.assertEqual(driver.read(), (15320.0, False))
+        scale.stable = True
+        self.assertEqual(driver.read(), (15320.0, True))
+        scale.weight = 90000.0
+        with self.assertRaisesRegex(ScaleReadError, "overload"):
+            driver.read()
+
+    def test_serial_tcp(self):
+        scale = FixedScale(31000.0)
+        driver = self._driver('serial_tcp', scale)
+        self.assertEqual(driver.read(), (31000.0, True))
+        scale.weight = 90000.0
+        with self.assertRaisesRegex(ScaleReadError, "over capacity"):
+            self._read_until(driver, None)
+
+    def _read_until(self, driver, weight, attempts=50):
+        """ Read a streaming indicator until it shows weight or fails """
+        for _attempt in range(attempts):
+            result = driver.read()
+            if result[0] == weight:
+                return result
+        self.fail(f"The indicator never showed {weight}")
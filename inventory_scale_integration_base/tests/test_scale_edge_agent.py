@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+import threading
+from types import SimpleNamespace
+
+from odoo.tests import BaseCase
+
+from odoo.addons.inventory_scale_integration_base.tools import scale_edge_agent
+from odoo.addons.inventory_scale_integration_base.tools.scale_edge_agent import (
+    AgentStats, Forwarder, ReadingQueue, SendError, StubReceiver,
+)
+
+BUSY_SCALE = 2
+UNKNOWN_SCALE = 3
+
+
+class Receiver(StubReceiver):
+    """ Stub answering retry for a busy scale and refusing an unknown one """
+
+    def ingest(self, readings):
+        results = []
+        for reading in readings:
+            if reading['scale_id'] == BUSY_SCALE:
+                results.append({'key': reading['key'], 'success': False, 'retry': True, 'error': "Weighing busy"})
+            elif reading['scale_id'] == UNKNOWN_SCALE:
+                results.append({'key': reading['key'], 'success': False, 'error': "Unknown scale"})
+            else:
+                results += super().ingest([reading])
+        return results
+
+
+class TestEdgeAgent(BaseCase):
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.queue = ReadingQueue(os.path.join(directory.name, 'queue.sqlite3'))
+        self.addCleanup(self.queue.close)
+        self.receiver = Receiver(('127.0.0.1', 0), SimpleNamespace(outage_rate=0.0, outage_duration=0.0, error_rate=0.0))
+        thread = threading.Thread(target=self.receiver.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(self.receiver.server_close)
+        self.addCleanup(self.receiver.shutdown)
+        options = scale_edge_agent.parse_options([
+            'run', '--url', 'http://127.0.0.1:%s' % self.receiver.server_address[1], '--timeout', '5',
+        ])
+        self.stats = AgentStats()
+        self.forwarder = Forwarder(self.queue, options, self.stats, threading.Event())
+        self.addCleanup(lambda: self.forwarder.connection and self.forwarder.connection.close())
+
+    def _append(self, scale_id, weight):
+        return self.queue.append(scale_id, weight, True, '2026-10-17T08:00:00+00:00')
+
+    def _rejected(self):
+        with self.queue._lock:
+            return self.queue._db.execute("SELECT seq, error FROM rejected ORDER BY seq").fetchall()
+
+    def test_ack(self):
+        seqs = [self._append(1, 12000.0 + i) for i in range(3)]
+        self.assertEqual(self.forwarder.send(self.queue.peek(10)), (3, 0))
+        self.assertEqual(self.queue.depth(), 0)
+        self.assertEqual(set(self.receiver.keys), {self.queue.key(seq) for seq in seqs})
+        self.assertEqual((self.stats.batches, self.stats.delivered, self.stats.rejected), (1, 3, 0))
+
+    def test_resend_after_lost_answer(self):
+        seq = self._append(1, 12000.0)
+        # Odoo applied the batch but the answer never reached the agent
+        self.receiver.ingest([{'key': self.queue.key(seq), 'scale_id': 1, 'weight': 12000.0}])
+        self.assertEqual(self.forwarder.send(self.queue.peek(10)), (1, 0))
+        self.assertEqual(self.queue.depth(), 0)
+        self.assertEqual(len(self.receiver.keys), 1)
+        self.assertEqual(self.stats.duplicates, 1)
+
+    def test_retry_keeps_readings_in_order(self):
+        busy = self._append(BUSY_SCALE, 8000.0)
+        done = self._append(1, 12000.0)
+        self.assertEqual(self.forwarder.send(self.queue.peek(10)), (1, 1))
+        rows = self.queue.peek(10)
+        self.assertEqual([row[0] for row in rows], [busy])
+        with self.queue._lock:
+            attempts = self.queue._db.execute("SELECT attempts FROM readings WHERE seq = ?", (busy,)).fetchone()[0]
+        self.assertEqual(attempts, 1)
+        self.assertNotIn(self.queue.key(busy), self.receiver.keys)
+        self.assertIn(self.queue.key(done), self.receiver.keys)
+
+    def test_reject(self):
+        refused = self._append(UNKNOWN_SCALE, 9000.0)
+        self._append(1, 12000.0)
+        with self.assertLogs(scale_edge_agent._logger, 'WARNING'):
+            self.assertEqual(self.forwarder.send(self.queue.peek(10)), (2, 0))
+        self.assertEqual(self.queue.depth(), 0)
+        self.assertEqual(self._rejected(), [(refused, "Unknown scale")])
+        self.assertEqual((self.stats.delivered, self.stats.rejected), (1, 1))
+
+    def test_server_error_keeps_batch(self):
+        self._append(1, 12000.0)
+        self.receiver.options.error_rate = 1.0
+        with self.assertRaisesRegex(SendError, "HTTP 500"):
+            self.forwarder.send(self.queue.peek(10))
+        self.assertEqual(self.queue.depth(), 1)
+        self.receiver.options.error_rate = 0.0
+        self.assertEqual(self.forwarder.send(self.queue.peek(10)), (1, 0))
+        self.assertEqual(self.queue.depth(), 0)
+
+    def test_queue_survives_restart(self):
+        seq = self._append(1, 12000.0)
+        key = self.queue.key(seq)
+        path = self.queue.path
+        self.queue.close()
+        self.queue = ReadingQueue(path)
+        self.addCleanup(self.queue.close)
+        self.assertEqual(self.queue.key(seq), key)
+        self.assertEqual([row[0] for row in self.queue.peek(10)], [seq])
+        self.assertTrue(self.queue.available.is_set())
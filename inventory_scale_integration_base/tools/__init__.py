@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+from . import http_pool
+from . import scale_drivers
+from . import stability
+from . import scale_telemetry
+from . import shared_readings
+from . import scale_poller
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""Per-process pool of keep-alive HTTP sessions, one per weighing scale."""
+import logging
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = 2
+
+
+class ScaleSession:
+    """Keep-alive session of one scale, bound to its connection settings"""
+
+    def __init__(self, config):
+        self.config = config
+        ip_address, port, timeout, pool_size = config
+        self.base_url = f"http://{ip_address}:{port}"
+        self.timeout = timeout
+        self.session = requests.Session()
+        # Connections above pool_size are opened when needed but not kept alive
+        self.adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(pool_size, 1), pool_block=False)
+        self.session.mount('http://', self.adapter)
+        self.requests = 0
+
+    def get(self, path):
+        self.requests += 1
+        return self.session.get(self.base_url + path, timeout=self.timeout)
+
+    @property
+    def connections(self):
+        """Number of TCP connections opened by this session so far"""
+        pools = self.adapter.poolmanager.pools
+        return sum(pools[key].num_connections for key in pools.keys())
+
+    def close(self):
+        self.session.close()
+
+
+class ScaleSessionPool:
+    """Sessions keyed by (database, scale id), rebuilt when the settings change.
+
+    The pool belongs to the current process: a forked worker starts from an
+    empty pool instead of sharing the sockets of its parent.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._sessions = {}
+        self._stats = {}
+
+    def _check_pid(self):
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._sessions = {}
+            self._stats = {}
+
+    def _stats_of(self, key):
+        return self._stats.setdefault(key, {'requests': 0, 'connections': 0, 'rebuilds': 0})
+
+    def session(self, key, config):
+        """Session of key for config, creating or rebuilding it if needed"""
+        with self._lock:
+            self._check_pid()
+            current = self._sessions.get(key)
+            if current and current.config == config:
+                return current
+            if current:
+                self._retire(key, current)
+                self._stats_of(key)['rebuilds'] += 1
+                _logger.info("Rebuilding HTTP session of scale %s after a settings change", key[1])
+            current = self._sessions[key] = ScaleSession(config)
+            return current
+
+    def _retire(self, key, current):
+        stats = self._stats_of(key)
+        stats['requests'] += current.requests
+        stats['connections'] += current.connections
+        current.close()
+
+    def discard(self, key):
+        """Close the session of key, the next read opens a new one"""
+        with self._lock:
+            self._check_pid()
+            current = self._sessions.pop(key, None)
+            if current:
+                self._retire(key, current)
+                self._stats_of(key)['rebuilds'] += 1
+
+    def get_stats(self, key):
+        """Requests, reused and newly opened connections of key in this process"""
+        with self._lock:
+            self._check_pid()
+            stats = dict(self._stats_of(key))
+            current = self._sessions.get(key)
+            if current:
+                stats['requests'] += current.requests
+                stats['connections'] += current.connections
+        return {
+            'requests': stats['requests'],
+            'reuses': max(stats['requests'] - stats['connections'], 0),
+            # The first connection of each session is not a reconnect
+            'reconnects': max(stats['connections'] - 1, 0),
+            'rebuilds': stats['rebuilds'],
+        }
+
+
+scale_session_pool = ScaleSessionPool()
@@ -0,0 +1,365 @@
+# -*- coding: utf-8 -*-
+"""Drivers reading weighing indicators, registered by code.
+
+Every driver is built from ``(ip_address, port, timeout)`` so that it can be
+pointed at any TCP endpoint, the real indicator or a local stand-in such as
+the bundled simulator. ``read()`` returns ``(weight_kg, stable)`` and raises
+on any failure. Socket drivers keep their connection open between reads and
+parse what they receive incrementally: bytes are fed to a frame parser that
+keeps incomplete frames until their terminator arrives.
+"""
+import logging
+import os
+import re
+import socket
+import threading
+import time
+
+_logger = logging.getLogger(__name__)
+
+DRIVERS = {}
+
+UNIT_FACTORS = {
+    'kg': 1.0,
+    't': 1000.0,
+    'g': 0.001,
+    'lb': 0.45359237,
+}
+
+
+def register_driver(cls):
+    """Class decorator adding a driver to the registry under its code"""
+    DRIVERS[cls.code] = cls
+    return cls
+
+
+def driver_selection():
+    return [(code, cls.label) for code, cls in DRIVERS.items()]
+
+
+class ScaleReadError(Exception):
+    pass
+
+
+class ConnectionLost(ScaleReadError):
+    pass
+
+
+class FrameParser:
+    """Split a byte stream into frames ending with terminator.
+
+    ``feed()`` returns the frames completed by the new bytes and keeps the
+    incomplete tail for the next call. A tail growing past max_frame without
+    a terminator is garbage and dropped.
+    """
+
+    def __init__(self, terminator=b'\n', start=None, max_frame=256):
+        self.terminator = terminator
+        self.start = start
+        self.max_frame = max_frame
+        self.buffer = bytearray()
+
+    def feed(self, data):
+        self.buffer += data
+        frames = []
+        while True:
+            end = self.buffer.find(self.terminator)
+            if end < 0:
+                break
+            frame = bytes(self.buffer[:end])
+            del self.buffer[:end + len(self.terminator)]
+            if self.start is not None:
+                # Resynchronise on the start byte, noise before it is dropped
+                begin = frame.rfind(self.start)
+                if begin < 0:
+                    continue
+                frame = frame[begin + len(self.start):]
+            frame = frame.strip(b'\r\n')
+            if frame:
+                frames.append(frame)
+        if len(self.buffer) > self.max_frame:
+            del self.buffer[:-self.max_frame]
+        return frames
+
+    def reset(self):
+        self.buffer.clear()
+
+
+class ScaleDriver:
+    """Base driver, subclasses set code and label and implement read()"""
+    code = None
+    label = None
+
+    def __init__(self, ip_address, port, timeout, key=None):
+        self.ip_address = ip_address
+        self.port = port
+        self.timeout = timeout or 2
+        self.key = key
+
+    def read(self):
+        raise NotImplementedError()
+
+    def close(self):
+        pass
+
+
+@register_driver
+class HttpJsonDriver(ScaleDriver):
+    """Middleware answering GET /get_weight with {"weight": ..., "stable": ...}"""
+    code = 'http_json'
+    label = 'HTTP JSON Middleware'
+
+    def __init__(self, ip_address, port, timeout, key=None, pool_size=None):
+        super().__init__(ip_address, port, timeout, key=key)
+        self.pool_size = pool_size
+
+    def read(self):
+        # Imported here so that socket drivers run without requests installed
+        from .http_pool import scale_session_pool
+        session = scale_session_pool.session(self.key, (self.ip_address, self.port, self.timeout, self.pool_size))
+        response = session.get('/get_weight')
+        if response.status_code != 200:
+            raise ScaleReadError("Invalid response from scale")
+        data = response.json()
+        # Middlewares that do not report motion are taken as stable
+        return float(data.get('weight', 0.0)), bool(data.get('stable', True))
+
+    def close(self):
+        from .http_pool import scale_session_pool
+        scale_session_pool.discard(self.key)
+
+
+class SocketDriver(ScaleDriver):
+    """Driver talking over a persistent TCP connection"""
+
+    def __init__(self, ip_address, port, timeout, key=None):
+        super().__init__(ip_address, port, timeout, key=key)
+        self.sock = None
+        self.parser = self._make_parser()
+
+    def _make_parser(self):
+        return FrameParser(b'\n')
+
+    def _connect(self):
+        if self.sock is None:
+            self.sock = socket.create_connection((self.ip_address, self.port), timeout=self.timeout)
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            self.parser.reset()
+        return self.sock
+
+    def _recv_frames(self, deadline):
+        """Frames completed by the next bytes received before deadline"""
+        sock = self._connect()
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise ScaleReadError("Timeout waiting for the indicator")
+            sock.settimeout(remaining)
+            data = sock.recv(4096)
+            if not data:
+                raise ConnectionLost("Connection closed by the indicator")
+            frames = self.parser.feed(data)
+            if frames:
+                return frames
+
+    def _drain(self):
+        """Parse the bytes already waiting on the socket without blocking"""
+        sock = self._connect()
+        frames = []
+        sock.setblocking(False)
+        try:
+            while True:
+                data = sock.recv(4096)
+                if not data:
+                    raise ConnectionLost("Connection closed by the indicator")
+                frames += self.parser.feed(data)
+        except BlockingIOError:
+            pass
+        finally:
+            sock.settimeout(self.timeout)
+        return frames
+
+    def read(self):
+        reused = self.sock is not None
+        try:
+            return self._read()
+        except (ConnectionLost, ConnectionError):
+            self.close()
+            if not reused:
+                raise
+        except Exception:
+            # Never reuse a connection left in an unknown state
+            self.close()
+            raise
+        # The indicator dropped the idle connection, retry once on a new one
+        try:
+            return self._read()
+        except Exception:
+            self.close()
+            raise
+
+    def _read(self):
+        raise NotImplementedError()
+
+    def close(self):
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+            self.sock = None
+
+
+class StreamDriver(SocketDriver):
+    """Indicator pushing frames continuously, the newest frame is the weight"""
+
+    def _read(self):
+        # Frames queued since the last read are stale, keep the newest
+        frames = self._drain()
+        if not frames:
+            frames = self._recv_frames(time.monotonic() + self.timeout)
+        return self._parse_frame(frames[-1])
+
+    def _parse_frame(self, frame):
+        raise NotImplementedError()
+
+
+_WEIGHT_RE = re.compile(rb'([+-])?\s*(\d+(?:\.\d+)?)\s*(kg|lb|t|g)?', re.IGNORECASE)
+
+
+@register_driver
+class TcpStreamDriver(StreamDriver):
+    """Continuous ASCII output such as ``ST,GS,+001234.5kg`` over raw TCP"""
+    code = 'tcp_stream'
+    label = 'Raw TCP Continuous Stream'
+
+    def _parse_frame(self, frame):
+        status = frame[:2].upper()
+        if status == b'OL':
+            raise ScaleReadError("Indicator overload")
+        match = None
+        for match in _WEIGHT_RE.finditer(frame):
+            pass
+        if match is None:
+            raise ScaleReadError(f"Unparsable frame from indicator: {frame!r}")
+        sign, value, unit = match.groups()
+        weight = float(value) * UNIT_FACTORS[(unit or b'kg').decode().lower()]
+        if sign == b'-':
+            weight = -weight
+        return weight, status != b'US'
+
+
+@register_driver
+class MtSicsDriver(SocketDriver):
+    """MT-SICS request/response: ``SI`` answered by ``S S     100.00 kg``"""
+    code = 'mt_sics'
+    label = 'MT-SICS (Request/Response)'
+    command = b'SI\r\n'
+
+    _ERRORS = {
+        b'I': "Indicator busy",
+        b'+': "Indicator overload",
+        b'-': "Indicator underload",
+    }
+
+    def _read(self):
+        # Answers to earlier timed out requests must not be taken for this one
+        self._drain()
+        self._connect().sendall(self.command)
+        frame = self._recv_frames(time.monotonic() + self.timeout)[-1]
+        return self._parse_frame(frame)
+
+    def _parse_frame(self, frame):
+        parts = frame.split()
+        if not parts or parts[0] in (b'ES', b'ET', b'EL'):
+            raise ScaleReadError(f"Indicator error: {frame.decode(errors='replace')}")
+        if parts[0] != b'S' or len(parts) < 2:
+            raise ScaleReadError(f"Unexpected answer from indicator: {frame!r}")
+        if parts[1] in self._ERRORS:
+            raise ScaleReadError(self._ERRORS[parts[1]])
+        if parts[1] not in (b'S', b'D') or len(parts) < 3:
+            raise ScaleReadError(f"Unexpected answer from indicator: {frame!r}")
+        unit = parts[3].decode().lower() if len(parts) > 3 else 'kg'
+        if unit not in UNIT_FACTORS:
+            raise ScaleReadError(f"Unsupported unit {unit}")
+        return float(parts[2]) * UNIT_FACTORS[unit], parts[1] == b'S'
+
+
+@register_driver
+class SerialOverTcpDriver(StreamDriver):
+    """Toledo continuous output relayed by a serial device server.
+
+    Frame: STX, status words A/B/C, 6 weight digits, 6 tare digits, CR.
+    """
+    code = 'serial_tcp'
+    label = 'Serial over TCP (Toledo Continuous)'
+
+    # Status word A bits 0-2: position of the decimal point
+    _DECIMALS = {0: -2, 1: -1, 2: 0, 3: 1, 4: 2, 5: 3, 6: 4, 7: 5}
+
+    def _make_parser(self):
+        return FrameParser(b'\r', start=b'\x02')
+
+    def _parse_frame(self, frame):
+        if len(frame) < 9:
+            raise ScaleReadError(f"Short frame from indicator: {frame!r}")
+        swa, swb = frame[0], frame[1]
+        digits = frame[3:9]
+        if not digits.isdigit():
+            raise ScaleReadError(f"Unparsable frame from indicator: {frame!r}")
+        if swb & 0x04:
+            raise ScaleReadError("Indicator over capacity")
+        weight = int(digits) / (10 ** self._DECIMALS[swa & 0x07])
+        if swb & 0x02:
+            weight = -weight
+        if not swb & 0x10:
+            weight *= UNIT_FACTORS['lb']
+        return weight, not swb & 0x08
+
+
+class ScaleDriverPool:
+    """Socket drivers keyed by (database, scale id), one per process.
+
+    A driver is rebuilt when its settings change, a lock serialises the reads
+    of a scale since its connection carries one exchange at a time.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._drivers = {}
+
+    def _check_pid(self):
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._drivers = {}
+
+    def read(self, key, config):
+        """Read (weight, stable) from the scale of key with config (code, ip, port, timeout, pool size)"""
+        code, ip_address, port, timeout, pool_size = config
+        if code not in DRIVERS:
+            raise ScaleReadError(f"Unknown scale driver {code}")
+        if code == HttpJsonDriver.code:
+            # The HTTP session pool already keeps connections alive
+            return HttpJsonDriver(ip_address, port, timeout, key=key, pool_size=pool_size).read()
+        with self._lock:
+            self._check_pid()
+            current = self._drivers.get(key)
+            if current is None or current[0] != config:
+                if current:
+                    current[1].close()
+                current = self._drivers[key] = (config, DRIVERS[code](ip_address, port, timeout, key=key), threading.Lock())
+        _config, driver, driver_lock = current
+        with driver_lock:
+            return driver.read()
+
+    def discard(self, key):
+        with self._lock:
+            self._check_pid()
+            current = self._drivers.pop(key, None)
+        if current:
+            with current[2]:
+                current[1].close()
+
+
+scale_driver_pool = ScaleDriverPool()
@@ -0,0 +1,584 @@
+# -*- coding: utf-8 -*-
+"""Store-and-forward edge agent for weighbridge sites.
+
+The agent runs next to the indicators. It reads them with the drivers of
+``scale_drivers``, keeps one reading per settled truck and appends it to an
+on-disk queue before anything is sent, so that readings survive an Odoo
+outage or a restart of the agent. A single forwarder sends the queue in
+order to ``/scale/receive_weight/batch`` in gzip compressed batches, with
+exponential backoff while Odoo is unreachable. Full batches are sent back
+to back, so a backlog drains at the speed Odoo ingests it.
+
+The queue is a SQLite database in WAL mode with synchronous commits. Every
+reading gets an idempotency key made of the queue's random epoch and its
+sequence number: a batch resent after a lost answer is never applied twice.
+A reading leaves the queue once Odoo gave a final answer for it, readings
+refused by Odoo are moved to a ``rejected`` table for inspection.
+
+Only the standard library is needed, plus ``requests`` for ``http_json``
+indicators. The module runs without Odoo from a copy of the ``tools``
+directory::
+
+    python3 tools/scale_edge_agent.py run --url http://odoo:8069 --scale 3=mt_sics://10.0.0.21:4001
+    python3 tools/scale_edge_agent.py stub --port 8069
+    odoo-bin scale_edge_agent run --url http://localhost:8069 --scale 1=http_json://127.0.0.1:5000
+
+``stub`` serves a stand-in for the batch endpoint, with optional failures
+and outages, to test the agent without Odoo.
+"""
+import argparse
+import gzip
+import http.client
+import http.server
+import importlib
+import json
+import logging
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+import types
+import uuid
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+_logger = logging.getLogger(__name__)
+
+BATCH_PATH = '/scale/receive_weight/batch'
+# Readings per batch accepted by the batch endpoint
+MAX_BATCH_SIZE = 5000
+
+
+def load_drivers():
+    """The scale_drivers module, also when this file runs as a script"""
+    if __package__:
+        from . import scale_drivers
+        return scale_drivers
+    # Import the sibling modules as a package without its Odoo bound __init__
+    package = sys.modules.get('scale_edge_tools')
+    if package is None:
+        package = types.ModuleType('scale_edge_tools')
+        package.__path__ = [os.path.dirname(os.path.abspath(__file__))]
+        sys.modules['scale_edge_tools'] = package
+    return importlib.import_module('scale_edge_tools.scale_drivers')
+
+
+def load_stability():
+    if __package__:
+        from . import stability
+        return stability
+    load_drivers()
+    return importlib.import_module('scale_edge_tools.stability')
+
+
+class ReadingQueue:
+    """Append-only queue of readings in a SQLite database.
+
+    Readings are read back in sequence order and deleted once delivered. A
+    lock serialises the connection, shared by the readers and the forwarder.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.available = threading.Event()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # A reading acknowledged to the indicator loop is on disk
+        self._db.execute("PRAGMA synchronous=FULL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS readings (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                scale_id INTEGER NOT NULL,
+                weight REAL NOT NULL,
+                stable INTEGER NOT NULL,
+                timestamp TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS rejected (
+                seq INTEGER PRIMARY KEY,
+                scale_id INTEGER NOT NULL,
+                weight REAL NOT NULL,
+                timestamp TEXT NOT NULL,
+                error TEXT,
+                rejected_at TEXT NOT NULL
+            );
+        """)
+        with self._lock:
+            row = self._db.execute("SELECT value FROM meta WHERE name = 'epoch'").fetchone()
+            if row is None:
+                # Keys of a new queue never collide with those of a deleted one
+                self._db.execute("INSERT INTO meta (name, value) VALUES ('epoch', ?)", (uuid.uuid4().hex[:12],))
+                row = self._db.execute("SELECT value FROM meta WHERE name = 'epoch'").fetchone()
+        self.epoch = row[0]
+        if self.depth():
+            self.available.set()
+
+    def key(self, seq):
+        return f'{self.epoch}-{seq}'
+
+    def append(self, scale_id, weight, stable, timestamp):
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO readings (scale_id, weight, stable, timestamp) VALUES (?, ?, ?, ?)",
+                (scale_id, weight, int(bool(stable)), timestamp))
+        self.available.set()
+        return cursor.lastrowid
+
+    def peek(self, limit):
+        """Oldest readings as (seq, scale_id, weight, stable, timestamp)"""
+        with self._lock:
+            return self._db.execute(
+                "SELECT seq, scale_id, weight, stable, timestamp FROM readings ORDER BY seq LIMIT ?",
+                (limit,)).fetchall()
+
+    def ack(self, seqs, rejected=None):
+        """Remove delivered readings, rejected maps seqs to the error given by Odoo"""
+        rejected = rejected or {}
+        now = datetime.now(timezone.utc).isoformat()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                for seq, error in rejected.items():
+                    self._db.execute(
+                        """INSERT OR REPLACE INTO rejected (seq, scale_id, weight, timestamp, error, rejected_at)
+                           SELECT seq, scale_id, weight, timestamp, ?, ? FROM readings WHERE seq = ?""",
+                        (error, now, seq))
+                self._db.executemany("DELETE FROM readings WHERE seq = ?", [(seq,) for seq in seqs])
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def retried(self, seqs):
+        with self._lock:
+            self._db.executemany("UPDATE readings SET attempts = attempts + 1 WHERE seq = ?", [(seq,) for seq in seqs])
+
+    def depth(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM readings").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class AgentStats:
+    """Counters of the agent, reported at intervals"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.captured = 0
+        self.read_errors = 0
+        self.batches = 0
+        self.delivered = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.send_errors = 0
+        self.latencies = []
+
+    def add_latency(self, seconds):
+        with self.lock:
+            self.latencies.append(seconds)
+
+    def add(self, **counts):
+        with self.lock:
+            for name, count in counts.items():
+                setattr(self, name, getattr(self, name) + count)
+
+    def report(self, queue):
+        with self.lock:
+            latencies = sorted(self.latencies)
+            self.latencies = []
+            p95 = latencies[int(0.95 * (len(latencies) - 1))] * 1000 if latencies else 0.0
+            _logger.info(
+                "Queue %s, captured %s, read errors %s, batches %s (p95 %.0f ms), delivered %s, "
+                "duplicates %s, rejected %s, send errors %s",
+                queue.depth(), self.captured, self.read_errors, self.batches, p95, self.delivered,
+                self.duplicates, self.rejected, self.send_errors)
+
+
+class IndicatorReader(threading.Thread):
+    """Read one indicator and queue one reading per settled truck.
+
+    A load is captured once its samples stay stable; the reader re-arms when
+    the platform falls back under min_weight, as the truck drove off.
+    """
+
+    def __init__(self, scale_id, driver, queue, options, stats, stop):
+        super().__init__(name=f'scale_edge_reader_{scale_id}', daemon=True)
+        self.scale_id = scale_id
+        self.driver = driver
+        self.queue = queue
+        self.options = options
+        self.stats = stats
+        self.stop = stop
+        self.detector = load_stability().StabilityDetector(
+            options.stability_window, options.stability_tolerance, options.stability_duration)
+        self.armed = True
+
+    def sample(self, weight, stable, now):
+        """Feed one sample, returns the captured weight when the load settled"""
+        if weight < self.options.min_weight:
+            self.armed = True
+            self.detector.reset()
+            return None
+        self.detector.add(now, weight, stable)
+        if not self.armed:
+            return None
+        result = self.detector.result()
+        if not result.stable:
+            return None
+        self.armed = False
+        return round(result.weight, 3)
+
+    def run(self):
+        backoff = self.options.interval
+        while not self.stop.is_set():
+            try:
+                weight, stable = self.driver.read()
+            except Exception as e:
+                self.stats.add(read_errors=1)
+                _logger.warning("Reading scale %s failed: %s", self.scale_id, e)
+                self.detector.reset()
+                backoff = min(backoff * 2, self.options.max_backoff)
+                self.stop.wait(backoff)
+                continue
+            backoff = self.options.interval
+            captured = self.sample(weight, stable, time.monotonic())
+            if captured is not None:
+                self.queue.append(self.scale_id, captured, True, datetime.now(timezone.utc).isoformat())
+                self.stats.add(captured=1)
+                _logger.info("Scale %s settled at %s kg", self.scale_id, captured)
+            self.stop.wait(self.options.interval)
+        self.driver.close()
+
+
+class SendError(Exception):
+    pass
+
+
+class Forwarder(threading.Thread):
+    """Send the queue in order to the batch endpoint, one batch in flight.
+
+    Readings answered with a final result leave the queue, those answered
+    with ``retry`` stay at its head and are sent again with the next batch.
+    Network failures, HTTP errors and invalid answers back off exponentially
+    with jitter up to max_backoff.
+    """
+
+    def __init__(self, queue, options, stats, stop):
+        super().__init__(name='scale_edge_forwarder', daemon=True)
+        self.queue = queue
+        self.options = options
+        self.stats = stats
+        self.stop = stop
+        self.url = urlsplit(options.url)
+        self.path = self.url.path if self.url.path not in ('', '/') else BATCH_PATH
+        self.connection = None
+        self.backoff = 0.0
+
+    def _post(self, body):
+        for attempt in range(2):
+            if self.connection is None:
+                connection_class = http.client.HTTPSConnection if self.url.scheme == 'https' else http.client.HTTPConnection
+                self.connection = connection_class(self.url.hostname, self.url.port, timeout=self.options.timeout)
+            try:
+                self.connection.request('POST', self.path, body, {
+                    'Content-Type': 'application/json',
+                    'Content-Encoding': 'gzip',
+                })
+                response = self.connection.getresponse()
+                return response.status, response.read()
+            except (ConnectionError, http.client.HTTPException):
+                # The server closed the idle keep-alive connection, retry once
+                self.connection.close()
+                self.connection = None
+                if attempt:
+                    raise
+            except Exception:
+                self.connection.close()
+                self.connection = None
+                raise
+
+    def send(self, rows):
+        """Deliver one batch, returns the numbers of readings delivered and left to retry"""
+        readings = [{
+            'key': self.queue.key(seq),
+            'scale_id': scale_id,
+            'weight': weight,
+            'stable': bool(stable),
+            'timestamp': timestamp,
+        } for seq, scale_id, weight, stable, timestamp in rows]
+        body = gzip.compress(json.dumps({'readings': readings}).encode(), compresslevel=6)
+        started = time.monotonic()
+        try:
+            status, data = self._post(body)
+        except (OSError, http.client.HTTPException) as e:
+            raise SendError(str(e) or e.__class__.__name__)
+        if status != 200:
+            raise SendError(f"HTTP {status}")
+        try:
+            answer = json.loads(data)
+        except ValueError:
+            raise SendError("Invalid JSON answer")
+        results = answer.get('results') if isinstance(answer, dict) else None
+        if not answer.get('success') or not isinstance(results, list) or len(results) != len(rows):
+            raise SendError(answer.get('error') or "Unexpected answer")
+        self.stats.add_latency(time.monotonic() - started)
+        self.stats.add(batches=1)
+
+        delivered, rejected, retry = [], {}, []
+        for (seq, *_reading), result in zip(rows, results):
+            if result.get('retry'):
+                retry.append(seq)
+                continue
+            delivered.append(seq)
+            if result.get('duplicate'):
+                self.stats.add(duplicates=1)
+            if not result.get('success'):
+                rejected[seq] = result.get('error')
+        if rejected:
+            _logger.warning("Odoo refused %s reading(s), kept in the rejected table: %s",
+                            len(rejected), next(iter(rejected.values())))
+        self.queue.ack(delivered, rejected)
+        if retry:
+            self.queue.retried(retry)
+        self.stats.add(delivered=len(delivered) - len(rejected), rejected=len(rejected))
+        return len(delivered), len(retry)
+
+    def run(self):
+        while not self.stop.is_set():
+            rows = self.queue.peek(self.options.batch_size)
+            if not rows:
+                self.queue.available.clear()
+                # Recheck after clearing, an append may have happened in between
+                if not self.queue.peek(1):
+                    self.queue.available.wait(self.options.flush_interval)
+                continue
+            try:
+                _delivered, retry = self.send(rows)
+            except SendError as e:
+                self.stats.add(send_errors=1)
+                self.backoff = min(max(self.backoff * 2, self.options.initial_backoff), self.options.max_backoff)
+                delay = self.backoff * random.uniform(0.5, 1.0)
+                _logger.warning("Sending %s reading(s) failed (%s), retrying in %.1f s", len(rows), e, delay)
+                self.stop.wait(delay)
+                continue
+            self.backoff = 0.0
+            if retry:
+                # The weighing of a scale is busy on the Odoo side
+                self.stop.wait(self.options.initial_backoff)
+            elif len(rows) < self.options.batch_size:
+                # Let a few readings accumulate instead of sending them one by one
+                self.stop.wait(self.options.linger)
+        if self.connection is not None:
+            self.connection.close()
+
+
+def parse_scale(value):
+    """``ID=DRIVER://HOST:PORT`` into (scale id, driver code, host, port)"""
+    try:
+        scale_id, target = value.split('=', 1)
+        code, address = target.split('://', 1)
+        host, port = address.rsplit(':', 1)
+        return int(scale_id), code, host, int(port)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid scale {value!r}, expected ID=DRIVER://HOST:PORT")
+
+
+def run_agent(options):
+    drivers = load_drivers()
+    stop = threading.Event()
+    stats = AgentStats()
+    queue = ReadingQueue(options.queue)
+    _logger.info("Edge agent queue %s holds %s reading(s), forwarding to %s", options.queue, queue.depth(), options.url)
+    threads = []
+    for scale_id, code, host, port in options.scale:
+        if code not in drivers.DRIVERS:
+            raise SystemExit(f"Unknown driver {code}, known drivers: {', '.join(drivers.DRIVERS)}")
+        driver = drivers.DRIVERS[code](host, port, options.timeout, key=('scale_edge_agent', scale_id))
+        threads.append(IndicatorReader(scale_id, driver, queue, options, stats, stop))
+    threads.append(Forwarder(queue, options, stats, stop))
+    for thread in threads:
+        thread.start()
+    started = time.monotonic()
+    try:
+        while not options.duration or time.monotonic() - started < options.duration:
+            stop.wait(min(options.report_interval, options.duration or options.report_interval))
+            stats.report(queue)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        queue.available.set()
+        for thread in threads:
+            thread.join(options.timeout + 1)
+        stats.report(queue)
+        queue.close()
+    return stats
+
+
+class StubReceiver(http.server.ThreadingHTTPServer):
+    """Stand-in for the push endpoints of Odoo.
+
+    Answers like ``/scale/receive_weight/batch``, or ``/scale/receive_weight``
+    for single readings, with the idempotency of their keys, and can fail a
+    ratio of the requests or go down for a while.
+    """
+    daemon_threads = True
+
+    def __init__(self, address, options):
+        super().__init__(address, StubHandler)
+        self.options = options
+        self.lock = threading.Lock()
+        self.keys = {}
+        self.requests = 0
+        self.down_until = 0.0
+
+    def available(self):
+        now = time.monotonic()
+        with self.lock:
+            if now < self.down_until:
+                return False
+            if self.options.outage_rate and random.random() < self.options.outage_rate / 3600:
+                self.down_until = now + self.options.outage_duration
+                _logger.info("Stub receiver down for %.0f s", self.options.outage_duration)
+                return False
+        return True
+
+    def ingest(self, readings):
+        results = []
+        with self.lock:
+            self.requests += 1
+            for reading in readings:
+                key = reading.get('key')
+                if key in self.keys:
+                    results.append(dict(self.keys[key], duplicate=True))
+                    continue
+                result = {'key': key, 'success': True, 'queued': True}
+                self.keys[key] = result
+                results.append(result)
+        return results
+
+
+class StubHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately, do not let them wait for an ACK
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if not server.available():
+            # Like a stopped Odoo behind a proxy
+            self._answer(502, b'Bad Gateway')
+            return
+        if server.options.error_rate and random.random() < server.options.error_rate:
+            self._answer(500, b'Internal Server Error')
+            return
+        if self.headers.get('Content-Encoding', '').lower() == 'gzip':
+            body = gzip.decompress(body)
+        data = json.loads(body)
+        if isinstance(data, dict) and 'readings' not in data:
+            # A single reading as sent to /scale/receive_weight
+            self._answer(200, json.dumps(server.ingest([data])[0]).encode())
+            return
+        readings = data.get('readings') if isinstance(data, dict) else data
+        self._answer(200, json.dumps({'results': server.ingest(readings), 'success': True}).encode())
+
+    def _answer(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        _logger.debug(format, *args)
+
+
+def run_stub(options):
+    server = StubReceiver((options.host, options.port), options)
+    _logger.info("Stub receiver listening on %s:%s", options.host, server.server_address[1])
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        while True:
+            time.sleep(options.report_interval)
+            _logger.info("Stub receiver: %s request(s), %s distinct key(s)", server.requests, len(server.keys))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        server.server_close()
+    return server
+
+
+def build_parser(prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="Store-and-forward agent pushing weighbridge readings to Odoo")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    agent = commands.add_parser('run', help="Read the indicators and forward their readings")
+    agent.add_argument('--url', required=True,
+                       help=f"Odoo URL, {BATCH_PATH} is used when it has no path")
+    agent.add_argument('--scale', action='append', type=parse_scale, default=[],
+                       help="Indicator as ID=DRIVER://HOST:PORT, ID being the weighing.scale id, repeatable")
+    agent.add_argument('--queue', default='scale_edge_agent.sqlite3', help="Path of the queue database")
+    agent.add_argument('--timeout', type=float, default=10.0, help="Timeout of indicator reads and batch requests in seconds")
+    agent.add_argument('--interval', type=float, default=0.5, help="Seconds between two indicator reads")
+    agent.add_argument('--min-weight', type=float, default=200.0,
+                       help="Weight in kg under which the platform is taken as empty")
+    agent.add_argument('--stability-window', type=int, default=10, help="Samples kept to detect a stable weight")
+    agent.add_argument('--stability-tolerance', type=float, default=20.0, help="Spread in kg of a stable weight")
+    agent.add_argument('--stability-duration', type=float, default=3.0, help="Seconds a weight must stay stable")
+    agent.add_argument('--batch-size', type=int, default=500, help=f"Readings per batch, at most {MAX_BATCH_SIZE}")
+    agent.add_argument('--linger', type=float, default=0.2, help="Seconds to wait for more readings after a partial batch")
+    agent.add_argument('--flush-interval', type=float, default=5.0, help="Seconds between two checks of an empty queue")
+    agent.add_argument('--initial-backoff', type=float, default=1.0, help="First delay in seconds after a failed send")
+    agent.add_argument('--max-backoff', type=float, default=60.0, help="Longest delay in seconds between two attempts")
+    agent.add_argument('--report-interval', type=float, default=60.0, help="Seconds between two statistics reports")
+    agent.add_argument('--duration', type=float, default=0.0, help="Stop after this many seconds, 0 runs until interrupted")
+
+    stub = commands.add_parser('stub', help="Serve a stand-in for the Odoo batch endpoint")
+    stub.add_argument('--host', default='127.0.0.1', help="Address to listen on")
+    stub.add_argument('--port', type=int, default=8069, help="Port to listen on")
+    stub.add_argument('--error-rate', type=float, default=0.0, help="Ratio of requests answered with HTTP 500")
+    stub.add_argument('--outage-rate', type=float, default=0.0, help="Mean outages per hour")
+    stub.add_argument('--outage-duration', type=float, default=60.0, help="Duration of an outage in seconds")
+    stub.add_argument('--report-interval', type=float, default=60.0, help="Seconds between two statistics reports")
+    return parser
+
+
+def parse_options(args=None, prog=None, known=False):
+    """Agent options, with the unknown arguments as well when known is set"""
+    parser = build_parser(prog)
+    if known:
+        options, extra = parser.parse_known_args(args)
+    else:
+        options, extra = parser.parse_args(args), []
+    if options.command == 'run':
+        if not 0 < options.batch_size <= MAX_BATCH_SIZE:
+            parser.error(f"--batch-size must be between 1 and {MAX_BATCH_SIZE}")
+        if min(options.interval, options.timeout, options.initial_backoff, options.max_backoff) <= 0:
+            parser.error("--interval, --timeout, --initial-backoff and --max-backoff must be positive")
+        options.max_backoff = max(options.max_backoff, options.initial_backoff)
+    return (options, extra) if known else options
+
+
+def serve(options):
+    if options.command == 'stub':
+        return run_stub(options)
+    return run_agent(options)
+
+
+def main(args=None, prog=None):
+    serve(parse_options(args, prog))
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    main()
@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+"""Background poller reading every enabled weighing scale with asyncio.
+
+The poller runs either as a daemon thread of a threaded Odoo server or as
+the ``scale_poller`` command line entry point. Each cycle it reads all the
+enabled scales of a database concurrently over persistent connections (HTTP
+scales on the event loop, other drivers of ``scale_drivers`` in executor
+threads), publishes the readings in the shared memory buffer of the database (see
+``shared_readings``) and hands them to the coalescing telemetry buffer (see
+``scale_telemetry``), so that ``get_weight`` in any worker can answer from a
+fresh reading instead of contacting the scale.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+
+from odoo.tools import SQL
+
+from . import scale_telemetry, shared_readings
+from .scale_drivers import ScaleReadError, scale_driver_pool
+
+_logger = logging.getLogger(__name__)
+
+INTERVAL_PARAM = 'inventory_scale_integration_base.poller_interval'
+MODE_PARAM = 'inventory_scale_integration_base.poller_mode'
+MAX_AGE_PARAM = 'inventory_scale_integration_base.poller_max_age'
+DEFAULT_INTERVAL = 1.0
+DEFAULT_MAX_AGE = 3.0
+DEFAULT_CONCURRENCY = 32
+# Seconds between two reloads of the scale list
+RELOAD_INTERVAL = 30
+MAX_BACKOFF = 30
+
+
+class AsyncScaleConnection:
+    """Keep-alive HTTP/1.1 connection to the /get_weight endpoint of a scale"""
+
+    def __init__(self, ip_address, port, timeout):
+        self.ip_address = ip_address
+        self.port = port
+        self.timeout = timeout or 2
+        self.reader = None
+        self.writer = None
+
+    async def close(self):
+        if self.writer:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except (OSError, asyncio.CancelledError):
+                pass
+        self.reader = self.writer = None
+
+    async def read_weight(self):
+        try:
+            return await asyncio.wait_for(self._request(), self.timeout)
+        except Exception:
+            # Never reuse a connection left in an unknown state
+            await self.close()
+            raise
+
+    async def _request(self):
+        if self.writer is None or self.writer.is_closing():
+            self.reader, self.writer = await asyncio.open_connection(self.ip_address, self.port)
+        self.writer.write((
+            f"GET /get_weight HTTP/1.1\r\nHost: {self.ip_address}:{self.port}\r\n"
+            "Accept: application/json\r\nConnection: keep-alive\r\n\r\n"
+        ).encode('latin-1'))
+        await self.writer.drain()
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ScaleReadError("Connection closed by the scale")
+        parts = status_line.split(None, 2)
+        if len(parts) < 2 or parts[1] != b'200':
+            raise ScaleReadError(f"Invalid response from scale: {status_line.strip().decode('latin-1')}")
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _sep, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        if 'chunked' in headers.get('transfer-encoding', '').lower():
+            body = await self._read_chunked()
+        elif 'content-length' in headers:
+            body = await self.reader.readexactly(int(headers['content-length']))
+        else:
+            # No length: the scale closes the connection after the body
+            body = await self.reader.read()
+            await self.close()
+        if headers.get('connection', '').lower() == 'close':
+            await self.close()
+        data = json.loads(body)
+        # Indicators that do not report motion are taken as stable
+        return float(data.get('weight', 0.0)), bool(data.get('stable', True))
+
+    async def _read_chunked(self):
+        """Body of a response sent with Transfer-Encoding: chunked"""
+        chunks = []
+        while True:
+            size_line = await self.reader.readline()
+            try:
+                # Chunk extensions after ';' are ignored
+                size = int(size_line.split(b';', 1)[0].strip(), 16)
+            except ValueError:
+                raise ScaleReadError(f"Invalid chunk size from scale: {size_line.strip()!r}")
+            if not size:
+                break
+            chunks.append(await self.reader.readexactly(size))
+            await self.reader.readexactly(2)
+        # Skip the trailer fields up to the blank line ending the response
+        while (await self.reader.readline()) not in (b'\r\n', b'\n', b''):
+            pass
+        return b''.join(chunks)
+
+
+class ScalePoller:
+    """Poll the enabled scales of one database at a fixed rate"""
+
+    def __init__(self, registry, interval=None, concurrency=DEFAULT_CONCURRENCY):
+        self.registry = registry
+        self.dbname = registry.db_name
+        self.interval = interval
+        self.concurrency = concurrency
+        self.connections = {}
+        self.drivers = set()
+        self.backoff = {}
+        self.scales = []
+        self.loaded_at = 0
+        self.tripped = set()
+        self.configured_interval = DEFAULT_INTERVAL
+        self.flush_interval = scale_telemetry.DEFAULT_FLUSH_INTERVAL
+        self.stopping = False
+        self.buffer = shared_readings.get_writer(self.dbname)
+
+    # Database access runs in the default executor, off the event loop
+
+    def _load_scales(self):
+        with self.registry.cursor() as cr:
+            cr.execute(SQL(
+                "SELECT key, value FROM ir_config_parameter WHERE key IN %s",
+                (INTERVAL_PARAM, scale_telemetry.FLUSH_INTERVAL_PARAM),
+            ))
+            params = dict(cr.fetchall())
+            self.configured_interval = float(params.get(INTERVAL_PARAM, DEFAULT_INTERVAL))
+            self.flush_interval = int(params.get(scale_telemetry.FLUSH_INTERVAL_PARAM, scale_telemetry.DEFAULT_FLUSH_INTERVAL))
+            cr.execute(SQL(
+                """
+                SELECT id, ip_address, port, timeout, COALESCE(driver, 'http_json'),
+                       circuit_state != 'closed' OR circuit_failures != 0
+                  FROM weighing_scale
+                 WHERE active AND is_enabled AND ip_address IS NOT NULL AND scale_type = 'single'
+                """
+            ))
+            rows = cr.fetchall()
+            self.tripped = {row[0] for row in rows if row[5]}
+            return [row[:5] for row in rows]
+
+    def _close_circuits(self, scale_ids):
+        with self.registry.cursor() as cr:
+            cr.execute(SQL(
+                """
+                UPDATE weighing_scale
+                   SET circuit_state = 'closed', circuit_failures = 0, circuit_backoff = 0,
+                       circuit_retry_at = NULL, circuit_probe_until = NULL
+                 WHERE id IN %s
+                   AND (circuit_state != 'closed' OR circuit_failures != 0)
+                """,
+                tuple(scale_ids),
+            ))
+
+    def _store_readings(self, readings, errors):
+        """Hand the readings to the coalescing telemetry buffer"""
+        buffer = scale_telemetry.telemetry_buffer
+        for scale_id, (weight, stable, read_at) in readings.items():
+            read_date = datetime.fromtimestamp(read_at, timezone.utc).replace(tzinfo=None)
+            buffer.record(self.dbname, scale_id, 'connected', read_date, weight=weight, interval=self.flush_interval)
+            buffer.record_reading(self.dbname, scale_id, read_date, weight, stable, 'poll')
+        for scale_id, (error, read_at) in errors.items():
+            buffer.record(
+                self.dbname, scale_id, 'error', datetime.fromtimestamp(read_at, timezone.utc).replace(tzinfo=None),
+                error=error, interval=self.flush_interval,
+            )
+        read_times = [reading[2] for reading in readings.values()] + [error[1] for error in errors.values()]
+        if read_times:
+            # The stored values are current as of the earliest read of the cycle
+            buffer.record_poll(self.dbname, datetime.fromtimestamp(min(read_times), timezone.utc).replace(tzinfo=None),
+                               interval=self.flush_interval)
+
+    async def _read(self, semaphore, scale):
+        scale_id, ip_address, port, timeout, driver = scale
+        if driver != 'http_json':
+            # Blocking socket drivers keep their connection in the driver pool
+            async with semaphore:
+                return await asyncio.get_running_loop().run_in_executor(
+                    None, scale_driver_pool.read, (self.dbname, scale_id), (driver, ip_address, port, timeout, None))
+        connection = self.connections.get(scale_id)
+        if connection is None or (connection.ip_address, connection.port, connection.timeout) != (ip_address, port, timeout or 2):
+            if connection:
+                await connection.close()
+            connection = self.connections[scale_id] = AsyncScaleConnection(ip_address, port, timeout)
+        async with semaphore:
+            return await connection.read_weight()
+
+    async def poll_once(self):
+        """Read every due scale concurrently and record the results"""
+        loop = asyncio.get_running_loop()
+        if time.monotonic() - self.loaded_at > RELOAD_INTERVAL:
+            self.scales = await loop.run_in_executor(None, self._load_scales)
+            self.loaded_at = time.monotonic()
+            known = {scale[0] for scale in self.scales}
+            drivers = {scale[0] for scale in self.scales if scale[4] != 'http_json'}
+            for scale_id in list(self.connections):
+                if scale_id not in known or scale_id in drivers:
+                    await self.connections.pop(scale_id).close()
+            # The driver pool rebuilds changed drivers itself, only drop the gone ones
+            for scale_id in self.drivers - drivers:
+                scale_driver_pool.discard((self.dbname, scale_id))
+            self.drivers = drivers
+        now = time.monotonic()
+        due = [scale for scale in self.scales if self.backoff.get(scale[0], (0, 0))[1] <= now]
+        semaphore = asyncio.Semaphore(self.concurrency)
+        results = await asyncio.gather(*(self._read(semaphore, scale) for scale in due), return_exceptions=True)
+        readings, errors = {}, {}
+        for scale, result in zip(due, results):
+            scale_id = scale[0]
+            read_at = time.time()
+            if isinstance(result, BaseException):
+                self.buffer.write(scale_id, read_at, 0.0, False, shared_readings.STATUS_ERROR)
+                # Unreachable scales are retried with an exponential backoff
+                delay = min(max(self.backoff.get(scale_id, (0, 0))[0] * 2, 1), MAX_BACKOFF)
+                self.backoff[scale_id] = (delay, time.monotonic() + delay)
+                errors[scale_id] = (str(result) or result.__class__.__name__, read_at)
+                continue
+            self.backoff.pop(scale_id, None)
+            weight, stable = result
+            self.buffer.write(scale_id, read_at, weight, stable, shared_readings.STATUS_OK)
+            readings[scale_id] = (weight, stable, read_at)
+        self._store_readings(readings, errors)
+        # Scales whose circuit a worker opened are reachable again
+        recovered = self.tripped.intersection(readings)
+        if recovered:
+            await loop.run_in_executor(None, self._close_circuits, recovered)
+            self.tripped -= recovered
+
+    async def run(self):
+        _logger.info("Scale poller started on database %s", self.dbname)
+        try:
+            while not self.stopping:
+                started = time.monotonic()
+                try:
+                    await self.poll_once()
+                except Exception:
+                    _logger.exception("Scale poller cycle failed on database %s", self.dbname)
+                interval = self.interval if self.interval is not None else self.configured_interval
+                await asyncio.sleep(max(interval - (time.monotonic() - started), 0.05))
+        finally:
+            for connection in self.connections.values():
+                await connection.close()
+            for scale_id in self.drivers:
+                scale_driver_pool.discard((self.dbname, scale_id))
+            _logger.info("Scale poller stopped on database %s", self.dbname)
+
+
+_threads = {}
+_threads_lock = threading.Lock()
+
+
+def start_poller_thread(registry):
+    """Start the poller of registry's database in a daemon thread, once per process"""
+    with _threads_lock:
+        thread = _threads.get(registry.db_name)
+        if thread and thread.is_alive():
+            return thread
+        try:
+            poller = ScalePoller(registry)
+        except shared_readings.BufferLocked as e:
+            _logger.warning("Scale poller of %s not started: %s", registry.db_name, e)
+            return None
+        thread = threading.Thread(
+            target=asyncio.run, args=(poller.run(),),
+            name=f"odoo.scale_poller.{registry.db_name}", daemon=True,
+        )
+        _threads[registry.db_name] = thread
+        thread.start()
+        return thread
+
+
+def get_cached_weight(dbname, scale_id, max_age):
+    """Weight published by the poller if younger than max_age seconds"""
+    buffer = shared_readings.get_reader(dbname)
+    reading = buffer and buffer.latest(scale_id)
+    if reading and reading.status == shared_readings.STATUS_OK and time.time() - reading.timestamp <= max_age:
+        return reading.weight
+    return None
@@ -0,0 +1,440 @@
+# -*- coding: utf-8 -*-
+"""Record and replay weighbridge ingestion traffic.
+
+A trace is a gzip compressed JSON lines file. The first line is a header
+(``format``, ``version``, ``database``, ``start``, ``end``, ``readings``),
+every other line one reading as ``[offset_ms, scale_id, weight,
+device_offset_ms]``, offsets being milliseconds after ``start`` and the
+device offset null when the middleware sent no timestamp.
+
+``replay`` sends a trace to a running Odoo, one lane per scale like the
+sites do, at its recorded pace (``--speed 1``), N times faster or as fast as
+possible (``--speed 0``). It reports throughput, request latency
+percentiles, outcomes and errors, and writes them to a JSON report.
+``compare`` lines up the reports of two builds, including the final state
+of the weighings and pickings when the replay ran through ``odoo-bin
+scale_replay`` with access to the database::
+
+    odoo-bin scale_replay capture -d prod --since "2026-03-02 06:00" --output monday.trace.gz
+    odoo-bin scale_replay replay -d test --url http://localhost:8069 --input monday.trace.gz --speed 10 --report a.json
+    python3 tools/scale_replay.py compare a.json b.json
+"""
+import argparse
+import gzip
+import http.client
+import json
+import logging
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlsplit
+
+_logger = logging.getLogger(__name__)
+
+TRACE_FORMAT = 'scale-replay'
+TRACE_VERSION = 1
+SINGLE_PATH = '/scale/receive_weight'
+BATCH_PATH = '/scale/receive_weight/batch'
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+
+def write_trace(path, rows, database=None):
+    """Write rows of (received date, scale id, weight, device date) in
+    reception order, dates naive UTC. Returns the number of readings."""
+    rows = list(rows)
+    start = rows[0][0] if rows else datetime.now(timezone.utc).replace(tzinfo=None)
+    header = {
+        'format': TRACE_FORMAT,
+        'version': TRACE_VERSION,
+        'database': database,
+        'start': start.strftime(DATE_FORMAT),
+        'end': (rows[-1][0] if rows else start).strftime(DATE_FORMAT),
+        'readings': len(rows),
+    }
+
+    def offset(date):
+        return round((date - start).total_seconds() * 1000)
+
+    with gzip.open(path, 'wt', encoding='utf-8') as trace:
+        trace.write(json.dumps(header) + '\n')
+        for received_date, scale_id, weight, device_date in rows:
+            line = [offset(received_date), scale_id, weight, offset(device_date) if device_date else None]
+            trace.write(json.dumps(line, separators=(',', ':')) + '\n')
+    return len(rows)
+
+
+def read_trace(path):
+    """Header and readings of a trace, readings as (offset s, scale id, weight, device date)"""
+    with gzip.open(path, 'rt', encoding='utf-8') as trace:
+        header = json.loads(trace.readline())
+        if header.get('format') != TRACE_FORMAT or header.get('version') != TRACE_VERSION:
+            raise ValueError(f"{path} is not a version {TRACE_VERSION} scale replay trace")
+        start = datetime.strptime(header['start'], DATE_FORMAT)
+        readings = []
+        for line in trace:
+            offset, scale_id, weight, device_offset = json.loads(line)
+            device_date = start + timedelta(milliseconds=device_offset) if device_offset is not None else None
+            readings.append((offset / 1000, scale_id, weight, device_date))
+    return header, readings
+
+
+def percentile(values, ratio):
+    """Nearest rank percentile of sorted values"""
+    if not values:
+        return 0.0
+    return values[min(int(len(values) * ratio), len(values) - 1)]
+
+
+class ReplayStats:
+    """Outcomes, errors and request latencies of a replay"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.outcomes = Counter()
+        self.errors = Counter()
+        self.latencies = []
+        self.requests = 0
+        self.retries = 0
+        self.started = self.finished = time.monotonic()
+
+    def add_request(self, elapsed):
+        with self.lock:
+            self.requests += 1
+            self.latencies.append(elapsed)
+
+    def add_outcome(self, outcome, error=None, count=1):
+        with self.lock:
+            self.outcomes[outcome] += count
+            if error:
+                self.errors[str(error)[:200]] += count
+
+    def summary(self):
+        latencies = sorted(self.latencies)
+        duration = max(self.finished - self.started, 1e-6)
+        readings = sum(self.outcomes.values())
+        return {
+            'readings': readings,
+            'requests': self.requests,
+            'retries': self.retries,
+            'duration': round(duration, 3),
+            'throughput': round(readings / duration, 2),
+            'latency_ms': {
+                'p50': round(percentile(latencies, 0.5) * 1000, 2),
+                'p90': round(percentile(latencies, 0.9) * 1000, 2),
+                'p99': round(percentile(latencies, 0.99) * 1000, 2),
+                'max': round((latencies[-1] if latencies else 0.0) * 1000, 2),
+            },
+            'outcomes': dict(self.outcomes),
+            'errors': dict(self.errors.most_common(20)),
+        }
+
+
+class Lane(threading.Thread):
+    """Send the readings of one scale in order, on one keep-alive connection"""
+
+    def __init__(self, scale_id, readings, replayer):
+        super().__init__(name=f'scale_replay_lane_{scale_id}', daemon=True)
+        self.scale_id = scale_id
+        self.readings = readings
+        self.replayer = replayer
+        self.options = replayer.options
+        self.stats = replayer.stats
+        self.url = urlsplit(self.options.url)
+        self.connection = None
+
+    def _post(self, path, payload):
+        body = json.dumps(payload).encode()
+        for attempt in range(2):
+            if self.connection is None:
+                connection_class = http.client.HTTPSConnection if self.url.scheme == 'https' else http.client.HTTPConnection
+                self.connection = connection_class(self.url.hostname, self.url.port, timeout=self.options.timeout)
+            try:
+                self.connection.request('POST', path, body, {'Content-Type': 'application/json'})
+                response = self.connection.getresponse()
+                return response.status, response.read()
+            except (ConnectionError, http.client.HTTPException):
+                # The server closed the idle keep-alive connection, retry once
+                self.connection.close()
+                self.connection = None
+                if attempt:
+                    raise
+            except Exception:
+                self.connection.close()
+                self.connection = None
+                raise
+
+    def _send(self, items):
+        """Send items, returns the items answered with retry"""
+        batch = self.options.batch_size > 1
+        path = BATCH_PATH if batch else SINGLE_PATH
+        started = time.monotonic()
+        try:
+            status, data = self._post(path, {'readings': items} if batch else items[0])
+            self.stats.add_request(time.monotonic() - started)
+            if status != 200:
+                raise ValueError(f"HTTP {status}")
+            answer = json.loads(data)
+        except Exception as e:
+            self.stats.add_outcome('error', str(e) or e.__class__.__name__, count=len(items))
+            return []
+        results = answer.get('results') if batch else [answer]
+        if not isinstance(results, list) or len(results) != len(items):
+            self.stats.add_outcome('error', answer.get('error') or "Unexpected answer", count=len(items))
+            return []
+        retry = []
+        for item, result in zip(items, results):
+            if result.get('retry'):
+                retry.append(item)
+            elif not result.get('success'):
+                self.stats.add_outcome('rejected', result.get('error'))
+            elif result.get('duplicate'):
+                self.stats.add_outcome('duplicate')
+            elif result.get('queued'):
+                self.stats.add_outcome('queued')
+            else:
+                self.stats.add_outcome('applied')
+        return retry
+
+    def _deliver(self, items):
+        for _attempt in range(self.options.retries):
+            items = self._send(items)
+            if not items:
+                return
+            with self.stats.lock:
+                self.stats.retries += len(items)
+            time.sleep(self.options.retry_delay)
+        self.stats.add_outcome('retry', "Still busy after the retries", count=len(items))
+
+    def run(self):
+        speed = self.options.speed
+        index = 0
+        try:
+            while index < len(self.readings):
+                if speed > 0:
+                    # Readings are sent at their recorded offset divided by the speed
+                    delay = self.readings[index][0] / speed - (time.monotonic() - self.replayer.started)
+                    if delay > 0:
+                        time.sleep(delay)
+                    elapsed = (time.monotonic() - self.replayer.started) * speed
+                else:
+                    elapsed = float('inf')
+                items = []
+                while (index < len(self.readings) and len(items) < self.options.batch_size
+                       and self.readings[index][0] <= elapsed):
+                    offset, scale_id, weight, device_date = self.readings[index]
+                    item = {'key': self.replayer.key(index, scale_id), 'scale_id': scale_id, 'weight': weight}
+                    if device_date:
+                        item['timestamp'] = device_date.isoformat() + '+00:00'
+                    items.append(item)
+                    index += 1
+                if items:
+                    self._deliver(items)
+        finally:
+            if self.connection is not None:
+                self.connection.close()
+
+
+class Replayer:
+    """Replay the readings of a trace, one lane per scale"""
+
+    def __init__(self, readings, options):
+        self.readings = readings
+        self.options = options
+        self.stats = ReplayStats()
+        # Keys of a run never collide with those of the recording or another run
+        self.run_id = options.run_id or uuid.uuid4().hex[:8]
+        self.started = time.monotonic()
+
+    def key(self, index, scale_id):
+        return f'replay-{self.run_id}-{scale_id}-{index}'
+
+    def key_prefix(self):
+        return f'replay-{self.run_id}-'
+
+    def run(self):
+        lanes = defaultdict(list)
+        for reading in self.readings:
+            lanes[reading[1]].append(reading)
+        threads = [Lane(scale_id, readings, self) for scale_id, readings in lanes.items()]
+        _logger.info("Replaying %s reading(s) of %s scale(s) at %s, run %s", len(self.readings), len(threads),
+                     f"{self.options.speed}x" if self.options.speed > 0 else "maximum speed", self.run_id)
+        self.started = self.stats.started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.stats.finished = time.monotonic()
+        return self.stats
+
+
+def diff_states(before, after):
+    """Records created, removed and changed between two state snapshots.
+
+    Snapshots map a kind ('weighings', 'pickings') to {id: {field: value}},
+    ids being strings as in JSON.
+    """
+    diff = {}
+    for kind in sorted(set(before) | set(after)):
+        old, new = before.get(kind, {}), after.get(kind, {})
+        changed = {}
+        for record_id in sorted(set(old) & set(new), key=str):
+            fields = {
+                name: [old[record_id].get(name), value]
+                for name, value in new[record_id].items() if old[record_id].get(name) != value
+            }
+            if fields:
+                changed[record_id] = fields
+        diff[kind] = {
+            'created': {record_id: new[record_id] for record_id in sorted(set(new) - set(old), key=str)},
+            'removed': {record_id: old[record_id] for record_id in sorted(set(old) - set(new), key=str)},
+            'changed': changed,
+        }
+    return diff
+
+
+def format_diff(diff, limit=20):
+    lines = []
+    for kind, changes in diff.items():
+        lines.append(f"{kind}: {len(changes['created'])} created, {len(changes['removed'])} removed, "
+                     f"{len(changes['changed'])} changed")
+        for record_id, fields in list(changes['changed'].items())[:limit]:
+            values = ', '.join(f"{name} {old!r} -> {new!r}" for name, (old, new) in fields.items())
+            lines.append(f"  {kind[:-1]} {record_id}: {values}")
+        for record_id, values in list(changes['created'].items())[:limit]:
+            lines.append(f"  + {kind[:-1]} {record_id}: {values}")
+    return '\n'.join(lines)
+
+
+def format_summary(summary):
+    latency = summary['latency_ms']
+    outcomes = ', '.join(f"{outcome} {count}" for outcome, count in sorted(summary['outcomes'].items())) or 'none'
+    lines = [
+        f"{summary['readings']} reading(s) in {summary['requests']} request(s) over {summary['duration']} s, "
+        f"{summary['throughput']} readings/s",
+        f"Latency ms: p50 {latency['p50']}, p90 {latency['p90']}, p99 {latency['p99']}, max {latency['max']}",
+        f"Outcomes: {outcomes}, {summary['retries']} retried",
+    ]
+    lines += [f"  {count} x {error}" for error, count in summary['errors'].items()]
+    return '\n'.join(lines)
+
+
+def compare_reports(first, second):
+    """Text comparison of the reports of two replays"""
+    lines = []
+    a, b = first['stats'], second['stats']
+    for label, path in (("Throughput (readings/s)", ('throughput',)), ("Duration (s)", ('duration',)),
+                        ("Latency p50 (ms)", ('latency_ms', 'p50')), ("Latency p90 (ms)", ('latency_ms', 'p90')),
+                        ("Latency p99 (ms)", ('latency_ms', 'p99')), ("Latency max (ms)", ('latency_ms', 'max'))):
+        value_a, value_b = a, b
+        for name in path:
+            value_a, value_b = value_a[name], value_b[name]
+        lines.append(f"{label:<26} {value_a:>12} {value_b:>12}")
+    for outcome in sorted(set(a['outcomes']) | set(b['outcomes'])):
+        lines.append(f"{outcome:<26} {a['outcomes'].get(outcome, 0):>12} {b['outcomes'].get(outcome, 0):>12}")
+    if first.get('apply') and second.get('apply'):
+        for name in ('latency_avg', 'latency_p95', 'pending'):
+            lines.append(f"{'Apply ' + name:<26} {first['apply'].get(name):>12} {second['apply'].get(name):>12}")
+    if first.get('state') and second.get('state'):
+        diff = diff_states(first['state']['after'], second['state']['after'])
+        if any(changes['created'] or changes['removed'] or changes['changed'] for changes in diff.values()):
+            lines.append("Final state differs:")
+            lines.append(format_diff(diff))
+        else:
+            lines.append("Final state identical")
+    return '\n'.join(lines)
+
+
+def build_parser(prog=None, with_database=False):
+    parser = argparse.ArgumentParser(prog=prog, description="Record and replay weighbridge ingestion traffic")
+    commands = parser.add_subparsers(dest='command', required=True)
+    if with_database:
+        capture = commands.add_parser('capture', help="Record the readings ingested by the database to a trace")
+        capture.add_argument('--since', help="Oldest reception date, UTC, e.g. '2026-03-02 06:00'")
+        capture.add_argument('--until', help="Newest reception date, UTC")
+        capture.add_argument('--scale-ids', default='', help="Comma separated weighing.scale ids, all by default")
+        capture.add_argument('--output', required=True, help="Trace file to write")
+
+    replay = commands.add_parser('replay', help="Send a trace to a running Odoo")
+    replay.add_argument('--url', required=True, help="Odoo URL, e.g. http://localhost:8069")
+    replay.add_argument('--input', required=True, help="Trace file to replay")
+    replay.add_argument('--speed', type=float, default=1.0,
+                        help="1 replays at the recorded pace, N N times faster, 0 as fast as possible")
+    replay.add_argument('--batch-size', type=int, default=1,
+                        help="Readings per request, above 1 the batch endpoint is used")
+    replay.add_argument('--timeout', type=float, default=30.0, help="Timeout of a request in seconds")
+    replay.add_argument('--retries', type=int, default=5, help="Attempts of a reading answered with retry")
+    replay.add_argument('--retry-delay', type=float, default=0.2, help="Seconds between two attempts")
+    replay.add_argument('--run-id', help="Prefix of the replayed keys, random by default")
+    replay.add_argument('--report', help="JSON report to write")
+    if with_database:
+        replay.add_argument('--drain-timeout', type=float, default=300.0,
+                            help="Seconds to wait for the queued readings to be applied before the final snapshot")
+
+    compare = commands.add_parser('compare', help="Compare the reports of two replays")
+    compare.add_argument('reports', nargs=2, help="Two JSON reports")
+    return parser
+
+
+def parse_options(args=None, prog=None, known=False, with_database=False):
+    """Replay options, with the unknown arguments as well when known is set"""
+    parser = build_parser(prog, with_database=with_database)
+    if known:
+        options, extra = parser.parse_known_args(args)
+    else:
+        options, extra = parser.parse_args(args), []
+    if options.command == 'replay':
+        if options.speed < 0 or options.batch_size < 1 or options.retries < 1:
+            parser.error("--speed must not be negative, --batch-size and --retries must be positive")
+    return (options, extra) if known else options
+
+
+def replay(options, before=None, after=None):
+    """Replay the trace of options and return the report.
+
+    before and after are optional callables taking the replayer and
+    returning the state snapshot to diff, after may also add to the report.
+    """
+    header, readings = read_trace(options.input)
+    replayer = Replayer(readings, options)
+    report = {'trace': header, 'run_id': replayer.run_id, 'speed': options.speed, 'batch_size': options.batch_size}
+    state_before = before(replayer) if before else None
+    stats = replayer.run()
+    report['stats'] = stats.summary()
+    _logger.info("Replay finished\n%s", format_summary(report['stats']))
+    if after:
+        state_after = after(replayer, report)
+        if state_before is not None and state_after is not None:
+            report['state'] = {'before': state_before, 'after': state_after}
+            report['diff'] = diff_states(state_before, state_after)
+            _logger.info("State changes\n%s", format_diff(report['diff']))
+    if options.report:
+        with open(options.report, 'w', encoding='utf-8') as output:
+            json.dump(report, output, indent=1, default=str)
+    return report
+
+
+def compare(options, output=None):
+    """Write the comparison of two reports to output, stdout by default"""
+    output = output or sys.stdout
+    reports = []
+    for path in options.reports:
+        with open(path, encoding='utf-8') as report:
+            reports.append(json.load(report))
+    output.write(f"{'':<26} {'first':>12} {'second':>12}\n")
+    output.write(compare_reports(*reports) + '\n')
+
+
+def main(args=None, prog=None):
+    options = parse_options(args, prog)
+    if options.command == 'compare':
+        compare(options)
+    else:
+        replay(options)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    main()
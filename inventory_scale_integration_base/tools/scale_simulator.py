@@ -0,0 +1,562 @@
+# -*- coding: utf-8 -*-
+"""Weighbridge simulator for development and load testing.
+
+Every simulated scale models a lane: trucks drive on axle by axle, the
+platform oscillates then settles, the truck drives off and the next one
+arrives, loaded (gross) or coming back empty (tare). Readings carry noise,
+zero drift and the indicator's motion flag, and scales can go through
+outages during which they stop answering.
+
+Each scale listens on its own port with one of the protocols of
+``scale_drivers``: ``http_json`` (``GET /get_weight``), ``tcp_stream``,
+``mt_sics`` or ``serial_tcp``. The simulator can also push readings to
+``/scale/receive_weight`` like a site middleware, either every reading at a
+fixed rate or once per settled truck.
+
+Only the standard library is used so that it runs outside Odoo too::
+
+    python3 tools/scale_simulator.py --scales 8 --protocols http_json,mt_sics
+    odoo-bin scale_simulator --scales 8 --push-url http://localhost:8069/scale/receive_weight
+"""
+import argparse
+import asyncio
+import http.client
+import json
+import logging
+import math
+import random
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+_logger = logging.getLogger(__name__)
+
+PROTOCOLS = ('http_json', 'tcp_stream', 'mt_sics', 'serial_tcp')
+# Axles of a simulated truck, it drives on the platform one axle at a time
+AXLES = 3
+# Damped oscillation of the platform once the truck stopped
+OSCILLATION = 0.03
+OSCILLATION_DAMPING = 1.5
+OSCILLATION_FREQUENCY = 0.8
+
+
+class Truck:
+
+    def __init__(self, plate, tare, payload):
+        self.plate = plate
+        self.tare = tare
+        self.payload = payload
+
+
+class SimulatedScale:
+    """Weight shown by one platform over time.
+
+    ``sample()`` returns ``(weight, stable)`` at the current time and is
+    cheap enough to be called for every request or frame.
+    """
+
+    def __init__(self, number, options, rng=None):
+        self.number = number
+        self.scale_id = number
+        self.options = options
+        self.rng = rng or random.Random(options.seed + number)
+        self.started = time.monotonic()
+        self.trucks = [
+            Truck(f"SIM-{number:02d}-{i:03d}", self.rng.uniform(9000, 16000), self.rng.uniform(5000, 30000))
+            for i in range(options.trucks)
+        ]
+        # Trucks that were weighed loaded and will come back empty
+        self.returning = deque()
+        self.visits = 0
+        self.truck = None
+        self.target = 0.0
+        self.phase = 'idle'
+        self.phase_start = self.started
+        self.phase_end = self.started + self.rng.expovariate(1 / options.idle)
+        self.outage_until = 0.0
+        self.next_outage = self._schedule_outage(self.started)
+
+    # Timeline
+
+    def _schedule_outage(self, now):
+        if self.options.outage_rate <= 0:
+            return math.inf
+        return now + self.rng.expovariate(self.options.outage_rate / 3600)
+
+    def _next_phase(self):
+        options = self.options
+        start = self.phase_end
+        if self.phase == 'idle':
+            if self.returning and self.rng.random() < 0.5:
+                self.truck = self.returning.popleft()
+                self.target = self.truck.tare
+            else:
+                self.truck = self.rng.choice(self.trucks)
+                self.target = self.truck.tare + self.truck.payload
+                self.returning.append(self.truck)
+            self.visits += 1
+            self.phase, duration = 'arrive', self.rng.uniform(3, 6)
+        elif self.phase == 'arrive':
+            self.phase, duration = 'settle', self.rng.expovariate(1 / options.dwell) + 2
+        elif self.phase == 'settle':
+            self.phase, duration = 'depart', self.rng.uniform(3, 6)
+        else:
+            self.truck = None
+            self.phase, duration = 'idle', self.rng.expovariate(1 / options.idle)
+        self.phase_start, self.phase_end = start, start + duration
+
+    def _advance(self, now):
+        while now >= self.phase_end:
+            self._next_phase()
+        while now >= self.next_outage:
+            duration = self.rng.expovariate(1 / self.options.outage_duration)
+            self.outage_until = max(self.outage_until, self.next_outage + duration)
+            _logger.info("Scale %s goes down for %.0f s", self.scale_id, duration)
+            self.next_outage = self._schedule_outage(self.next_outage + duration)
+
+    def available(self, now=None):
+        now = time.monotonic() if now is None else now
+        self._advance(now)
+        return now >= self.outage_until
+
+    # Weight curve
+
+    def _load(self, now):
+        """Noise-free weight on the platform and whether it moves"""
+        elapsed = now - self.phase_start
+        if self.phase == 'idle':
+            return 0.0, False
+        if self.phase in ('arrive', 'depart'):
+            progress = elapsed / (self.phase_end - self.phase_start)
+            if self.phase == 'depart':
+                progress = 1 - progress
+            # Whole axles on the platform plus the one rolling onto it
+            axles, rolling = divmod(progress * AXLES, 1)
+            fraction = (axles + rolling * rolling * (3 - 2 * rolling)) / AXLES
+            return self.target * fraction, True
+        swing = OSCILLATION * self.target * math.exp(-elapsed / OSCILLATION_DAMPING) \
+            * math.cos(2 * math.pi * OSCILLATION_FREQUENCY * elapsed)
+        return self.target + swing, abs(swing) > self.options.motion_band
+
+    def sample(self, now=None):
+        now = time.monotonic() if now is None else now
+        self._advance(now)
+        load, moving = self._load(now)
+        drift = self.options.drift * (now - self.started) / 3600
+        weight = load + drift + self.rng.gauss(0, self.options.noise)
+        graduation = self.options.graduation
+        weight = round(weight / graduation) * graduation
+        return weight, not moving
+
+    def settled_visit(self, now=None):
+        """Visit number once the current truck settled, None otherwise"""
+        now = time.monotonic() if now is None else now
+        self._advance(now)
+        if self.phase == 'settle' and not self._load(now)[1] and now - self.phase_start >= self.options.settle_hold:
+            return self.visits
+        return None
+
+
+# Frames of the raw protocols, as parsed by the drivers of scale_drivers
+
+def format_tcp_stream(weight, stable, capacity):
+    if weight > capacity:
+        return b'OL,GS,+999999.9kg\r\n'
+    return f"{'ST' if stable else 'US'},GS,{weight:+09.1f}kg\r\n".encode()
+
+
+def format_mt_sics(weight, stable, capacity):
+    if weight > capacity:
+        return b'S +\r\n'
+    return f"S {'S' if stable else 'D'} {weight:10.2f} kg\r\n".encode()
+
+
+def format_toledo(weight, stable, capacity):
+    # Status words A/B/C always have bit 5 set, A: decimal code 2 (no
+    # decimals) and increment x1, B: negative, over capacity, motion, kg
+    swa = 0x20 | 0x08 | 0x02
+    swb = 0x20 | 0x10
+    if weight < 0:
+        swb |= 0x02
+    if weight > capacity:
+        swb |= 0x04
+    if not stable:
+        swb |= 0x08
+    digits = f"{min(int(round(abs(weight))), 999999):06d}"
+    return bytes((0x02, swa, swb, 0x20)) + digits.encode() + b'000000\r'
+
+
+class SimulatorStats:
+    """Counters and push latencies reported periodically"""
+
+    def __init__(self):
+        self.served = Counter()
+        self.pushes = Counter()
+        self.latencies = deque(maxlen=10000)
+        self.started = time.monotonic()
+
+    def percentile(self, values, ratio):
+        if not values:
+            return 0.0
+        return values[min(int(len(values) * ratio), len(values) - 1)]
+
+    def report(self):
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        served = ', '.join(f"{protocol} {count}" for protocol, count in sorted(self.served.items())) or 'none'
+        message = f"Served: {served}"
+        if self.pushes:
+            latencies = sorted(self.latencies)
+            message += (
+                f" | Pushed {self.pushes['ok']} ok, {self.pushes['rejected']} rejected, {self.pushes['error']} failed"
+                f" ({sum(self.pushes.values()) / elapsed:.1f}/s), latency ms"
+                f" p50 {self.percentile(latencies, 0.5) * 1000:.1f}"
+                f" p95 {self.percentile(latencies, 0.95) * 1000:.1f}"
+                f" max {(latencies[-1] if latencies else 0) * 1000:.1f}"
+            )
+        _logger.info("%s", message)
+
+
+class ScaleServer:
+    """Serve one simulated scale with one protocol"""
+
+    def __init__(self, scale, protocol, host, port, options, stats):
+        self.scale = scale
+        self.protocol = protocol
+        self.host = host
+        self.port = port
+        self.options = options
+        self.stats = stats
+        self.server = None
+        self.connections = {}
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+
+    async def _handle(self, reader, writer):
+        self.connections[asyncio.current_task()] = writer
+        try:
+            await getattr(self, f'_serve_{self.protocol}')(reader, writer)
+        finally:
+            self.connections.pop(asyncio.current_task(), None)
+
+    async def close(self):
+        if self.server:
+            self.server.close()
+            # Closing the connections ends their handlers, cancelling them
+            # would be reported as unhandled by asyncio
+            for writer in self.connections.values():
+                writer.close()
+            if self.connections:
+                await asyncio.wait(list(self.connections), timeout=2)
+            await self.server.wait_closed()
+
+    async def _latency(self):
+        delay = self.options.latency + self.scale.rng.uniform(0, self.options.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+
+    async def _outage(self, writer):
+        """Handle an outage, True when the connection must be dropped"""
+        if self.scale.available():
+            return False
+        if self.options.outage_mode == 'hang':
+            # Stay silent like a powered-off indicator, the client times out
+            while not self.scale.available() and not writer.is_closing():
+                await asyncio.sleep(0.2)
+        return True
+
+    @staticmethod
+    async def _close(writer):
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except (OSError, asyncio.CancelledError):
+            pass
+
+    async def _serve_http_json(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _sep, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                if int(headers.get('content-length') or 0):
+                    await reader.readexactly(int(headers['content-length']))
+                if await self._outage(writer):
+                    break
+                await self._latency()
+                parts = request_line.split()
+                if len(parts) >= 2 and parts[0] == b'GET' and parts[1].split(b'?')[0] == b'/get_weight':
+                    weight, stable = self.scale.sample()
+                    status = '200 OK'
+                    body = json.dumps({'weight': weight, 'stable': stable, 'unit': 'kg'}).encode()
+                else:
+                    status = '404 Not Found'
+                    body = json.dumps({'error': 'Not found'}).encode()
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                writer.write((
+                    f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(body)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+                ).encode('latin-1') + body)
+                await writer.drain()
+                self.stats.served[self.protocol] += 1
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            await self._close(writer)
+
+    async def _serve_mt_sics(self, reader, writer):
+        capacity = self.options.capacity
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if await self._outage(writer):
+                    break
+                await self._latency()
+                command = line.strip().upper()
+                weight, stable = self.scale.sample()
+                if command == b'SI':
+                    answer = format_mt_sics(weight, stable, capacity)
+                elif command == b'S':
+                    # Stable weight only, a real indicator would wait for it
+                    answer = format_mt_sics(weight, stable, capacity) if stable else b'S I\r\n'
+                elif command == b'I4':
+                    answer = f'I4 A "SIM{self.scale.scale_id:05d}"\r\n'.encode()
+                else:
+                    answer = b'ES\r\n'
+                writer.write(answer)
+                await writer.drain()
+                self.stats.served[self.protocol] += 1
+        except ConnectionError:
+            pass
+        finally:
+            await self._close(writer)
+
+    async def _stream(self, writer, formatter):
+        interval = 1 / self.options.stream_rate
+        capacity = self.options.capacity
+        try:
+            while not writer.is_closing():
+                if not self.scale.available():
+                    if self.options.outage_mode == 'drop':
+                        break
+                    await asyncio.sleep(0.2)
+                    continue
+                weight, stable = self.scale.sample()
+                writer.write(formatter(weight, stable, capacity))
+                await writer.drain()
+                self.stats.served[self.protocol] += 1
+                await asyncio.sleep(interval)
+        except ConnectionError:
+            pass
+        finally:
+            await self._close(writer)
+
+    async def _serve_tcp_stream(self, reader, writer):
+        await self._stream(writer, format_tcp_stream)
+
+    async def _serve_serial_tcp(self, reader, writer):
+        await self._stream(writer, format_toledo)
+
+
+class WeightPusher:
+    """POST the readings of one scale to /scale/receive_weight.
+
+    In ``continuous`` mode every reading is sent at ``push_rate`` per second,
+    in ``settled`` mode one reading is sent per truck once it settled, like a
+    middleware capturing weights on its own.
+    """
+
+    def __init__(self, scale, url, options, stats, executor):
+        self.scale = scale
+        self.url = urlsplit(url)
+        self.options = options
+        self.stats = stats
+        self.executor = executor
+        self.connection = None
+
+    def _post(self, payload):
+        body = json.dumps(payload).encode()
+        started = time.monotonic()
+        for attempt in range(2):
+            if self.connection is None:
+                connection_class = http.client.HTTPSConnection if self.url.scheme == 'https' else http.client.HTTPConnection
+                self.connection = connection_class(self.url.hostname, self.url.port, timeout=self.options.push_timeout)
+            try:
+                self.connection.request('POST', self.url.path or '/', body, {'Content-Type': 'application/json'})
+                response = self.connection.getresponse()
+                data = response.read()
+                break
+            except (ConnectionError, http.client.HTTPException):
+                # The server closed the idle keep-alive connection, retry once
+                self.connection.close()
+                self.connection = None
+                if attempt:
+                    raise
+            except Exception:
+                self.connection.close()
+                self.connection = None
+                raise
+        elapsed = time.monotonic() - started
+        if response.status != 200:
+            return 'error', elapsed, f"HTTP {response.status}"
+        try:
+            result = json.loads(data)
+        except ValueError:
+            return 'error', elapsed, "Invalid JSON answer"
+        if not result.get('success'):
+            return 'rejected', elapsed, result.get('error')
+        return 'ok', elapsed, None
+
+    def _payload(self, weight, stable):
+        return {
+            'scale_id': self.scale.scale_id,
+            'weight': weight,
+            'stable': stable,
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+        }
+
+    async def _send(self, weight, stable):
+        loop = asyncio.get_running_loop()
+        try:
+            outcome, elapsed, error = await loop.run_in_executor(self.executor, self._post, self._payload(weight, stable))
+        except Exception as e:
+            outcome, elapsed, error = 'error', None, str(e) or e.__class__.__name__
+        self.stats.pushes[outcome] += 1
+        if elapsed is not None:
+            self.stats.latencies.append(elapsed)
+        if error:
+            _logger.debug("Push of scale %s %s: %s", self.scale.scale_id, outcome, error)
+
+    async def run(self):
+        if self.options.push_mode == 'settled':
+            pushed = None
+            while True:
+                visit = self.scale.settled_visit()
+                if visit is not None and visit != pushed and self.scale.available():
+                    pushed = visit
+                    await self._send(*self.scale.sample())
+                await asyncio.sleep(0.1)
+        interval = 1 / self.options.push_rate
+        deadline = time.monotonic()
+        while True:
+            if self.scale.available():
+                await self._send(*self.scale.sample())
+            # Keep the rate when a push was slow instead of drifting
+            deadline = max(deadline + interval, time.monotonic())
+            await asyncio.sleep(deadline - time.monotonic())
+
+
+def build_parser(prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="Simulate weighbridge indicators for development and load tests")
+    parser.add_argument('--scales', type=int, default=1, help="Number of simulated scales")
+    parser.add_argument('--host', default='127.0.0.1', help="Address the scales listen on")
+    parser.add_argument('--base-port', type=int, default=5000, help="Port of the first scale, the next ones follow")
+    parser.add_argument('--protocols', default='http_json',
+                        help=f"Comma separated protocols assigned to the scales in turn, among {', '.join(PROTOCOLS)}")
+    parser.add_argument('--scale-ids', default='',
+                        help="Comma separated weighing.scale ids sent with pushed readings, 1..N by default")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed, a seed replays the same lanes")
+    parser.add_argument('--trucks', type=int, default=20, help="Trucks per lane")
+    parser.add_argument('--idle', type=float, default=20.0, help="Mean seconds between two trucks")
+    parser.add_argument('--dwell', type=float, default=15.0, help="Mean seconds a truck stays on the platform")
+    parser.add_argument('--noise', type=float, default=2.0, help="Standard deviation of the noise in kg")
+    parser.add_argument('--drift', type=float, default=0.0, help="Zero drift in kg per hour")
+    parser.add_argument('--graduation', type=float, default=10.0, help="Display increment in kg")
+    parser.add_argument('--motion-band', type=float, default=20.0,
+                        help="Oscillation in kg above which the indicator reports motion")
+    parser.add_argument('--capacity', type=float, default=80000.0, help="Capacity in kg, above it reports overload")
+    parser.add_argument('--latency', type=float, default=0.0, help="Response latency in ms")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Random latency added to --latency in ms")
+    parser.add_argument('--outage-rate', type=float, default=0.0, help="Mean outages per scale and hour")
+    parser.add_argument('--outage-duration', type=float, default=30.0, help="Mean outage duration in seconds")
+    parser.add_argument('--outage-mode', choices=('hang', 'drop'), default='hang',
+                        help="During outages, stay silent (clients time out) or close connections")
+    parser.add_argument('--stream-rate', type=float, default=10.0, help="Frames per second of the streaming protocols")
+    parser.add_argument('--push-url', help="URL of /scale/receive_weight, pushing is disabled without it")
+    parser.add_argument('--push-mode', choices=('settled', 'continuous'), default='settled',
+                        help="Push once per settled truck or every reading")
+    parser.add_argument('--push-rate', type=float, default=1.0, help="Readings pushed per second and scale in continuous mode")
+    parser.add_argument('--push-timeout', type=float, default=10.0, help="Timeout of a push in seconds")
+    parser.add_argument('--settle-hold', type=float, default=1.0,
+                        help="Seconds a truck must have stopped before a settled push")
+    parser.add_argument('--report-interval', type=float, default=10.0, help="Seconds between two statistics reports")
+    parser.add_argument('--duration', type=float, default=0.0, help="Stop after this many seconds, 0 runs until interrupted")
+    return parser
+
+
+def parse_options(args=None, prog=None, known=False):
+    """Simulator options, with the unknown arguments as well when known is set"""
+    parser = build_parser(prog)
+    if known:
+        options, extra = parser.parse_known_args(args)
+    else:
+        options, extra = parser.parse_args(args), []
+    options.protocols = [protocol.strip() for protocol in options.protocols.split(',') if protocol.strip()]
+    unknown = set(options.protocols) - set(PROTOCOLS)
+    if unknown or not options.protocols:
+        parser.error(f"Unknown protocol(s): {', '.join(sorted(unknown)) or 'none given'}")
+    options.scale_ids = [int(scale_id) for scale_id in options.scale_ids.split(',') if scale_id.strip()]
+    if options.scale_ids and len(options.scale_ids) != options.scales:
+        parser.error("--scale-ids needs one id per scale")
+    if min(options.idle, options.dwell, options.stream_rate, options.push_rate, options.outage_duration) <= 0:
+        parser.error("--idle, --dwell, --stream-rate, --push-rate and --outage-duration must be positive")
+    return (options, extra) if known else options
+
+
+async def run(options):
+    stats = SimulatorStats()
+    servers, tasks = [], []
+    executor = ThreadPoolExecutor(max_workers=max(options.scales, 1), thread_name_prefix='scale_simulator')
+    try:
+        for number in range(options.scales):
+            scale = SimulatedScale(number + 1, options)
+            if options.scale_ids:
+                scale.scale_id = options.scale_ids[number]
+            protocol = options.protocols[number % len(options.protocols)]
+            server = ScaleServer(scale, protocol, options.host, options.base_port + number, options, stats)
+            await server.start()
+            servers.append(server)
+            _logger.info("Scale %s serves %s on %s:%s", scale.scale_id, protocol, options.host, server.port)
+            if options.push_url:
+                tasks.append(asyncio.create_task(WeightPusher(scale, options.push_url, options, stats, executor).run()))
+        started = time.monotonic()
+        while not options.duration or time.monotonic() - started < options.duration:
+            await asyncio.sleep(min(options.report_interval, options.duration or options.report_interval))
+            stats.report()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for server in servers:
+            await server.close()
+        executor.shutdown(wait=False)
+    return stats
+
+
+def serve(options):
+    try:
+        asyncio.run(run(options))
+    except KeyboardInterrupt:
+        _logger.info("Scale simulator stopped")
+
+
+def main(args=None, prog=None):
+    serve(parse_options(args, prog))
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    main()
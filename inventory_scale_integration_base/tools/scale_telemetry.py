@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+"""Per-process buffer coalescing the telemetry written on weighing scales.
+
+Reads record their outcome (status, weight, error) here instead of updating
+the ``weighing_scale`` row. A daemon thread flushes the buffer of each
+database at most every ``telemetry_flush_interval`` seconds with a single
+UPDATE; only the latest values of a scale are kept, values identical to the
+last flush are skipped unless the heartbeat elapsed, and a flush never
+overwrites a row checked more recently by another process.
+
+Raw readings for the ``weighing.scale.reading`` time series are buffered
+the same way and appended with one COPY per flush.
+
+Since unchanged values are skipped, ``last_read_date`` does not tell whether
+a reading is still current. The scale poller records the time of its poll
+cycles instead: each flush stores the latest one in the poller heartbeat
+parameter, in the transaction writing the readings of that cycle.
+"""
+import atexit
+import io
+import logging
+import os
+import threading
+import time
+
+from odoo.modules.registry import Registry
+from odoo.tools import SQL
+
+_logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL_PARAM = 'inventory_scale_integration_base.telemetry_flush_interval'
+POLLER_HEARTBEAT_PARAM = 'inventory_scale_integration_base.poller_heartbeat'
+DEFAULT_FLUSH_INTERVAL = 5
+# Unchanged values are still written this often so last_check_date moves on
+HEARTBEAT = 60
+# Readings kept per database while the flush fails, the oldest are dropped
+MAX_PENDING_READINGS = 100000
+
+
+class TelemetryBuffer:
+    """Latest telemetry of each (database, scale id), pending for flush"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._pending = {}
+        self._readings = {}
+        self._heartbeats = {}
+        self._flushed = {}
+        self._intervals = {}
+        self._last_flush = {}
+        self._thread = None
+
+    def _check_pid(self):
+        if self._pid != os.getpid():
+            # Forked worker: pending values belong to the parent
+            self._pid = os.getpid()
+            self._pending = {}
+            self._readings = {}
+            self._heartbeats = {}
+            self._flushed = {}
+            self._last_flush = {}
+            self._thread = None
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='odoo.scale_telemetry', daemon=True)
+            self._thread.start()
+
+    def record(self, dbname, scale_id, status, check_date, weight=None, error=None,
+               interval=DEFAULT_FLUSH_INTERVAL):
+        """Buffer the outcome of a read, check_date is a naive UTC datetime"""
+        with self._lock:
+            self._check_pid()
+            self._pending[(dbname, scale_id)] = {
+                'connection_status': status,
+                'last_check_date': check_date,
+                'last_read_weight': weight,
+                'last_read_date': check_date if weight is not None else None,
+                'error_message': error,
+            }
+            self._intervals[dbname] = interval
+            self._ensure_thread()
+        if interval <= 0:
+            self.flush(dbname)
+
+    def record_reading(self, dbname, scale_id, timestamp, weight, stable, source):
+        """Buffer a raw reading, timestamp is a naive UTC datetime"""
+        with self._lock:
+            self._check_pid()
+            readings = self._readings.setdefault(dbname, [])
+            if len(readings) >= MAX_PENDING_READINGS:
+                del readings[:len(readings) // 10]
+                _logger.warning("Scale reading buffer of %s is full, oldest readings dropped", dbname)
+            readings.append((scale_id, timestamp, weight, stable, source))
+            self._ensure_thread()
+
+    def record_poll(self, dbname, poll_date, interval=DEFAULT_FLUSH_INTERVAL):
+        """Buffer the time of a poll cycle whose outcomes were all recorded, a naive UTC datetime"""
+        with self._lock:
+            self._check_pid()
+            self._heartbeats[dbname] = max(poll_date, self._heartbeats.get(dbname, poll_date))
+            self._intervals[dbname] = interval
+            self._ensure_thread()
+        if interval <= 0:
+            self.flush(dbname)
+
+    def pending(self, dbname, scale_ids):
+        """Buffered values of scale_ids not flushed yet by this process"""
+        with self._lock:
+            self._check_pid()
+            return {
+                scale_id: dict(values)
+                for scale_id in scale_ids
+                if (values := self._pending.get((dbname, scale_id)))
+            }
+
+    @staticmethod
+    def _signature(values):
+        return values['connection_status'], values['last_read_weight'], values['error_message']
+
+    def _take(self, dbname):
+        """Pop the pending values of dbname that differ from the last flush, its readings and heartbeat"""
+        now = time.monotonic()
+        rows = {}
+        for key in [key for key in self._pending if key[0] == dbname]:
+            values = self._pending.pop(key)
+            flushed_values, flushed_at = self._flushed.get(key, (None, 0))
+            if self._signature(values) == flushed_values and now - flushed_at < HEARTBEAT:
+                continue
+            rows[key[1]] = values
+        self._last_flush[dbname] = now
+        return rows, self._readings.pop(dbname, []), self._heartbeats.pop(dbname, None)
+
+    def _done(self, dbname, rows):
+        """Remember the values of a committed flush, unchanged ones are skipped until the heartbeat"""
+        now = time.monotonic()
+        for scale_id, values in rows.items():
+            self._flushed[(dbname, scale_id)] = (self._signature(values), now)
+
+    def _restore(self, dbname, rows, readings, heartbeat):
+        """Put back the batch of a failed flush for the next one, values recorded since then win"""
+        for scale_id, values in rows.items():
+            self._pending.setdefault((dbname, scale_id), values)
+        if readings:
+            readings = readings + self._readings.get(dbname, [])
+            if len(readings) > MAX_PENDING_READINGS:
+                _logger.warning("Scale reading buffer of %s is full, %s oldest readings dropped",
+                                dbname, len(readings) - MAX_PENDING_READINGS)
+                readings = readings[-MAX_PENDING_READINGS:]
+            self._readings[dbname] = readings
+        if heartbeat:
+            self._heartbeats[dbname] = max(heartbeat, self._heartbeats.get(dbname, heartbeat))
+
+    def _dbnames(self):
+        return {key[0] for key in self._pending} | set(self._readings) | set(self._heartbeats)
+
+    def flush(self, dbname=None):
+        """Write the buffered telemetry of dbname (all databases by default)"""
+        with self._lock:
+            self._check_pid()
+            dbnames = [dbname] if dbname else list(self._dbnames())
+            batches = {name: self._take(name) for name in dbnames}
+        for name, (rows, readings, heartbeat) in batches.items():
+            if not (rows or readings or heartbeat):
+                continue
+            written = self._write(name, rows, readings, heartbeat)
+            with self._lock:
+                if self._pid != os.getpid():
+                    continue
+                if written:
+                    self._done(name, rows)
+                else:
+                    self._restore(name, rows, readings, heartbeat)
+
+    def _write(self, dbname, rows, readings, heartbeat):
+        """Write one batch in its own transaction, returns whether it was committed"""
+        try:
+            with Registry(dbname).cursor() as cr:
+                if readings:
+                    self._copy_readings(cr, readings)
+                if rows:
+                    self._update_scales(cr, rows)
+                if heartbeat:
+                    self._store_heartbeat(cr, heartbeat)
+        except Exception:
+            _logger.exception("Failed to flush the telemetry of %s scale(s) and %s reading(s) on %s, kept for the next flush",
+                              len(rows), len(readings), dbname)
+            return False
+        return True
+
+    @staticmethod
+    def _copy_readings(cr, readings):
+        # COPY into a session staging table, then keep the readings of scales
+        # that still exist: a deleted scale must not fail the whole batch
+        cr.execute(SQL(
+            """
+            CREATE TEMPORARY TABLE IF NOT EXISTS weighing_scale_reading_stage (
+                scale_id integer, "timestamp" timestamp, weight float8, stable boolean, source varchar
+            ) ON COMMIT DELETE ROWS
+            """
+        ))
+        data = io.StringIO()
+        for scale_id, timestamp, weight, stable, source in readings:
+            data.write(f"{scale_id}\t{timestamp.isoformat(sep=' ')}\t{weight!r}\t{'t' if stable else 'f'}\t{source}\n")
+        data.seek(0)
+        cr.copy_expert('COPY weighing_scale_reading_stage (scale_id, "timestamp", weight, stable, source) FROM STDIN', data)
+        cr.execute(SQL(
+            """
+            INSERT INTO weighing_scale_reading
+                        (scale_id, "timestamp", weight, weight_min, weight_max, sample_count, stable, source, resolution)
+                 SELECT r.scale_id, r."timestamp", r.weight, r.weight, r.weight, 1, r.stable, r.source, 'raw'
+                   FROM weighing_scale_reading_stage r
+                   JOIN weighing_scale s ON s.id = r.scale_id
+               ORDER BY r."timestamp"
+            """
+        ))
+
+    @staticmethod
+    def _update_scales(cr, rows):
+        cr.execute(SQL(
+            """
+            UPDATE weighing_scale s
+               SET connection_status = r.status,
+                   last_check_date = r.check_date,
+                   last_read_weight = COALESCE(r.weight, s.last_read_weight),
+                   last_read_date = COALESCE(r.read_date, s.last_read_date),
+                   error_message = r.error
+              FROM (VALUES %s) AS r(id, status, check_date, weight, read_date, error)
+             WHERE s.id = r.id
+               AND (s.last_check_date IS NULL OR s.last_check_date <= r.check_date)
+            """,
+            SQL(", ").join(
+                SQL("(%s, %s::varchar, %s::timestamp, %s::float8, %s::timestamp, %s::text)",
+                    scale_id, values['connection_status'], values['last_check_date'],
+                    values['last_read_weight'], values['last_read_date'], values['error_message'])
+                for scale_id, values in rows.items()
+            ),
+        ))
+
+    @staticmethod
+    def _store_heartbeat(cr, heartbeat):
+        cr.execute(SQL(
+            """
+            INSERT INTO ir_config_parameter (key, value) VALUES (%s, %s)
+            ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value
+              WHERE ir_config_parameter.value < EXCLUDED.value
+            """,
+            POLLER_HEARTBEAT_PARAM, heartbeat.isoformat(sep=' '),
+        ))
+
+    def _run(self):
+        while True:
+            time.sleep(1)
+            with self._lock:
+                if self._pid != os.getpid():
+                    return
+                now = time.monotonic()
+                due = [
+                    dbname for dbname in self._dbnames()
+                    if now - self._last_flush.get(dbname, 0) >= self._intervals.get(dbname, DEFAULT_FLUSH_INTERVAL)
+                ]
+            for dbname in due:
+                self.flush(dbname)
+
+
+telemetry_buffer = TelemetryBuffer()
+atexit.register(telemetry_buffer.flush)
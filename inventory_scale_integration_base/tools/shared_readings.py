@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""Memory-mapped buffer of the latest scale readings, shared by all workers.
+
+One file per database, written by a single process (the scale poller) and
+mapped read-only by every worker. The layout is fixed::
+
+    header  MAGIC, version, slot count, ring depth, retired flag (64 bytes)
+    slot    scale id, sequence, write count            (24 bytes)
+            ring of DEPTH readings                     (DEPTH * 24 bytes)
+    reading timestamp (epoch), weight, stable, status  (24 bytes)
+
+Slots are found by linear probing from ``scale_id % SLOTS``. Each slot is
+guarded by a sequence lock: the writer makes the sequence odd while it
+updates the slot, readers retry when the sequence is odd or changed under
+them, so nobody ever blocks and readers unpack the values straight from the
+mapping. The writer holds an exclusive lock on a file next to the buffer, a
+second writer of the same database is refused.
+"""
+import fcntl
+import logging
+import mmap
+import os
+import struct
+from collections import namedtuple
+
+from odoo.tools import config
+
+_logger = logging.getLogger(__name__)
+
+MAGIC = b'SCALERB1'
+VERSION = 1
+SLOTS = 1024
+DEPTH = 16
+
+STATUS_EMPTY = 0
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+_HEADER = struct.Struct('<8sIIII')
+_HEADER_SIZE = 64
+_RETIRED_OFFSET = 8 + 4 * 3
+_SLOT = struct.Struct('<qQQ')
+_READING = struct.Struct('<ddBB6x')
+_SEQ = struct.Struct('<Q')
+_MAX_RETRIES = 100
+
+Reading = namedtuple('Reading', 'timestamp weight stable status')
+
+
+class BufferLocked(RuntimeError):
+    """Another process already writes the buffer"""
+
+
+def buffer_path(dbname):
+    return os.path.join(config['data_dir'], 'scale_readings', f'{dbname}.bin')
+
+
+class ScaleReadingBuffer:
+    """Fixed layout ring buffer of readings keyed by scale id"""
+
+    def __init__(self, path, writable=False, slots=SLOTS, depth=DEPTH):
+        self.path = path
+        self.writable = writable
+        self.lock_file = None
+        if writable:
+            self._create(slots, depth)
+        with open(path, 'r+b' if writable else 'rb') as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+        magic, version, self.slots, self.depth, _retired = _HEADER.unpack_from(self.mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            self.mmap.close()
+            raise ValueError(f"{path} is not a scale reading buffer")
+        self.slot_size = _SLOT.size + self.depth * _READING.size
+        # scale id -> slot offset
+        self._offsets = {}
+
+    def _create(self, slots, depth):
+        size = _HEADER_SIZE + slots * (_SLOT.size + depth * _READING.size)
+        if os.path.exists(self.path):
+            with open(self.path, 'rb') as f:
+                header = f.read(_HEADER.size)
+            if len(header) == _HEADER.size and _HEADER.unpack(header)[:4] == (MAGIC, VERSION, slots, depth):
+                return
+            self._retire_file()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.truncate(size)
+            f.write(_HEADER.pack(MAGIC, VERSION, slots, depth, 0))
+        # Readers keep their mapping of the old file until they see it retired
+        os.replace(tmp_path, self.path)
+
+    def _retire_file(self):
+        try:
+            with open(self.path, 'r+b') as f:
+                f.seek(_RETIRED_OFFSET)
+                f.write(struct.pack('<I', 1))
+        except OSError:
+            pass
+
+    @property
+    def retired(self):
+        return struct.unpack_from('<I', self.mmap, _RETIRED_OFFSET)[0] == 1
+
+    def close(self):
+        self.mmap.close()
+        if self.lock_file is not None:
+            self.lock_file.close()
+
+    def _find(self, scale_id, claim=False):
+        offset = self._offsets.get(scale_id)
+        if offset is not None:
+            return offset
+        start = scale_id % self.slots
+        for i in range(self.slots):
+            offset = _HEADER_SIZE + ((start + i) % self.slots) * self.slot_size
+            slot_scale_id = _SLOT.unpack_from(self.mmap, offset)[0]
+            if slot_scale_id == scale_id or (claim and slot_scale_id == 0):
+                # Slots never move, remember where the scale lives
+                self._offsets[scale_id] = offset
+                return offset
+            if slot_scale_id == 0:
+                return None
+        if claim:
+            _logger.warning("Scale reading buffer %s is full, scale %s is not shared", self.path, scale_id)
+        return None
+
+    def write(self, scale_id, timestamp, weight, stable, status):
+        """Append a reading to the ring of scale_id, single writer only"""
+        offset = self._find(scale_id, claim=True)
+        if offset is None:
+            return
+        _scale_id, seq, count = _SLOT.unpack_from(self.mmap, offset)
+        _SEQ.pack_into(self.mmap, offset + 8, seq + 1)
+        _READING.pack_into(self.mmap, offset + _SLOT.size + (count % self.depth) * _READING.size,
+                           timestamp, weight, bool(stable), status)
+        _SLOT.pack_into(self.mmap, offset, scale_id, seq + 1, count + 1)
+        _SEQ.pack_into(self.mmap, offset + 8, seq + 2)
+
+    def history(self, scale_id, limit=None):
+        """Readings of scale_id, newest first, at most limit (the ring depth)"""
+        offset = self._find(scale_id)
+        if offset is None:
+            return []
+        limit = min(limit or self.depth, self.depth)
+        for _retry in range(_MAX_RETRIES):
+            seq = _SEQ.unpack_from(self.mmap, offset + 8)[0]
+            if seq % 2:
+                continue
+            count = _SLOT.unpack_from(self.mmap, offset)[2]
+            readings = []
+            for index in range(count - 1, max(count - limit, 0) - 1, -1):
+                timestamp, weight, stable, status = _READING.unpack_from(
+                    self.mmap, offset + _SLOT.size + (index % self.depth) * _READING.size)
+                readings.append(Reading(timestamp, weight, bool(stable), status))
+            if _SEQ.unpack_from(self.mmap, offset + 8)[0] == seq:
+                return readings
+        return []
+
+    def latest(self, scale_id):
+        """Latest reading of scale_id or None"""
+        readings = self.history(scale_id, 1)
+        return readings[0] if readings else None
+
+
+_readers = {}
+_writers = {}
+
+
+def get_reader(dbname):
+    """Read-only buffer of dbname for this process, None until a writer created it"""
+    reader = _readers.get(dbname)
+    if reader is not None and not reader.retired:
+        return reader
+    if reader is not None:
+        reader.close()
+        _readers.pop(dbname, None)
+    path = buffer_path(dbname)
+    if not os.path.exists(path):
+        return None
+    try:
+        reader = _readers[dbname] = ScaleReadingBuffer(path)
+    except (OSError, ValueError) as e:
+        _logger.debug("Scale reading buffer %s unavailable: %s", path, e)
+        return None
+    return reader
+
+
+def get_writer(dbname):
+    """Writable buffer of dbname, raise BufferLocked when another process writes it.
+
+    The lock is taken on a separate file as the buffer itself is replaced
+    when its layout changes, it is released when the process exits.
+    """
+    writer = _writers.get(dbname)
+    if writer is None:
+        path = buffer_path(dbname)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        lock_file = open(f'{path}.lock', 'ab')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            writer = ScaleReadingBuffer(path, writable=True)
+        except BlockingIOError:
+            lock_file.close()
+            raise BufferLocked(f"{path} is already written by another process")
+        except Exception:
+            lock_file.close()
+            raise
+        writer.lock_file = lock_file
+        _writers[dbname] = writer
+    return writer
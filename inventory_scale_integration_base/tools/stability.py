@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""Stable weight detection over a fixed-size ring of recent samples."""
+import math
+from array import array
+from collections import namedtuple
+
+# Fewer samples than this never make a stable weight
+MIN_SAMPLES = 3
+
+StabilityResult = namedtuple(
+    'StabilityResult', 'stable weight spread stddev samples duration start end')
+
+
+class StabilityDetector:
+    """Decide when the last samples of a scale settled.
+
+    The weight is stable when the newest samples cover at least
+    ``min_duration`` seconds, all of them are flagged stable by the indicator
+    and they stay within ``tolerance`` kg of each other. The ring keeps the
+    last ``window`` samples in preallocated arrays, adding one never
+    allocates.
+    """
+
+    def __init__(self, window, tolerance, min_duration):
+        self.size = max(int(window), MIN_SAMPLES)
+        self.tolerance = tolerance
+        self.min_duration = min_duration
+        self.weights = array('d', bytes(8 * self.size))
+        self.timestamps = array('d', bytes(8 * self.size))
+        self.flags = array('b', bytes(self.size))
+        self.head = 0
+        self.count = 0
+
+    def add(self, timestamp, weight, stable=True):
+        """Append a sample, timestamps in seconds must not decrease"""
+        self.weights[self.head] = weight
+        self.timestamps[self.head] = timestamp
+        self.flags[self.head] = 1 if stable else 0
+        self.head = (self.head + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+
+    def reset(self):
+        self.head = 0
+        self.count = 0
+
+    def _indexes(self):
+        """Ring indexes from the oldest to the newest sample"""
+        start = (self.head - self.count) % self.size
+        return [(start + i) % self.size for i in range(self.count)]
+
+    def result(self):
+        """Statistics of the newest samples covering min_duration seconds"""
+        indexes = self._indexes()
+        if not indexes:
+            return StabilityResult(False, 0.0, 0.0, 0.0, 0, 0.0, 0.0, 0.0)
+        end = self.timestamps[indexes[-1]]
+        used = []
+        for i in reversed(indexes):
+            used.append(i)
+            if end - self.timestamps[i] >= self.min_duration:
+                break
+        weights = [self.weights[i] for i in used]
+        count = len(weights)
+        mean = sum(weights) / count
+        spread = max(weights) - min(weights)
+        stddev = math.sqrt(sum((weight - mean) ** 2 for weight in weights) / count)
+        start = self.timestamps[used[-1]]
+        stable = (
+            count >= MIN_SAMPLES
+            and end - start >= self.min_duration
+            and spread <= self.tolerance
+            and all(self.flags[i] for i in used)
+        )
+        return StabilityResult(stable, mean, spread, stddev, count, end - start, start, end)
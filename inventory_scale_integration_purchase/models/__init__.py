@@ -2,5 +2,4 @@
 from . import truck_weighing
 from . import purchase_order
 from . import weighing_overview
-from . import stock_picking
 from . import res_users
\ No newline at end of file
@@ -11,10 +11,10 @@ patch(WeighingOverviewDashboard.prototype, {
                 res_model: 'stock.picking',
                 view_mode: 'list,form',
                 views: [[false, 'list'], [false, 'form']],
-                domain: async () => {
-                    const ids = await this.orm.call('weighing.overview', 'get_receipts_to_weigh_ids', []);
-                    return [['id', 'in', ids]];
-                },
+                domain: [
+                    ['needs_weighing', '=', true],
+                    ['picking_type_code', '=', 'incoming']
+                ],
                 context: { 'create': true }
             },
             'receipts_urgent': {
@@ -23,9 +23,8 @@ patch(WeighingOverviewDashboard.prototype, {
                 view_mode: 'list,form',
                 views: [[false, 'list'], [false, 'form']],
                 domain: [
-                    ['state', 'in', ['assigned', 'confirmed']],
+                    ['needs_weighing', '=', true],
                     ['picking_type_code', '=', 'incoming'],
-                    ['move_ids.product_id.is_weighable', '=', true],
                     ['scheduled_date', '<=', new Date().toISOString().split('T')[0]]
                 ],
             },
@@ -35,9 +34,8 @@ patch(WeighingOverviewDashboard.prototype, {
                 view_mode: 'list,form',
                 views: [[false, 'list'], [false, 'form']],
                 domain: [
-                    ['state', 'in', ['assigned', 'confirmed']],
-                    ['picking_type_code', '=', 'incoming'],
-                    ['move_ids.product_id.is_weighable', '=', true]
+                    ['needs_weighing', '=', true],
+                    ['picking_type_code', '=', 'incoming']
                 ],
                 context: { 'group_by': 'partner_id' }
             },
@@ -54,10 +52,7 @@ patch(WeighingOverviewDashboard.prototype, {
                 res_model: 'purchase.order',
                 view_mode: 'list,form',
                 views: [[false, 'list'], [false, 'form']],
-                domain: async () => {
-                    const ids = await this.orm.call('weighing.overview', 'get_pos_to_weigh_ids', []);
-                    return [['id', 'in', ids]];
-                },
+                domain: [['needs_weighing', '=', true]],
                 context: { 'create': true }
             },
             'pos_by_amount': {
@@ -65,10 +60,7 @@ patch(WeighingOverviewDashboard.prototype, {
                 res_model: 'purchase.order',
                 view_mode: 'list,form',
                 views: [[false, 'list'], [false, 'form']],
-                domain: [
-                    ['state', 'in', ['purchase', 'done']],
-                    ['order_line.product_id.is_weighable', '=', true]
-                ],
+                domain: [['needs_weighing', '=', true]],
                 context: { 'group_by': 'amount_total' }
             },
             'pos_pending_qty': {
@@ -76,20 +68,14 @@ patch(WeighingOverviewDashboard.prototype, {
                 res_model: 'purchase.order',
                 view_mode: 'list,form',
                 views: [[false, 'list'], [false, 'form']],
-                domain: [
-                    ['state', 'in', ['purchase', 'done']],
-                    ['order_line.product_id.is_weighable', '=', true]
-                ],
+                domain: [['needs_weighing', '=', true]],
             },
             'pos_by_supplier': {
                 name: 'Purchase Orders by Supplier',
                 res_model: 'purchase.order',
                 view_mode: 'list,form',
                 views: [[false, 'list'], [false, 'form']],
-                domain: [
-                    ['state', 'in', ['purchase', 'done']],
-                    ['order_line.product_id.is_weighable', '=', true]
-                ],
+                domain: [['needs_weighing', '=', true]],
                 context: { 'group_by': 'partner_id' }
             },
             'new_weighing_po': {
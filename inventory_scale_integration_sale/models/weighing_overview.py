@@ -5,53 +5,38 @@ class WeighingOverview(models.TransientModel):
     _inherit = 'weighing.overview'
 
     @api.model
-    def get_overview_data(self):
-        """Extend overview data with sales-specific information"""
-        data = super().get_overview_data()
-        
-        # Add deliveries data
-        deliveries_to_weigh_ids = self.get_deliveries_to_weigh_ids()
-        deliveries_to_weigh = self.env['stock.picking'].browse(deliveries_to_weigh_ids)
-        
-        data['deliveries_to_weigh'] = {
-            'count': len(deliveries_to_weigh),
-            'total_qty': sum(deliveries_to_weigh.mapped('move_ids.product_uom_qty')),
-            'urgent_count': len(deliveries_to_weigh.filtered(lambda d: d.scheduled_date and d.scheduled_date.date() <= self.env.context.get('today', fields.Date.today()))),
-            'partners': len(deliveries_to_weigh.mapped('partner_id')),
-        }
-        
-        # Add SO data
-        sales_to_weigh_ids = self.get_sales_to_weigh_ids()
-        sales_to_weigh = self.env['sale.order'].browse(sales_to_weigh_ids)
-        
-        data['sales_to_weigh'] = {
-            'count': len(sales_to_weigh),
-            'total_amount': sum(sales_to_weigh.mapped('amount_total')),
-            'pending_qty': sum(sales_to_weigh.mapped('order_line.product_uom_qty')) - sum(sales_to_weigh.mapped('order_line.qty_delivered')),
-            'partners': len(sales_to_weigh.mapped('partner_id')),
-        }
-        
-        return data
+    def _get_overview_cards(self):
+        """Register the sales cards"""
+        cards = super()._get_overview_cards()
+        cards.update({
+            'sales_to_weigh': 'get_sales_to_weigh_card',
+            'deliveries_to_weigh': 'get_deliveries_to_weigh_card',
+        })
+        return cards
 
     @api.model
-    def get_deliveries_to_weigh_ids(self):
-        """Get delivery IDs that need weighing"""
-        all_deliveries = self.env['stock.picking'].search([
-            ('state', 'in', ['assigned', 'confirmed']),
-            ('picking_type_code', '=', 'outgoing'),
-            ('move_ids.product_id.is_weighable', '=', True)
-        ])
-        # Filter out those with existing weighing records
-        deliveries_to_weigh = all_deliveries.filtered(lambda d: 
-            not self.env['truck.weighing'].search([('picking_id', '=', d.id)], limit=1)
-        )
-        return deliveries_to_weigh.ids
+    def get_sales_to_weigh_card(self):
+        return self._get_card_data('sales_to_weigh', '_compute_sales_to_weigh_card')
 
     @api.model
-    def get_sales_to_weigh_ids(self):
-        """Get sales order IDs that need weighing"""
-        sales_to_weigh = self.env['sale.order'].search([
-            ('state', 'in', ['sale', 'done']),
-            ('order_line.product_id.is_weighable', '=', True)
-        ])
-        return sales_to_weigh.ids
\ No newline at end of file
+    def get_deliveries_to_weigh_card(self):
+        return self._get_card_data('deliveries_to_weigh', '_compute_deliveries_to_weigh_card')
+
+    @api.model
+    def _compute_deliveries_to_weigh_card(self):
+        today = self.env.context.get('today', fields.Date.today())
+        return self._picking_queue_stats(self._deliveries_to_weigh_domain(), today)
+
+    @api.model
+    def _compute_sales_to_weigh_card(self):
+        return self._order_queue_stats('sale.order', self._sales_to_weigh_domain())
+
+    @api.model
+    def _deliveries_to_weigh_domain(self):
+        """Deliveries with weighable products and no weighing record yet"""
+        return [('needs_weighing', '=', True), ('picking_type_code', '=', 'outgoing')]
+
+    @api.model
+    def _sales_to_weigh_domain(self):
+        """Sales orders with weighable quantities left to weigh"""
+        return [('needs_weighing', '=', True)]